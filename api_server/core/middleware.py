@@ -0,0 +1,54 @@
+"""
+Module to handle compressed request bodies
+"""
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import JsonResponse
+
+# zlib window bits for gzip header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class GzipRequestMiddleware:
+    """
+    Decompresses request bodies sent with gzip Content-Encoding
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        encoding = request.META.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if encoding == "gzip":
+            try:
+                body = self.decompress(request.body)
+            except zlib.error as error:
+                return JsonResponse(
+                    {"detail": f"Invalid gzip body: {error}"}, status=400
+                )
+            # pylint: disable=protected-access
+            request._body = body
+            request.META["CONTENT_LENGTH"] = str(len(body))
+            del request.META["HTTP_CONTENT_ENCODING"]
+        return self.get_response(request)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        """
+        Decompresses gzip data, up to DATA_UPLOAD_MAX_MEMORY_SIZE bytes
+        """
+        max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+        if max_size is None:
+            body = decompressor.decompress(data)
+        else:
+            body = decompressor.decompress(data, max_size + 1)
+            if len(body) > max_size:
+                raise RequestDataTooBig(
+                    "Decompressed request body exceeded DATA_UPLOAD_MAX_MEMORY_SIZE."
+                )
+        if not decompressor.eof:
+            raise zlib.error("incomplete gzip stream")
+        return body
@@ -0,0 +1,29 @@
+"""
+Module to parse newline delimited json requests
+"""
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited json into list of objects
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        items = []
+        try:
+            for line in codecs.getreader(encoding)(stream):
+                if line.strip():
+                    items.append(json.loads(line))
+        except ValueError as error:
+            raise ParseError(f"NDJSON parse error - {error}") from error
+        return items
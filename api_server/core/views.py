@@ -1,11 +1,16 @@
 """
 Module to handle the views of API calls
 """
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
-from rest_framework import viewsets
-from rest_framework import permissions
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
 
 from .models import Trial
+from .parsers import NDJSONParser
 from .serializers import TrialSerializer
 
 
@@ -27,3 +32,60 @@ class TrialViewSet(viewsets.ModelViewSet):
                 Q(name__icontains=search_query) | Q(description__icontains=search_query)
             )
         return queryset
+
+    @action(
+        detail=False,
+        methods=["post"],
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def bulk(self, request):
+        """
+        Creates trials from json array or newline delimited json,
+        responds with status of every item
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Expected a list of trials."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, Trial(**serializer.validated_data)))
+            else:
+                results.append(
+                    {
+                        "index": index,
+                        "status": status.HTTP_400_BAD_REQUEST,
+                        "errors": serializer.errors,
+                    }
+                )
+
+        batch_size = getattr(settings, "BULK_BATCH_SIZE", 500)
+        with transaction.atomic():
+            for start in range(0, len(valid), batch_size):
+                Trial.objects.bulk_create(  # pylint: disable=no-member
+                    [trial for _, trial in valid[start : start + batch_size]]
+                )
+        results.extend(
+            {
+                "index": index,
+                "status": status.HTTP_201_CREATED,
+                "id": trial.pk,
+                "uuid": str(trial.uuid),
+            }
+            for index, trial in valid
+        )
+        results.sort(key=lambda result: result["index"])
+
+        if not valid and items:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(valid) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({"results": results}, status=response_status)
@@ -54,6 +54,7 @@ NOSE_ARGS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.GzipRequestMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -88,19 +89,28 @@ WSGI_APPLICATION = "purplecaffeine.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": os.getenv("DB_NAME", "purplecaffeine"),
-        "USER": os.getenv("DB_USER", "purplecaffeine"),
-        "PASSWORD": os.getenv("DB_PASSWORD", "purplecaffeinepassword"),
-        "HOST": os.getenv("DB_HOST", "localhost"),
-        "PORT": os.getenv("DB_PORT", "5432"),
-        "OPTIONS": {
-            "options": f"-c search_path={os.environ.get('DB_SCHEMA', 'public')}"
-        },
+# DB_ENGINE "sqlite" stores data in DB_NAME file, used by benchmarks and local runs
+if os.getenv("DB_ENGINE", "postgresql") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME", os.path.join(BASE_DIR, "db.sqlite3")),
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "purplecaffeine"),
+            "USER": os.getenv("DB_USER", "purplecaffeine"),
+            "PASSWORD": os.getenv("DB_PASSWORD", "purplecaffeinepassword"),
+            "HOST": os.getenv("DB_HOST", "localhost"),
+            "PORT": os.getenv("DB_PORT", "5432"),
+            "OPTIONS": {
+                "options": f"-c search_path={os.environ.get('DB_SCHEMA', 'public')}"
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -166,6 +176,9 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# number of trials inserted by a single query of bulk endpoint
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 500))
+
 SPECTACULAR_SETTINGS = {
     "VERSION": "latest",
     "EXTERNAL_DOCS": {"url": "https://icekhan13.github.io/purplecaffeine"},
@@ -1,4 +1,5 @@
 """Tests file."""
+import gzip
 import json
 from django.contrib.auth.models import User
 from django.urls import reverse
@@ -30,8 +31,15 @@ class UnitTests(TestCase):
         data = {"username": "admin", "password": "admin"}
 
         url = reverse("token_obtain_pair")
-        login = self.client.post(url, data=data, content_type="application/json")
+        login = self.client.post(
+            url,
+            data=data,
+            content_type="application/json",
+            headers={"Accept-Encoding": "gzip"},
+        )
         self.assertEqual(login.status_code, 200)
+        # responses with secrets are not compressed, see BREACH
+        self.assertNotIn("Content-Encoding", login.headers)
 
         token_refresh = json.loads(login.content)["refresh"]
 
@@ -104,3 +112,85 @@ class UnitTests(TestCase):
             content_type="application/json",
         )
         self.assertEqual(delete.status_code, 204)
+
+    def test_gzip_trial(self):
+        """Tests posting gzip compressed trial."""
+
+        data = {
+            "name": "My compressed experiment",
+            "description": "My compressed experiments desciption",
+            "storage": {"__type__": "PurpleCaffeineBackend"},
+            "metrics": [["nb_qubits", 2]] * 100,
+            "parameters": [["OS", "ubuntu"]],
+            "circuits": [],
+            "operators": [],
+            "artifacts": [],
+            "texts": [],
+            "arrays": [],
+            "tags": [],
+        }
+        post = self.client.post(
+            "/api/trials/",
+            data=gzip.compress(json.dumps(data).encode("utf-8")),
+            headers={
+                "Authorization": f" Bearer {self.get_token()}",
+                "Content-Encoding": "gzip",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(post.status_code, 201)
+        self.assertEqual(json.loads(post.content)["metrics"], data["metrics"])
+
+        post = self.client.post(
+            "/api/trials/",
+            data=b"not gzip",
+            headers={
+                "Authorization": f" Bearer {self.get_token()}",
+                "Content-Encoding": "gzip",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(post.status_code, 400)
+
+    def test_bulk_trials(self):
+        """Tests creating trials in bulk."""
+
+        trial = {
+            "name": "My sweep experiment",
+            "description": "My sweep experiments desciption",
+            "storage": {"__type__": "PurpleCaffeineBackend"},
+            "metrics": [["nb_qubits", 2]],
+            "parameters": [["OS", "ubuntu"]],
+            "circuits": [],
+            "operators": [],
+            "artifacts": [],
+            "texts": [],
+            "arrays": [],
+            "tags": [],
+        }
+        data = [{**trial, "name": f"sweep_{idx}"} for idx in range(5)]
+        data.append({**trial, "name": None})
+        post = self.client.post(
+            "/api/trials/bulk/",
+            data=json.dumps(data),
+            headers={"Authorization": f" Bearer {self.get_token()}"},
+            content_type="application/json",
+        )
+        self.assertEqual(post.status_code, 207)
+        results = json.loads(post.content)["results"]
+        self.assertEqual([result["status"] for result in results], [201] * 5 + [400])
+        self.assertIn("name", results[5]["errors"])
+
+        post = self.client.post(
+            "/api/trials/bulk/",
+            data="\n".join(json.dumps(item) for item in data[:3]),
+            headers={"Authorization": f" Bearer {self.get_token()}"},
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(post.status_code, 201)
+
+        get_all = self.client.get(
+            "/api/trials/?query=sweep_",
+            headers={"Authorization": f" Bearer {self.get_token()}"},
+        )
+        self.assertEqual(json.loads(get_all.content)["count"], 8)
@@ -0,0 +1,590 @@
+"""Benchmarks of save, get and list of storages.
+
+Every scenario saves a set of generated trials to a fresh storage,
+gets each of them back with all components loaded and lists them.
+Latency of every call, throughput, peak memory of Python
+allocations and size of stored data are written to a JSON file, which can be compared
+with the results of another commit.
+
+Example:
+    >>> python benchmarks/storage_benchmark.py run --backends local s3 \\
+    >>>     --output results.json
+    >>> python benchmarks/storage_benchmark.py compare baseline.json results.json
+
+Backends:
+    * local: LocalStorage in a temporary folder
+    * s3: S3Storage on moto server, or on in-process moto
+      if moto server dependencies are not installed
+    * api: ApiStorage on api_server with SQLite database,
+      a fresh server is started for every scenario
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from qiskit import QuantumCircuit, __version__ as qiskit_version
+from qiskit.quantum_info import Operator, SparsePauliOp, random_unitary
+
+import purplecaffeine
+from purplecaffeine.core import (
+    ApiStorage,
+    BaseStorage,
+    LocalStorage,
+    S3Storage,
+    Trial,
+)
+from purplecaffeine.helpers import Configuration
+
+RESULTS_SCHEMA_VERSION = 1
+API_SERVER_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "api_server")
+)
+
+BASE_PARAMETERS = {
+    "trials": 20,
+    "metrics": 10,
+    "circuits": 1,
+    "circuit_qubits": 5,
+    "circuit_depth": 10,
+    "arrays": 1,
+    "array_size": 100,
+    "operators": 0,
+    "operator_qubits": 6,
+}
+# values of a single parameter replacing its base value, one scenario per value
+VARIATIONS = {
+    "metrics": [1000, 10000],
+    "circuits": [10],
+    "circuit_depth": [1000],
+    "arrays": [10],
+    "array_size": [100000],
+    "operators": [10],
+    "operator_qubits": [10],
+    "trials": [200],
+}
+QUICK_VARIATIONS = {
+    "metrics": [1000],
+    "circuits": [10],
+    "array_size": [10000],
+    "operators": [10],
+    "trials": [50],
+}
+
+
+def scenarios(quick: bool = False) -> Dict[str, Dict[str, int]]:
+    """Returns parameters of benchmark scenarios by name.
+
+    Args:
+        quick: run a smaller set of scenarios
+
+    Returns:
+        base scenario and one scenario per varied parameter value
+    """
+    result = {"base": dict(BASE_PARAMETERS)}
+    for parameter, values in (QUICK_VARIATIONS if quick else VARIATIONS).items():
+        for value in values:
+            result[f"{parameter}={value}"] = {**BASE_PARAMETERS, parameter: value}
+    return result
+
+
+def make_trial(idx: int, parameters: Dict[str, int]) -> Trial:
+    """Returns generated trial of a scenario.
+
+    Args:
+        idx: number of the trial
+        parameters: scenario parameters
+
+    Returns:
+        trial
+    """
+    rng = np.random.default_rng(idx)
+    trial = Trial(name=f"benchmark_trial_{idx}")
+    trial.add_description(f"Benchmark trial {idx}")
+    trial.add_parameter("index", str(idx))
+    trial.add_tag("benchmark")
+    for step in range(parameters["metrics"]):
+        trial.add_metric("loss", float(rng.random()), step=step)
+    for circuit_idx in range(parameters["circuits"]):
+        circuit = QuantumCircuit(parameters["circuit_qubits"])
+        for layer in range(parameters["circuit_depth"]):
+            qubit = layer % parameters["circuit_qubits"]
+            circuit.rx(float(rng.random()), qubit)
+            circuit.cx(qubit, (qubit + 1) % parameters["circuit_qubits"])
+        circuit.measure_all()
+        trial.add_circuit(f"circuit_{circuit_idx}", circuit)
+    for array_idx in range(parameters["arrays"]):
+        trial.add_array(f"array_{array_idx}", rng.random(parameters["array_size"]))
+    for operator_idx in range(parameters["operators"]):
+        trial.add_operator(
+            f"operator_{operator_idx}",
+            make_operator(rng, parameters["operator_qubits"], dense=operator_idx % 2),
+        )
+    trial.add_text("notes", "Generated by storage benchmark.")
+    return trial
+
+
+def make_operator(rng: np.random.Generator, num_qubits: int, dense: bool) -> Operator:
+    """Returns generated operator.
+
+    Args:
+        rng: random generator
+        num_qubits: number of qubits of the operator
+        dense: return random unitary, else Ising hamiltonian
+            with a few Pauli terms
+
+    Returns:
+        operator
+    """
+    if dense:
+        return random_unitary(2**num_qubits, seed=rng).to_operator()
+    return Operator(
+        SparsePauliOp.from_sparse_list(
+            [
+                ("ZZ", [qubit, (qubit + 1) % num_qubits], float(rng.random()))
+                for qubit in range(num_qubits)
+            ]
+            + [("X", [qubit], float(rng.random())) for qubit in range(num_qubits)],
+            num_qubits=num_qubits,
+        )
+    )
+
+
+def load_components(trial: Trial):
+    """Loads lazy components, so get is measured with all data read."""
+    for field in ("circuits", "operators", "texts", "arrays", "artifacts"):
+        getattr(trial, field)
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    """Returns latency statistics in milliseconds and throughput in calls per second.
+
+    Args:
+        latencies: durations of calls in seconds
+
+    Returns:
+        statistics of calls
+    """
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    total = sum(latencies)
+    return {
+        "calls": len(latencies),
+        "mean_ms": statistics.fmean(latencies_ms),
+        "median_ms": statistics.median(latencies_ms),
+        "p95_ms": latencies_ms[
+            min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))
+        ],
+        "min_ms": latencies_ms[0],
+        "max_ms": latencies_ms[-1],
+        "throughput_per_s": len(latencies) / total if total else 0.0,
+    }
+
+
+def timed(call: Callable[[], Any]) -> float:
+    """Returns duration of a call in seconds."""
+    start = time.perf_counter()
+    call()
+    return time.perf_counter() - start
+
+
+def peak_memory(call: Callable[[], Any]) -> int:
+    """Returns peak size in bytes of Python allocations made by a call.
+
+    Memory is traced in a separate call, as tracing slows calls down.
+    """
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def free_port() -> int:
+    """Returns free local port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Backend:
+    """Storage under benchmark."""
+
+    name = ""
+
+    @contextmanager
+    def storage(self) -> Iterator[BaseStorage]:
+        """Yields fresh empty storage."""
+        raise NotImplementedError
+
+    def trial_ids(self, trials: List[Trial]) -> List[str]:
+        """Returns ids of saved trials accepted by get.
+
+        Args:
+            trials: saved trials, in order of saving
+
+        Returns:
+            trial ids
+        """
+        return [trial.uuid for trial in trials]
+
+    def stored_bytes(self, storage: BaseStorage) -> Optional[int]:
+        """Returns size of data written by storage, None if it is not known."""
+        # pylint: disable=unused-argument
+        return None
+
+    def close(self):
+        """Stops services of the backend."""
+
+
+class LocalBackend(Backend):
+    """LocalStorage in temporary folders."""
+
+    name = "local"
+
+    @contextmanager
+    def storage(self) -> Iterator[BaseStorage]:
+        path = tempfile.mkdtemp(prefix="purplecaffeine-benchmark-")
+        try:
+            yield LocalStorage(path=path)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stored_bytes(self, storage: BaseStorage) -> Optional[int]:
+        return sum(
+            os.path.getsize(os.path.join(folder, file_name))
+            for folder, _, file_names in os.walk(storage.path)
+            for file_name in file_names
+        )
+
+
+class S3Backend(Backend):
+    """S3Storage on moto, with a bucket per scenario."""
+
+    name = "s3"
+
+    def __init__(self):
+        self.buckets = 0
+        # manifests of earlier runs must not be read from local cache
+        self.cache_path = tempfile.mkdtemp(prefix="purplecaffeine-benchmark-")
+        Configuration.S3_CACHE_PATH = self.cache_path
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        try:
+            from moto.server import (  # pylint: disable=import-outside-toplevel
+                ThreadedMotoServer,
+            )
+
+            self.server = ThreadedMotoServer(port=free_port(), verbose=False)
+            self.server.start()
+            host, port = self.server.get_host_and_port()
+            self.endpoint_url = f"http://{host}:{port}"
+            self.mock = None
+        except ImportError:
+            from moto import mock_aws  # pylint: disable=import-outside-toplevel
+
+            print("moto[server] is not installed, s3 runs on in-process moto.")
+            self.server = None
+            self.endpoint_url = None
+            self.mock = mock_aws()
+            self.mock.start()
+
+    @contextmanager
+    def storage(self) -> Iterator[BaseStorage]:
+        self.buckets += 1
+        storage = S3Storage(
+            f"benchmark-{self.buckets}",
+            access_key="benchmark",
+            secret_access_key="benchmark",
+            endpoint_url=self.endpoint_url,
+        )
+        storage.client_s3.create_bucket(Bucket=storage.bucket_name)
+        yield storage
+
+    def stored_bytes(self, storage: BaseStorage) -> Optional[int]:
+        paginator = storage.client_s3.get_paginator("list_objects_v2")
+        return sum(
+            content["Size"]
+            for page in paginator.paginate(Bucket=storage.bucket_name)
+            for content in page.get("Contents", [])
+        )
+
+    def close(self):
+        if self.server is not None:
+            self.server.stop()
+        if self.mock is not None:
+            self.mock.stop()
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+
+class ApiBackend(Backend):
+    """ApiStorage on api_server with a fresh SQLite database per scenario."""
+
+    name = "api"
+    username = "admin"
+    password = "admin"
+
+    def __init__(self, server_path: str = API_SERVER_PATH, timeout: float = 60):
+        self.server_path = server_path
+        self.timeout = timeout
+
+    def _manage(self, env: Dict[str, str], *args: str):
+        """Runs Django management command."""
+        subprocess.run(
+            [sys.executable, "manage.py", *args],
+            cwd=self.server_path,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    @contextmanager
+    def storage(self) -> Iterator[BaseStorage]:
+        folder = tempfile.mkdtemp(prefix="purplecaffeine-benchmark-")
+        env = {
+            **os.environ,
+            "DB_ENGINE": "sqlite",
+            "DB_NAME": os.path.join(folder, "db.sqlite3"),
+            "DEBUG": "0",
+            "DJANGO_SUPERUSER_USERNAME": self.username,
+            "DJANGO_SUPERUSER_PASSWORD": self.password,
+            "DJANGO_SUPERUSER_EMAIL": "admin@admin.admin",
+        }
+        self._manage(env, "migrate")
+        self._manage(env, "createsuperuser", "--no-input")
+        port = free_port()
+        with subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "purplecaffeine.wsgi",
+            ],
+            cwd=self.server_path,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        ) as server:
+            try:
+                self._wait_for(port)
+                yield ApiStorage(
+                    host=f"http://127.0.0.1:{port}",
+                    username=self.username,
+                    password=self.password,
+                )
+            finally:
+                server.terminate()
+                server.wait()
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def _wait_for(self, port: int):
+        """Waits until server accepts connections."""
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise TimeoutError(f"Api server did not start in {self.timeout} seconds.")
+
+    def trial_ids(self, trials: List[Trial]) -> List[str]:
+        # trials are got by primary key, database of a scenario numbers them from 1
+        return [str(idx + 1) for idx in range(len(trials))]
+
+
+BACKENDS = {"local": LocalBackend, "s3": S3Backend, "api": ApiBackend}
+
+
+def run_scenario(
+    backend: Backend, parameters: Dict[str, int], repeat: int
+) -> Dict[str, Dict[str, float]]:
+    """Returns statistics of save, get and list of a scenario.
+
+    Args:
+        backend: backend under benchmark
+        parameters: scenario parameters
+        repeat: number of list calls
+
+    Returns:
+        statistics by operation
+    """
+    # first trial is traced for peak memory, which also warms up the storage
+    trials = [make_trial(idx, parameters) for idx in range(parameters["trials"] + 1)]
+    results = {}
+    with backend.storage() as storage:
+        save_memory = peak_memory(lambda: storage.save(trials[0]))
+        results["save"] = latency_stats(
+            [timed(lambda trial=trial: storage.save(trial)) for trial in trials[1:]]
+        )
+        results["save"]["peak_memory_bytes"] = save_memory
+        stored_bytes = backend.stored_bytes(storage)
+        if stored_bytes is not None:
+            results["save"]["stored_bytes"] = stored_bytes
+
+        trial_ids = backend.trial_ids(trials)
+        get_memory = peak_memory(lambda: load_components(storage.get(trial_ids[0])))
+        results["get"] = latency_stats(
+            [
+                timed(lambda trial_id=trial_id: load_components(storage.get(trial_id)))
+                for trial_id in trial_ids[1:]
+            ]
+        )
+        results["get"]["peak_memory_bytes"] = get_memory
+
+        list_memory = peak_memory(lambda: storage.list(limit=len(trials)))
+        results["list"] = latency_stats(
+            [timed(lambda: storage.list(limit=len(trials))) for _ in range(repeat)]
+        )
+        results["list"]["peak_memory_bytes"] = list_memory
+    return results
+
+
+def package_version() -> str:
+    """Returns version of purplecaffeine under benchmark."""
+    version_path = os.path.join(os.path.dirname(purplecaffeine.__file__), "VERSION.txt")
+    with open(version_path, "r", encoding="utf-8") as file:
+        return file.read().strip()
+
+
+def git_commit() -> Optional[str]:
+    """Returns commit of the working tree, None outside of git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> int:
+    """Runs benchmarks and writes results file."""
+    selected = scenarios(quick=args.quick)
+    if args.scenarios:
+        selected = {name: selected[name] for name in args.scenarios}
+    results = []
+    for backend_name in args.backends:
+        backend = BACKENDS[backend_name]()
+        try:
+            for scenario, parameters in selected.items():
+                print(f"{backend_name} {scenario}...", flush=True)
+                results.append(
+                    {
+                        "backend": backend_name,
+                        "scenario": scenario,
+                        "parameters": parameters,
+                        "operations": run_scenario(backend, parameters, args.repeat),
+                    }
+                )
+        finally:
+            backend.close()
+
+    report = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {"purplecaffeine": package_version(), "qiskit": qiskit_version},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results are written to {args.output}.")
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Prints changes between two results files.
+
+    Returns:
+        1 if any median latency, peak memory or stored size grew more than threshold
+    """
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, "r", encoding="utf-8") as file:
+        current = json.load(file)
+    previous = {
+        (result["backend"], result["scenario"]): result["operations"]
+        for result in baseline["results"]
+    }
+
+    regressions = 0
+    print(f"{'backend':8} {'scenario':22} {'operation':9} {'metric':17} change")
+    for result in current["results"]:
+        operations = previous.get((result["backend"], result["scenario"]))
+        if operations is None:
+            continue
+        for operation, stats in result["operations"].items():
+            for metric in ("median_ms", "peak_memory_bytes", "stored_bytes"):
+                before = operations.get(operation, {}).get(metric)
+                if not before:
+                    continue
+                change = stats[metric] / before - 1
+                regressed = change > args.threshold
+                regressions += regressed
+                print(
+                    f"{result['backend']:8} {result['scenario']:22} {operation:9} "
+                    f"{metric:17} {change:+.1%}{' REGRESSION' if regressed else ''}"
+                )
+    print(
+        f"{regressions} regressions above {args.threshold:.0%} "
+        f"between {baseline.get('commit')} and {current.get('commit')}."
+    )
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs command line interface."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument(
+        "--backends", nargs="+", choices=sorted(BACKENDS), default=["local", "s3"]
+    )
+    run_parser.add_argument(
+        "--scenarios", nargs="+", help="names of scenarios, all if not set"
+    )
+    run_parser.add_argument(
+        "--quick", action="store_true", help="run a smaller set of scenarios"
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=5, help="number of list calls"
+    )
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="relative growth reported as regression",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,48 @@
     BaseStorage
     LocalStorage
     ApiStorage
+    CachingStorage
+    TieredStorage
 """
 
-from .core import Trial, LocalStorage, ApiStorage, BaseStorage
-from .widget import Widget
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import (
+        Trial,
+        LocalStorage,
+        ApiStorage,
+        BaseStorage,
+        CachingStorage,
+        TieredStorage,
+    )
+    from .widget import Widget
+
+# attributes are imported on first access, so that scripts using
+# local storage only do not import widget and its notebook dependencies
+_LAZY_ATTRIBUTES = {
+    "Trial": "core",
+    "LocalStorage": "core",
+    "ApiStorage": "core",
+    "BaseStorage": "core",
+    "CachingStorage": "core",
+    "TieredStorage": "core",
+    "Widget": "widget",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(
+            importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__), name
+        )
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,36 +1,95 @@
 """Core."""
+# pylint: disable=too-many-lines
 from __future__ import annotations
 
+import asyncio
 import glob
+import hashlib
+import importlib.util
+import io
 import json
 import logging
 import os
+import pickle
 import re
-import copy
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional, Union, List, Any, Dict
-from uuid import uuid4
+from typing import (
+    Optional,
+    Union,
+    List,
+    Any,
+    Dict,
+    Callable,
+    BinaryIO,
+    Tuple,
+    Type,
+)
+from uuid import UUID, uuid4
 
-import boto3
 import numpy as np
-import requests
-from pympler import asizeof
-from qiskit import __version__
+from qiskit import __version__, qpy
 from qiskit.circuit import QuantumCircuit
 from qiskit.quantum_info.operators import Operator
-from qiskit_ibm_runtime.utils import RuntimeEncoder
+from qiskit_ibm_runtime.utils import RuntimeDecoder, RuntimeEncoder
 
 from purplecaffeine.exception import PurpleCaffeineException
 from purplecaffeine.helpers import Configuration
-from purplecaffeine.utils import TrialEncoder, TrialDecoder
-
-
-class Trial:
+from purplecaffeine.utils import (
+    TrialEncoder,
+    TrialDecoder,
+    TrialIndex,
+    TrialJournal,
+    PackReader,
+    PackWriter,
+    decode_json,
+    encode_json,
+    BlobStore,
+    KeyLayout,
+    dump_json,
+    resolve_codec,
+    dumps_json,
+    load_json,
+    read_json,
+    encode_operator,
+    is_qubit_operator,
+    JOURNAL_FILE_NAME,
+    MetricLog,
+    estimate_size,
+    LRUCache,
+    DiskCache,
+    ReplicationQueue,
+    Deferred,
+    LazyField,
+    trial_summary,
+    match_summary,
+    ChangeTracked,
+    TrialChanges,
+    COMPONENT_FIELDS,
+    fingerprint,
+    Instrumentation,
+    INSTRUMENTED_METHODS,
+    instrumented,
+    bind_context,
+    span,
+    count_bytes,
+    active,
+    ENCODE,
+    IO,
+)
+
+
+class Trial(ChangeTracked):
     """Trial class.
 
     Attributes:
         description (str): short description of the trial
-        metrics (List[(str, Union[int, float])]): list of metric, like number of qubits
+        metrics (MetricLog): columnar log of metric, like number of qubits,
+            iterates as list of (str, Union[int, float])
         parameters (List[(str, str)]): list of parameter, like env details
         circuits (List[(str, QuantumCircuit)]): list of quantum circuit
         operators (List[(str, Operator)]): list of operator, like Pauli operators
@@ -40,15 +99,27 @@ class Trial:
             list of array, like quantum circuit results
         tags (List[str]): list of tags in string format
         versions (List[(str, str)]): list of qiskit version
+        changes (TrialChanges): fingerprints of components written to storages,
+            so that saves write only new and changed components.
+            Circuits, texts and artifacts changed in place are not seen
+            unless they are marked with ``changes.changed`` or
+            Configuration.CHANGE_HASHING is "all"
     """
 
+    # can be loaded on first access by storages
+    circuits = LazyField()
+    operators = LazyField()
+    texts = LazyField()
+    arrays = LazyField()
+    artifacts = LazyField()
+
     def __init__(
         self,
         name: str,
         uuid: Optional[str] = None,
         storage: Optional[BaseStorage] = None,
         description: Optional[str] = None,
-        metrics: Optional[List[List[Union[str, float]]]] = None,
+        metrics: Optional[Union[MetricLog, List[List[Union[str, float]]]]] = None,
         parameters: Optional[List[List[str]]] = None,
         circuits: Optional[List[List[Union[str, QuantumCircuit]]]] = None,
         operators: Optional[List[List[Union[str, Operator]]]] = None,
@@ -62,7 +133,8 @@ class Trial:
 
         Args:
             description (str): short description of the trial
-            metrics (List[(str, Union[int, float])]): list of metric, like number of qubits
+            metrics (Union[MetricLog, List[(str, Union[int, float])]]):
+                log or list of metric, like number of qubits
             parameters (List[(str, str)]): list of parameter, like env details
             circuits (List[(str, QuantumCircuit)]): list of quantum circuit
             operators (List[(str, Operator)]): list of operator, like Pauli operators
@@ -96,7 +168,7 @@ class Trial:
         self.description = description or os.environ.get(
             "PURPLE_CAFFEINE_TRIAL_DESCRIPTION", ""
         )
-        self.metrics = metrics or []
+        self.metrics = metrics if isinstance(metrics, MetricLog) else MetricLog(metrics)
         self.parameters = parameters or []
         self.circuits = circuits or []
         self.operators = operators or []
@@ -113,6 +185,12 @@ class Trial:
     def __repr__(self):
         return f"<Trial [{self.name}] {self.uuid}>"
 
+    def __setattr__(self, name: str, value: Any):
+        if name in COMPONENT_FIELDS and name in self.__dict__:
+            # replaced components are written by the next save
+            self.changes.changed(name)
+        super().__setattr__(name, value)
+
     def __enter__(self):
         return self
 
@@ -122,16 +200,23 @@ class Trial:
         Args:
             description: short description of the trial
         """
+        self._record("description", description)
         self.description = description
 
-    def add_metric(self, name: str, value: Union[int, float]):
+    def add_metric(
+        self, name: str, value: Union[int, float], step: Optional[int] = None
+    ):
         """Adds metric to trial data.
 
         Args:
             name: name of metric
             value: value of metric
+            step: step of the value, like optimizer iteration.
+                Defaults to number of previous values of the metric
         """
-        self.metrics.append([name, value])
+        timestamp = time.time()
+        self._record("metrics", [name, value, step, timestamp])
+        self.metrics.add(name, value, step=step, timestamp=timestamp)
 
     def add_parameter(self, name: str, value: str):
         """Adds parameter to trial data.
@@ -140,6 +225,7 @@ class Trial:
             name: name of the parameter, like OS
             value: value for the parameter, like Ubuntu
         """
+        self._record("parameters", [name, value])
         self.parameters.append([name, value])
 
     def add_circuit(self, name: str, circuit: QuantumCircuit):
@@ -149,6 +235,7 @@ class Trial:
             name: name of the circuit
             circuit: QuantumCircuit
         """
+        self._record("circuits", [name, circuit])
         self.circuits.append([name, circuit])
 
     def add_operator(self, name: str, operator: Operator):
@@ -158,21 +245,57 @@ class Trial:
             name: name of the parameter
             operator: quantum Operator
         """
+        self._record("operators", [name, operator])
         self.operators.append([name, operator])
 
     def add_artifact(self, name: str, artifact: Any):
         """Adds artifacts path to trial data.
 
+        Artifacts bigger than ``Configuration.MAX_SIZE`` are handled
+        according to ``Configuration.ARTIFACT_SIZE_POLICY``:
+        "warn" logs a warning, "reject" raises an exception and
+        "spill" pickles the artifact to disk and adds path of the file instead.
+
         Args:
             name: name of the file
             artifact: file object
         """
-        if asizeof.asizeof(artifact) >= Configuration.MAX_SIZE:
-            logging.warning(
-                "Your file is too big ! Limit : %s Bytes", str(Configuration.MAX_SIZE)
-            )
+        if estimate_size(artifact) >= Configuration.MAX_SIZE:
+            if Configuration.ARTIFACT_SIZE_POLICY == "reject":
+                raise PurpleCaffeineException(
+                    f"Artifact {name} is too big ! "
+                    f"Limit : {Configuration.MAX_SIZE} Bytes"
+                )
+            if Configuration.ARTIFACT_SIZE_POLICY == "spill":
+                artifact = self._spill_artifact(name, artifact)
+            else:
+                logging.warning(
+                    "Your file is too big ! Limit : %s Bytes",
+                    str(Configuration.MAX_SIZE),
+                )
+        self._record("artifacts", [name, artifact])
         self.artifacts.append([name, artifact])
 
+    def _spill_artifact(self, name: str, artifact: Any) -> str:
+        """Pickles artifact to a file.
+
+        Args:
+            name: name of the artifact
+            artifact: artifact object
+
+        Returns:
+            path of the file
+        """
+        spill_path = Configuration.ARTIFACT_SPILL_PATH or os.path.join(
+            tempfile.gettempdir(), "purplecaffeine"
+        )
+        Path(spill_path).mkdir(parents=True, exist_ok=True)
+        file_path = os.path.join(spill_path, f"artifact_{self.uuid}_{name}.pkl")
+        with open(file_path, "wb") as artifact_file:
+            pickle.dump(artifact, artifact_file)
+        logging.info("Artifact %s is spilled to %s", name, file_path)
+        return file_path
+
     def add_text(self, title: str, text: str):
         """Adds any text to trial data.
 
@@ -180,6 +303,7 @@ class Trial:
             title: title of the text
             text: long string
         """
+        self._record("texts", [title, text])
         self.texts.append([title, text])
 
     def add_array(self, name: str, array: Union[np.ndarray, List[Any]]):
@@ -189,6 +313,7 @@ class Trial:
             name: name of the array
             array: quantum circuit results
         """
+        self._record("arrays", [name, array])
         self.arrays.append([name, array])
 
     def add_tag(self, tag: str):
@@ -197,6 +322,7 @@ class Trial:
         Args:
             tag: word of your tag
         """
+        self._record("tags", tag)
         self.tags.append(tag)
 
     def add_version(self, name: str, value: str):
@@ -206,8 +332,20 @@ class Trial:
             name: name of the package
             value: version for the package
         """
+        self._record("versions", [name, value])
         self.versions.append([name, value])
 
+    def _record(self, field: str, entry: Any):
+        """Passes change of trial data to storage.
+
+        Args:
+            field: name of changed field
+            entry: added entry
+        """
+        if field in COMPONENT_FIELDS:
+            self.changes.changed(field, entry[0])
+        self.storage.record(trial=self, field=field, entry=entry)
+
     def save(self):
         """Save into Storage."""
         self.storage.save(trial=self)
@@ -226,40 +364,235 @@ class Trial:
         return self.storage.get(trial_id=trial_id)
 
     @staticmethod
-    def import_from_shared_file(path: str, trial_id: str) -> Trial:
+    def import_from_shared_file(
+        path: str, trial_id: Optional[str] = None, use_mmap: bool = True
+    ) -> Trial:
         """Import Trial for shared file.
 
+        Components are read from the file by offset, arrays and
+        dense operators of a memory-mapped file are read-only views of it.
+
         Args:
-            path: full path of the file
-            trial_id: trial id of the folder
+            path: full path of the file, or directory of the file
+            trial_id: trial id of the file or folder in directory
+            use_mmap: map the file into memory instead of reading it
 
         Returns:
             Trial dict object
         """
-
-        return LocalStorage(path).get(trial_id=trial_id)
+        if os.path.isdir(path):
+            pack_path = os.path.join(path, f"trial_{trial_id}{TRIAL_PACK_EXTENSION}")
+            if not os.path.isfile(pack_path):
+                # folders exported by older versions
+                return LocalStorage(path).get(trial_id=trial_id)
+            path = pack_path
+
+        with PackReader(path, use_mmap=use_mmap) as pack:
+            header = decode_json(pack.read("trial.json"), cls=TrialDecoder)
+            if trial_id is not None and header["uuid"] != trial_id:
+                raise PurpleCaffeineException(
+                    f"{path} holds trial {header['uuid']}, not {trial_id}."
+                )
+            for field, prefix in _PACKED_FIELDS:
+                header[field] = [
+                    _unpack_component(pack, prefix, name, value)
+                    for name, value in header[field]
+                ]
+        return Trial(**header)
 
     def export_to_shared_file(self, path: str) -> str:
         """Export trial to shared file.
 
+        Trial is streamed into a single file holding header and components,
+        which is read back by :meth:`import_from_shared_file`.
+
         Args:
             path: path directory for the file
 
         Returns:
             Full path of the file
         """
-        self.storage.path = path
-        self.storage.save(trial=self)
-
-        return os.path.join(path, f"trial_{self.uuid}")
+        Path(path).mkdir(parents=True, exist_ok=True)
+        pack_path = os.path.join(path, f"trial_{self.uuid}{TRIAL_PACK_EXTENSION}")
+        header = dict(self.__dict__)
+        with PackWriter(pack_path) as pack:
+            for field, prefix in _PACKED_FIELDS:
+                header[field] = [
+                    _pack_component(pack, prefix, name, value)
+                    for name, value in getattr(self, field)
+                ]
+            # header is written last, after entries of its components
+            with pack.member("trial.json") as stream:
+                dump_json(header, stream, "none", cls=TrialEncoder)
+
+        return pack_path
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.add_version("qiskit", __version__)
         self.save()
 
 
+def _component_file(prefix: str, name: str, value: Any) -> Optional[str]:
+    """Returns file name of a component stored apart from trial.json.
+
+    Args:
+        prefix: prefix of component files, like circuit
+        name: name of the component
+        value: value of the component in trial.json
+
+    Returns:
+        file name or None if component is stored inside trial.json
+    """
+    if isinstance(value, str):
+        for extension in ["json", "npy"]:
+            if value == f"Check the {prefix}_{name}.{extension} file.":
+                return f"{prefix}_{name}.{extension}"
+    return None
+
+
+TRIAL_PACK_EXTENSION = ".pack"
+# (field, prefix of member names) of components stored apart from the header
+_PACKED_FIELDS = [
+    ("circuits", "circuit"),
+    ("operators", "operator"),
+    ("texts", "text"),
+    ("arrays", "array"),
+    ("artifacts", "artifact"),
+]
+
+
+def _pack_component(pack: PackWriter, prefix: str, name: str, value: Any) -> List[Any]:
+    """Streams component into a member of a trial pack.
+
+    Args:
+        pack: trial pack
+        prefix: prefix of member names, like circuit
+        name: name of the component
+        value: component
+
+    Returns:
+        entry of the component for the header
+    """
+    if prefix == "circuit" and isinstance(value, QuantumCircuit):
+        member = f"circuit_{name}.qpy"
+        with pack.member(member) as stream:
+            qpy.dump(value, stream)
+    elif prefix == "operator":
+        if not isinstance(value, Operator) or not is_qubit_operator(value):
+            return [name, value]
+        encoded = encode_operator(value)
+        if encoded is not None:
+            return [name, encoded]
+        member = f"operator_{name}.npy"
+        with pack.member(member) as stream:
+            np.save(stream, value.data)
+    elif prefix == "array" and isinstance(value, np.ndarray) and value.dtype != object:
+        member = f"array_{name}.npy"
+        with pack.member(member) as stream:
+            np.save(stream, value)
+    else:
+        member = f"{prefix}_{name}.json"
+        with pack.member(member) as stream:
+            dump_json(
+                [name, value],
+                stream,
+                "none",
+                cls=TrialEncoder if prefix == "artifact" else RuntimeEncoder,
+            )
+    return [name, f"Check the {member} member."]
+
+
+def _unpack_component(
+    pack: PackReader, prefix: str, name: str, value: Any
+) -> List[Any]:
+    """Reads component of a trial pack.
+
+    Args:
+        pack: trial pack
+        prefix: prefix of member names, like circuit
+        name: name of the component
+        value: entry of the component in the header
+
+    Returns:
+        component
+    """
+    members = [f"{prefix}_{name}.{extension}" for extension in ["qpy", "npy", "json"]]
+    member = next(
+        (member for member in members if value == f"Check the {member} member."),
+        None,
+    )
+    if member is None:
+        # stored inside the header
+        return [name, value]
+    if member.endswith(".qpy"):
+        return [name, qpy.load(io.BytesIO(pack.view(member)))[0]]
+    if member.endswith(".npy"):
+        array = pack.array(member)
+        return [name, Operator(array) if prefix == "operator" else array]
+    return decode_json(bytes(pack.view(member)), cls=TrialDecoder)
+
+
+def _is_uuid(name: str) -> bool:
+    """Returns True if name is a uuid."""
+    try:
+        UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+async def _run_blocking(function: Callable, *args, **kwargs) -> Any:
+    """Runs blocking function in default executor of running loop."""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, bind_context(partial(function, *args, **kwargs))
+    )
+
+
+async def _gather_bounded(coroutines: List[Any], max_concurrency: int) -> List[Any]:
+    """Awaits coroutines with at most max_concurrency of them running at once."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
+
+
 class BaseStorage:
-    """Base storage class."""
+    """Base storage class.
+
+    Async methods run blocking methods in the default executor of the loop,
+    storages with non-blocking clients override them.
+
+    Save, get and list methods of all storages are recorded
+    by the instrumentation of the storage, see :meth:`instrument`.
+    """
+
+    instrumentation: Optional[Instrumentation] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in INSTRUMENTED_METHODS:
+            if name in vars(cls):
+                setattr(cls, name, instrumented(vars(cls)[name]))
+
+    def instrument(self, instrumentation: Optional[Instrumentation]) -> BaseStorage:
+        """Records save, get and list calls of the storage.
+
+        Example:
+            >>> instrumentation = Instrumentation([JsonLinesExporter("./spans.jsonl")])
+            >>> storage = LocalStorage("./").instrument(instrumentation)
+            >>> print_breakdown(instrumentation)
+
+        Args:
+            instrumentation: collector of operations, None to stop recording
+
+        Returns:
+            the storage
+        """
+        self.instrumentation = instrumentation
+        return self
 
     def save(self, trial: Trial):
         """Saves given trial.
@@ -269,6 +602,103 @@ class BaseStorage:
         """
         raise NotImplementedError
 
+    @instrumented
+    def save_many(self, trials: List[Trial]) -> List[Any]:
+        """Saves given trials one by one.
+
+        Storages supporting bulk or parallel writes override it.
+
+        Args:
+            trials: trials to save
+
+        Returns:
+            results of save for every trial
+        """
+        return [self.save(trial) for trial in trials]
+
+    @instrumented
+    async def asave(self, trial: Trial) -> Any:
+        """Saves given trial without blocking event loop.
+
+        Args:
+            trial: trial to save
+
+        Returns:
+            result of save
+        """
+        return await _run_blocking(self.save, trial)
+
+    @instrumented
+    async def aget(self, trial_id: str) -> Trial:
+        """Returns trial by id without blocking event loop.
+
+        Args:
+            trial_id: trial id
+
+        Returns:
+            trial: object of a trial
+        """
+        return await _run_blocking(self.get, trial_id)
+
+    @instrumented
+    async def alist(
+        self,
+        query: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        **kwargs,
+    ) -> List[Trial]:
+        """Returns list of trials without blocking event loop.
+
+        Args:
+            query: search query
+            limit: limit
+            offset: offset
+            **kwargs: other filtering criteria
+
+        Returns:
+            list of trials
+        """
+        return await _run_blocking(
+            self.list, query=query, limit=limit, offset=offset, **kwargs
+        )
+
+    @instrumented
+    async def asave_many(
+        self, trials: List[Trial], max_concurrency: Optional[int] = None
+    ) -> List[Any]:
+        """Saves given trials without blocking event loop.
+
+        Args:
+            trials: trials to save
+            max_concurrency: number of trials saved at once,
+                Configuration.ASYNC_MAX_CONCURRENCY if None
+
+        Returns:
+            results of save for every trial, in order of trials
+        """
+        return await _gather_bounded(
+            [self.asave(trial) for trial in trials],
+            max_concurrency or Configuration.ASYNC_MAX_CONCURRENCY,
+        )
+
+    def _save_concurrently(
+        self, trials: List[Trial], max_workers: Optional[int] = None
+    ) -> List[Any]:
+        """Saves given trials from a pool of threads.
+
+        Args:
+            trials: trials to save
+            max_workers: number of threads, Configuration.SAVE_MAX_WORKERS if None
+
+        Returns:
+            results of save for every trial, in order of trials
+        """
+        with ThreadPoolExecutor(
+            max_workers=max_workers or Configuration.SAVE_MAX_WORKERS
+        ) as executor:
+            return list(executor.map(bind_context(self.save), trials))
+
     def list(
         self,
         query: Optional[str] = None,
@@ -289,6 +719,18 @@ class BaseStorage:
         """
         raise NotImplementedError
 
+    def record(self, trial: Trial, field: str, entry: Any):
+        """Records change of trial data before it is saved.
+
+        Called by trial on every added entry,
+        storages supporting incremental writes can override it.
+
+        Args:
+            trial: changed trial
+            field: name of changed field
+            entry: added entry
+        """
+
     def get(self, trial_id: str) -> Trial:
         """Returns trail by id.
 
@@ -309,9 +751,15 @@ class ApiStorage(BaseStorage):
         username: Optional[str] = None,
         password: Optional[str] = None,
         host: Optional[str] = None,
+        codec: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        retries: Optional[int] = None,
     ):
         """Creates storage for APIServer.
 
+        Connections are kept alive in a pool and the access token
+        is refreshed before it expires. Storage can be shared between threads.
+
         Example:
             >>> storage = ApiStorage(
             >>>     host="http://localhost:8000/",
@@ -323,6 +771,12 @@ class ApiStorage(BaseStorage):
             username: username
             password: password
             host: host of api server
+            codec: compression of sent trials, "none" or "gzip",
+                Configuration.CODEC if None
+            pool_size: number of kept alive connections,
+                Configuration.API_POOL_SIZE if None
+            retries: number of retries with backoff of failed requests,
+                Configuration.API_RETRIES if None
         """
         self.username = username or os.environ.get(
             "PURPLE_CAFFEINE_API_STORAGE_USERNAME"
@@ -344,23 +798,111 @@ class ApiStorage(BaseStorage):
                 "Please specify api storage host or configure it using env variables"
             )
 
-        self.token = self._get_token(self.username, self.password)
+        self.codec = resolve_codec(codec)
+        if self.codec not in ("none", "gzip"):
+            raise ValueError(
+                f"Api storage accepts 'none' or 'gzip' codecs, got {self.codec}."
+            )
 
-    def _get_token(self, username: str, password: str) -> str:
-        """Returns token based on username and password
+        # requests is imported by api storages only
+        # pylint: disable=import-outside-toplevel
+        from purplecaffeine.utils.session import ApiSession, AsyncApiSession
 
-        Returns:
-            authorization token
-        """
-        payload = {"username": f"{username}", "password": f"{password}"}
-        curl_req = requests.post(
-            f"{self.host}/{Configuration.API_TOKEN_ENDPOINT}/",
-            headers=Configuration.API_HEADERS,
-            json=payload,
-            timeout=Configuration.API_TIMEOUT,
+        self.session = ApiSession(
+            self.host,
+            self.username,
+            self.password,
+            pool_size=pool_size,
+            retries=retries,
+        )
+        self.async_session = AsyncApiSession(
+            self.host,
+            self.username,
+            self.password,
+            pool_size=pool_size,
+            retries=retries,
         )
+        # fail early on wrong credentials
+        _ = self.session.token
+
+    @property
+    def token(self) -> str:
+        """Access token of api server."""
+        return self.session.token
+
+    @staticmethod
+    def _native_async() -> bool:
+        """Returns True if httpx is installed for non-blocking requests."""
+        return importlib.util.find_spec("httpx") is not None
+
+    def _payload(self, obj: Any) -> Dict[str, Any]:
+        """Returns arguments of request sending obj as json body."""
+        headers = {}
+        if self.codec == "gzip":
+            headers["Content-Encoding"] = "gzip"
+        return {
+            "headers": headers,
+            "data": dumps_json(obj, self.codec, cls=TrialEncoder),
+        }
+
+    @staticmethod
+    def _bulk_errors(batch: List[Trial], response: Any) -> List[Any]:
+        """Returns names and errors of trials rejected by bulk endpoint."""
+        if response.status_code not in (201, 207, 400):
+            raise PurpleCaffeineException(
+                f"Error response from api server on bulk save: {response.text}"
+            )
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        results = body.get("results") if isinstance(body, dict) else None
+        if results is None:
+            if response.status_code == 201:
+                return []
+            # whole request was rejected, like a body which can not be parsed
+            return [(trial.name, body or response.text) for trial in batch]
+        return [
+            (batch[result["index"]].name, result["errors"])
+            for result in results
+            if result["status"] != 201
+        ]
+
+    @staticmethod
+    def _read_trial(response: Any) -> Trial:
+        """Returns trial from response of trial endpoint."""
+        if response.status_code == 404:
+            raise ValueError(response.json())
+
+        trial_json = decode_json(response.content, cls=TrialDecoder)
+        if "id" in trial_json:
+            del trial_json["id"]
+
+        return Trial(**trial_json)
+
+    @staticmethod
+    def _list_params(
+        query: Optional[str], limit: Optional[int], offset: Optional[int]
+    ) -> Dict[str, Any]:
+        """Returns query parameters of list request."""
+        params = {"offset": offset or 0, "limit": limit or 10}
+        if query is not None:
+            params["query"] = query
+        return params
+
+    @staticmethod
+    def _read_list(response: Any) -> List[Trial]:
+        """Returns trials from response of list endpoint."""
+        trials = []
+        page = decode_json(response.content, cls=TrialDecoder)
+        for trial_json in page["results"] if isinstance(page, dict) else page:
+            if "id" in trial_json:
+                del trial_json["id"]
+            if "uuid" in trial_json:
+                del trial_json["uuid"]
+            trials.append(trial_json)
 
-        return curl_req.json()["access"]
+        return trials
 
     def save(self, trial: Trial):
         """Saves given trial.
@@ -368,18 +910,47 @@ class ApiStorage(BaseStorage):
         Args:
             trial: encode trial to save
         """
-        requests.post(
-            f"{self.host}/{Configuration.API_TRIAL_ENDPOINT}/",
-            headers={
-                **Configuration.API_HEADERS,
-                "Authorization": f"Bearer {self.token}",
-            },
-            json=json.loads(json.dumps(trial.__dict__, cls=TrialEncoder)),
-            timeout=Configuration.API_TIMEOUT,
+        self.session.request(
+            "POST",
+            f"{Configuration.API_TRIAL_ENDPOINT}/",
+            **self._payload(trial.__dict__),
         )
 
         return trial.name
 
+    def save_many(
+        self, trials: List[Trial], batch_size: Optional[int] = None
+    ) -> List[Any]:
+        """Saves given trials through bulk endpoint.
+
+        Example:
+            >>> storage.save_many(trials, batch_size=500)
+
+        Args:
+            trials: trials to save
+            batch_size: number of trials sent in a single request,
+                Configuration.API_BATCH_SIZE if None
+
+        Returns:
+            names of saved trials
+        """
+        batch_size = batch_size or Configuration.API_BATCH_SIZE
+        errors = []
+        for start in range(0, len(trials), batch_size):
+            batch = trials[start : start + batch_size]
+            curl_req = self.session.request(
+                "POST",
+                f"{Configuration.API_TRIAL_ENDPOINT}/bulk/",
+                **self._payload([trial.__dict__ for trial in batch]),
+            )
+            if curl_req.status_code == 404 and start == 0:
+                # server without bulk endpoint, no trial was saved yet
+                return super().save_many(trials)
+            errors.extend(self._bulk_errors(batch, curl_req))
+        if errors:
+            raise PurpleCaffeineException(f"Trials were not saved: {errors}")
+        return [trial.name for trial in trials]
+
     def get(self, trial_id: str) -> Trial:
         """Returns trial by name.
 
@@ -389,22 +960,11 @@ class ApiStorage(BaseStorage):
         Returns:
             trial: object of a trial
         """
-        curl_req = requests.get(
-            f"{self.host}/{Configuration.API_TRIAL_ENDPOINT}/{trial_id}/",
-            headers={
-                **Configuration.API_HEADERS,
-                "Authorization": f"Bearer {self.token}",
-            },
-            timeout=Configuration.API_TIMEOUT,
+        return self._read_trial(
+            self.session.request(
+                "GET", f"{Configuration.API_TRIAL_ENDPOINT}/{trial_id}/"
+            )
         )
-        if "Not found." in str(curl_req.json()):
-            raise ValueError(curl_req.json())
-
-        trial_json = json.loads(json.dumps(curl_req.json()), cls=TrialDecoder)
-        if "id" in trial_json:
-            del trial_json["id"]
-
-        return Trial(**trial_json)
 
     def list(
         self,
@@ -424,122 +984,113 @@ class ApiStorage(BaseStorage):
         Returns:
             list of trials
         """
-        offset = offset or 0
-        limit = limit or 10
-        trials = []
-
-        curl_req = requests.get(
-            f"""
-                {self.host}/{Configuration.API_TRIAL_ENDPOINT}/
-                ?query={query}&offset={offset}&limit={limit}/
-            """,
-            headers={
-                **Configuration.API_HEADERS,
-                "Authorization": f"Bearer {self.token}",
-            },
-            timeout=Configuration.API_TIMEOUT,
-        )
-        for elem in curl_req.json():
-            trial_json = json.loads(json.dumps(elem), cls=TrialDecoder)
-            if "id" in trial_json:
-                del trial_json["id"]
-            if "uuid" in trial_json:
-                del trial_json["uuid"]
-            trials.append(trial_json)
-
-        return trials
-
-
-class LocalStorage(BaseStorage):
-    """Local storage."""
+        return self._read_list(
+            self.session.request(
+                "GET",
+                f"{Configuration.API_TRIAL_ENDPOINT}/",
+                params=self._list_params(query, limit, offset),
+            )
+        )
 
-    def __init__(self, path: Optional[str] = None):
-        """Creates local storage for storing trial data
-        at local folder.
+    async def asave(self, trial: Trial) -> Any:
+        """Saves given trial with non-blocking request.
 
-        Example:
-            >>> storage = LocalStorage("./")
+        Trial is encoded in the default executor of the loop.
 
         Args:
-            path: path for the local storage folder
+            trial: trial to save
+
+        Returns:
+            name of the trial
         """
-        self.path = path or os.environ.get("PURPLE_CAFFEINE_LOCAL_STORAGE_PATH", "./")
-        if not os.path.exists(self.path):
-            Path(self.path).mkdir(parents=True, exist_ok=True)
+        if not self._native_async():
+            return await super().asave(trial)
+        payload = await _run_blocking(self._payload, trial.__dict__)
+        await self.async_session.request(
+            "POST", f"{Configuration.API_TRIAL_ENDPOINT}/", **payload
+        )
+        return trial.name
 
-    def save(self, trial: Trial) -> str:
-        """Saves given trial.
+    async def asave_many(
+        self,
+        trials: List[Trial],
+        max_concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Any]:
+        """Saves given trials through bulk endpoint with non-blocking requests.
 
         Args:
-            trial: encode trial to save
+            trials: trials to save
+            max_concurrency: number of requests in flight,
+                Configuration.ASYNC_MAX_CONCURRENCY if None
+            batch_size: number of trials sent in a single request,
+                Configuration.API_BATCH_SIZE if None
 
         Returns:
-            self.path: path of the trial file
+            names of saved trials
         """
-        save_path = os.path.join(self.path, f"trial_{trial.uuid}")
-        if not os.path.isdir(save_path):
-            os.makedirs(save_path)
-
-        for circuit in trial.circuits:
-            save_circuit = os.path.join(save_path, f"circuit_{circuit[0]}.json")
-            with open(save_circuit, "w", encoding="utf-8") as circuit_file:
-                json.dump(circuit, circuit_file, cls=RuntimeEncoder, indent=4)
-            circuit[1] = f"Check the circuit_{circuit[0]}.json file."
-
-        for text in trial.texts:
-            save_text = os.path.join(save_path, f"text_{text[0]}.json")
-            with open(save_text, "w", encoding="utf-8") as text_file:
-                json.dump(text, text_file, cls=RuntimeEncoder, indent=4)
-            text[1] = f"Check the text_{text[0]}.json file."
-
-        with open(
-            os.path.join(save_path, "trial.json"), "w", encoding="utf-8"
-        ) as trial_file:
-            json.dump(trial.__dict__, trial_file, cls=TrialEncoder, indent=4)
-
-        return self.path
+        if not self._native_async():
+            return await _run_blocking(self.save_many, trials, batch_size)
+        batch_size = batch_size or Configuration.API_BATCH_SIZE
+        batches = [
+            trials[start : start + batch_size]
+            for start in range(0, len(trials), batch_size)
+        ]
+
+        async def send_batch(batch: List[Trial]) -> Any:
+            payload = await _run_blocking(
+                self._payload, [trial.__dict__ for trial in batch]
+            )
+            return await self.async_session.request(
+                "POST", f"{Configuration.API_TRIAL_ENDPOINT}/bulk/", **payload
+            )
 
-    def get(self, trial_id: str) -> Trial:
-        """Read a given trial file.
+        async def save_batch(batch: List[Trial]) -> List[Any]:
+            return self._bulk_errors(batch, await send_batch(batch))
+
+        if not batches:
+            return []
+        # first batch is sent alone, so that no trial is saved twice
+        # if server has no bulk endpoint
+        response = await send_batch(batches[0])
+        if response.status_code == 404:
+            await BaseStorage.asave_many(self, trials, max_concurrency)
+            return [trial.name for trial in trials]
+        errors = self._bulk_errors(batches[0], response)
+        for batch_errors in await _gather_bounded(
+            [save_batch(batch) for batch in batches[1:]],
+            max_concurrency or Configuration.ASYNC_MAX_CONCURRENCY,
+        ):
+            errors.extend(batch_errors)
+        if errors:
+            raise PurpleCaffeineException(f"Trials were not saved: {errors}")
+        return [trial.name for trial in trials]
+
+    async def aget(self, trial_id: str) -> Trial:
+        """Returns trial by id with non-blocking request.
 
         Args:
-            trial_id: trial uuid
+            trial_id: trial id
 
         Returns:
             trial: object of a trial
         """
-        trial_path = os.path.join(self.path, f"trial_{trial_id}")
-        if not os.path.isfile(os.path.join(trial_path, "trial.json")):
-            logging.warning(
-                "Your file %s does not exist.",
-                trial_path,
+        if not self._native_async():
+            return await super().aget(trial_id)
+        return self._read_trial(
+            await self.async_session.request(
+                "GET", f"{Configuration.API_TRIAL_ENDPOINT}/{trial_id}/"
             )
-            raise ValueError(trial_id)
-        with open(
-            os.path.join(trial_path, "trial.json"), "r", encoding="utf-8"
-        ) as trial_file:
-            trial = Trial(**json.load(trial_file, cls=TrialDecoder))
-
-            for index, circuit in enumerate(copy.copy(trial.circuits)):
-                circ_path = os.path.join(trial_path, f"circuit_{circuit[0]}.json")
-                with open(circ_path, "r", encoding="utf-8") as circ_file:
-                    trial.circuits[index] = json.load(circ_file, cls=TrialDecoder)
-
-            for index, text in enumerate(copy.copy(trial.texts)):
-                text_path = os.path.join(trial_path, f"text_{text[0]}.json")
-                with open(text_path, "r", encoding="utf-8") as text_file:
-                    trial.texts[index] = json.load(text_file, cls=TrialDecoder)
-
-            return trial
+        )
 
-    def list(
+    async def alist(
         self,
-        query: Optional[str] = None,  # pylint: disable=unused-argument
+        query: Optional[str] = None,
         limit: Optional[int] = None,
         offset: Optional[int] = None,
         **kwargs,
     ) -> List[Trial]:
-        """Returns list of trials.
+        """Returns list of trials with non-blocking request.
 
         Args:
             query: search query
@@ -550,58 +1101,711 @@ class LocalStorage(BaseStorage):
         Returns:
             list of trials
         """
-        offset = offset or 0
-        limit = limit or 10
-
-        trials_path = glob.glob(f"{self.path}/trial_*")
-        trials_path.sort(key=os.path.getmtime, reverse=True)
-        trials = []
-        for path in trials_path:
-            trials.append(
-                self.get(
-                    trial_id=re.search(r"trial_([^/]+)", os.path.basename(path)).group(
-                        1
-                    )
-                )
+        if not self._native_async():
+            return await super().alist(query, limit, offset, **kwargs)
+        return self._read_list(
+            await self.async_session.request(
+                "GET",
+                f"{Configuration.API_TRIAL_ENDPOINT}/",
+                params=self._list_params(query, limit, offset),
             )
-
-        if query:
-            trials = [
-                trial
-                for trial in trials
-                if (query in trial.tags)
-                or (trial.name.find(query) != -1)
-                or (trial.description.find(query) != -1)
-            ]
-
-        trials = trials[offset : offset + limit]
-        return trials
+        )
 
 
-class S3Storage(BaseStorage):
-    """S3 storage."""
+class LocalStorage(BaseStorage):
+    """Local storage."""
 
     def __init__(
         self,
-        bucket_name: Optional[str] = None,
-        access_key: Optional[str] = None,
-        secret_access_key: Optional[str] = None,
-        directory: Optional[str] = None,
-        endpoint_url: Optional[str] = None,
+        path: Optional[str] = None,
+        lazy: bool = True,
+        journal: bool = False,
+        fsync_every: int = 100,
+        circuit_format: str = "json",
+        codec: Optional[str] = None,
+        dedup: bool = False,
     ):
-        """Storage storage for s3 buckets.
-
-        Allows to store trial data inside s3 buckets.
+        """Creates local storage for storing trial data
+        at local folder.
 
         Example:
-            >>> storage = S3Storage("my_bucket", key="<AWS_KEY>", access_key="<AWS_ACCESS_KEY>")
+            >>> storage = LocalStorage("./", journal=True)
 
         Args:
-            bucket_name: bucket name
-            access_key: aws key
+            path: path for the local storage folder
+            lazy: load circuits, texts and arrays of a trial on first access
+            journal: append every change of a trial to a journal file
+                inside the trial folder, so unsaved data survives a crash
+            fsync_every: number of journal records between syncs to disk
+            circuit_format: "json" to write a file per circuit or
+                "qpy" to write all circuits of a trial into a single
+                circuits.qpy container, readable circuit by circuit
+            codec: compression of json files, "none", "gzip" or "zstd",
+                Configuration.CODEC if None. Files of any codec are read.
+            dedup: store circuits, operators, texts and arrays files in a
+                content-addressed blob store under the storage folder,
+                equal files of different trials are stored once.
+                Run :meth:`collect_garbage` to remove unreferenced blobs.
+        """
+        self.lazy = lazy
+        self.journal = journal
+        self.fsync_every = fsync_every
+        self.circuit_format = circuit_format
+        self.codec = resolve_codec(codec)
+        self.dedup = dedup
+        self._journals: Dict[str, TrialJournal] = {}
+        self.path = path or os.environ.get("PURPLE_CAFFEINE_LOCAL_STORAGE_PATH", "./")
+        if not os.path.exists(self.path):
+            Path(self.path).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        """Path of the local storage folder."""
+        return self._path
+
+    @path.setter
+    def path(self, path: str):
+        self._path = path
+        self._index = TrialIndex(path)
+        self._index_lock = threading.Lock()
+        self._blobs = BlobStore(path)
+
+    def save(self, trial: Trial) -> str:
+        """Saves given trial.
+
+        Components written by an earlier save of the trial are not
+        written again unless they changed, see :class:`TrialChanges`,
+        trial.json is always rewritten. Trial itself is not modified.
+
+        Args:
+            trial: encode trial to save
+
+        Returns:
+            self.path: path of the trial file
+        """
+        save_path = os.path.join(self.path, f"trial_{trial.uuid}")
+        if not os.path.isdir(save_path):
+            os.makedirs(save_path)
+        location = os.path.abspath(save_path)
+        tokens = {
+            (field, name): fingerprint(value)
+            for field in ("circuits", "texts", "arrays", "operators")
+            for name, value in getattr(trial, field)
+        }
+        # metric log only grows, so it is unchanged while it has the same length
+        tokens[("metrics", "")] = ("metrics", id(trial.metrics), len(trial.metrics))
+
+        def pending(field: str, name: str, file_name: str) -> bool:
+            return not trial.changes.is_written(
+                location, field, name, tokens[(field, name)]
+            ) or not os.path.isfile(os.path.join(save_path, file_name))
+
+        header = {
+            **trial.__dict__,
+            "metrics": self._save_metrics(save_path, trial.metrics, pending),
+            "circuits": self._save_circuits(save_path, trial.circuits, pending),
+            "texts": self._save_texts(save_path, trial.texts, pending),
+            "arrays": self._save_arrays(save_path, trial.arrays, pending),
+            "operators": self._save_operators(
+                save_path, trial.operators, pending, tokens
+            ),
+            "artifacts": trial.artifacts,
+        }
+        self._write_file(
+            os.path.join(save_path, "trial.json"),
+            lambda file: dump_json(
+                header,
+                file,
+                self.codec,
+                cls=TrialEncoder,
+                indent=4 if self.codec == "none" else None,
+            ),
+            shared=False,
+        )
+        trial.changes.written(
+            location, [(field, name, token) for (field, name), token in tokens.items()]
+        )
+
+        self._ensure_index()
+        self._index.add(trial_summary(trial, mtime=time.time()))
+
+        # saved trial replaces the journal
+        if trial.uuid in self._journals:
+            self._journals.pop(trial.uuid).remove()
+        elif os.path.isfile(os.path.join(save_path, JOURNAL_FILE_NAME)):
+            os.remove(os.path.join(save_path, JOURNAL_FILE_NAME))
+
+        return self.path
+
+    def save_many(
+        self, trials: List[Trial], max_workers: Optional[int] = None
+    ) -> List[Any]:
+        """Saves given trials in parallel.
+
+        Args:
+            trials: trials to save
+            max_workers: number of threads, Configuration.SAVE_MAX_WORKERS if None
+
+        Returns:
+            results of save for every trial
+        """
+        return self._save_concurrently(trials, max_workers)
+
+    def _write_file(
+        self, path: str, write: Callable[[BinaryIO], None], shared: bool = True
+    ):
+        """Writes file of a trial.
+
+        Args:
+            path: path of the file
+            write: writes content into given stream
+            shared: file can be shared with other trials through blob store
+        """
+        with span(IO):
+            if shared and self.dedup:
+                self._blobs.store(path, write)
+            else:
+                # written next to path and moved in place, so content
+                # shared with other trials or memory-mapped by loaded
+                # trials is never overwritten
+                tmp_path = f"{path}.{uuid4().hex}.tmp"
+                try:
+                    with open(tmp_path, "xb") as file:
+                        write(file)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            if active():
+                count_bytes(sent=os.path.getsize(path))
+
+    def _write_json(self, path: str, obj: Any, cls: Type[json.JSONEncoder]):
+        """Writes json file of a trial, indented if not compressed.
+
+        Args:
+            path: path of the file
+            obj: object to encode
+            cls: json encoder
+        """
+        self._write_file(
+            path,
+            lambda file: dump_json(
+                obj,
+                file,
+                self.codec,
+                cls=cls,
+                indent=4 if self.codec == "none" else None,
+            ),
+        )
+
+    def _save_metrics(
+        self,
+        save_path: str,
+        metrics: MetricLog,
+        pending: Callable[[str, str, str], bool],
+    ) -> Union[str, List[List[Any]]]:
+        """Writes columns of metrics of a trial to metrics.npz, if they changed.
+
+        Args:
+            save_path: path of the trial folder
+            metrics: metrics of the trial
+            pending: returns True if (field, name, file name) must be written
+
+        Returns:
+            metrics entry for trial.json
+        """
+        if not metrics:
+            return []
+        if pending("metrics", "", "metrics.npz"):
+            arrays = metrics.to_arrays(partial(encode_json, cls=RuntimeEncoder))
+            self._write_file(
+                os.path.join(save_path, "metrics.npz"),
+                partial(np.savez, **arrays),
+                shared=False,
+            )
+        return "Check the metrics.npz file."
+
+    def _save_circuits(
+        self,
+        save_path: str,
+        circuits: List[List[Any]],
+        pending: Callable[[str, str, str], bool],
+    ) -> List[List[Any]]:
+        """Writes new and changed circuits of a trial to their files.
+
+        Args:
+            save_path: path of the trial folder
+            circuits: circuits of the trial
+            pending: returns True if (field, name, file name) must be written
+
+        Returns:
+            circuits entries for trial.json
+        """
+        if self.circuit_format == "qpy" and len(circuits) > 0:
+            pack_path = os.path.join(save_path, "circuits.qpy")
+            # circuits share a single file, it is rewritten if any of them changed
+            if any(pending("circuits", name, "circuits.qpy") for name, _ in circuits):
+                with span(IO), PackWriter(pack_path) as pack:
+                    for name, circuit in circuits:
+                        with pack.member(name) as stream:
+                            qpy.dump(circuit, stream)
+                if self.dedup:
+                    self._blobs.adopt(pack_path)
+            return [[name, "Check the circuits.qpy file."] for name, _ in circuits]
+
+        entries = []
+        for name, circuit in circuits:
+            file_name = f"circuit_{name}.json"
+            if pending("circuits", name, file_name):
+                self._write_json(
+                    os.path.join(save_path, file_name),
+                    [name, circuit],
+                    cls=RuntimeEncoder,
+                )
+            entries.append([name, f"Check the {file_name} file."])
+        return entries
+
+    def _save_texts(
+        self,
+        save_path: str,
+        texts: List[List[Any]],
+        pending: Callable[[str, str, str], bool],
+    ) -> List[List[Any]]:
+        """Writes new and changed texts of a trial to their files.
+
+        Args:
+            save_path: path of the trial folder
+            texts: texts of the trial
+            pending: returns True if (field, name, file name) must be written
+
+        Returns:
+            texts entries for trial.json
+        """
+        entries = []
+        for name, text in texts:
+            file_name = f"text_{name}.json"
+            if pending("texts", name, file_name):
+                self._write_json(
+                    os.path.join(save_path, file_name),
+                    [name, text],
+                    cls=RuntimeEncoder,
+                )
+            entries.append([name, f"Check the {file_name} file."])
+        return entries
+
+    def _save_arrays(
+        self,
+        save_path: str,
+        arrays: List[List[Any]],
+        pending: Callable[[str, str, str], bool],
+    ) -> List[List[Any]]:
+        """Writes new and changed arrays of a trial to their files.
+
+        Args:
+            save_path: path of the trial folder
+            arrays: arrays of the trial
+            pending: returns True if (field, name, file name) must be written
+
+        Returns:
+            arrays entries for trial.json
+        """
+        entries = []
+        for name, array in arrays:
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                # raw binary file, memory-mapped on read
+                file_name = f"array_{name}.npy"
+                if pending("arrays", name, file_name):
+                    self._write_file(
+                        os.path.join(save_path, file_name),
+                        partial(np.save, arr=array),
+                    )
+            else:
+                file_name = f"array_{name}.json"
+                if pending("arrays", name, file_name):
+                    self._write_json(
+                        os.path.join(save_path, file_name),
+                        [name, array],
+                        cls=RuntimeEncoder,
+                    )
+            entries.append([name, f"Check the {file_name} file."])
+        return entries
+
+    def _save_operators(
+        self,
+        save_path: str,
+        operators: List[List[Any]],
+        pending: Callable[[str, str, str], bool],
+        tokens: Dict[Tuple[str, str], Any],
+    ) -> List[List[Any]]:
+        """Encodes operators of a trial, writes new and changed dense ones to files.
+
+        Args:
+            save_path: path of the trial folder
+            operators: operators of the trial
+            pending: returns True if (field, name, file name) must be written
+            tokens: fingerprints of components by (field, name)
+
+        Returns:
+            operators entries for trial.json
+        """
+        entries = []
+        for name, operator in operators:
+            if not isinstance(operator, Operator) or not is_qubit_operator(operator):
+                entries.append([name, operator])
+                continue
+            encoded = encode_operator(operator, tokens[("operators", name)])
+            if encoded is None:
+                # dense matrix goes to binary file
+                if pending("operators", name, f"operator_{name}.npy"):
+                    self._write_file(
+                        os.path.join(save_path, f"operator_{name}.npy"),
+                        partial(np.save, arr=operator.data),
+                    )
+                entries.append([name, f"Check the operator_{name}.npy file."])
+            else:
+                entries.append([name, encoded])
+        return entries
+
+    def record(self, trial: Trial, field: str, entry: Any):
+        """Appends change of trial data to its journal.
+
+        Args:
+            trial: changed trial
+            field: name of changed field
+            entry: added entry
+        """
+        if not self.journal:
+            return
+        journal = self._journals.get(trial.uuid)
+        if journal is None:
+            trial_path = os.path.join(self.path, f"trial_{trial.uuid}")
+            Path(trial_path).mkdir(parents=True, exist_ok=True)
+            journal = TrialJournal(
+                os.path.join(trial_path, JOURNAL_FILE_NAME), self.fsync_every
+            )
+            journal.append(
+                {
+                    "header": {
+                        "uuid": trial.uuid,
+                        "name": trial.name,
+                        "description": trial.description,
+                        "tags": trial.tags,
+                    }
+                }
+            )
+            self._journals[trial.uuid] = journal
+        try:
+            journal.append(
+                {"field": field, "entry": entry},
+                cls=RuntimeEncoder if field == "circuits" else TrialEncoder,
+            )
+        except (TypeError, ValueError) as error:
+            logging.warning("Entry of %s is not journaled: %s", field, error)
+
+    def flush(self):
+        """Syncs buffered journal records to disk."""
+        for journal in self._journals.values():
+            journal.sync()
+
+    def get(self, trial_id: str) -> Trial:
+        """Read a given trial file.
+
+        Args:
+            trial_id: trial uuid
+
+        Returns:
+            trial: object of a trial
+        """
+        trial_path = os.path.join(self.path, f"trial_{trial_id}")
+        journal_path = os.path.join(trial_path, JOURNAL_FILE_NAME)
+        if not os.path.isfile(os.path.join(trial_path, "trial.json")):
+            if os.path.isfile(journal_path):
+                # trial was never saved, like a crashed or running one
+                return self._replay_journal(journal_path, None)
+            logging.warning(
+                "Your file %s does not exist.",
+                trial_path,
+            )
+            raise ValueError(trial_id)
+        header = read_json(os.path.join(trial_path, "trial.json"), cls=TrialDecoder)
+        if header.get("metrics") == "Check the metrics.npz file.":
+            with span(IO), np.load(os.path.join(trial_path, "metrics.npz")) as arrays:
+                header["metrics"] = MetricLog.from_arrays(
+                    arrays, partial(decode_json, cls=RuntimeDecoder)
+                )
+        trial = Trial(**header)
+        for field, prefix in [
+            ("circuits", "circuit"),
+            ("operators", "operator"),
+            ("texts", "text"),
+            ("arrays", "array"),
+        ]:
+            entries = vars(trial)[field]
+            deferred = Deferred(
+                partial(
+                    self._load_tracked,
+                    trial.changes,
+                    trial_path,
+                    field,
+                    prefix,
+                    entries,
+                ),
+                length=len(entries),
+            )
+            setattr(trial, field, deferred if self.lazy else deferred.resolve())
+
+        if os.path.isfile(journal_path):
+            # changes made after last save
+            trial = self._replay_journal(journal_path, trial)
+        return trial
+
+    def _load_tracked(
+        self,
+        changes: TrialChanges,
+        trial_path: str,
+        field: str,
+        prefix: str,
+        entries: List[List[Any]],
+    ) -> List[List[Any]]:
+        """Loads components of a trial, saving the trial back does not
+        rewrite components which can not have changed, like mapped arrays.
+
+        Args:
+            changes: changes of the loaded trial
+            trial_path: path of the trial folder
+            field: field of the components
+            prefix: prefix of component files, like circuit
+            entries: components as saved in trial.json
+
+        Returns:
+            loaded components
+        """
+        return changes.loaded(
+            os.path.abspath(trial_path),
+            field,
+            self._load_components(trial_path, prefix, entries),
+        )
+
+    @staticmethod
+    def _replay_journal(journal_path: str, trial: Optional[Trial]) -> Trial:
+        """Applies journal records to a trial.
+
+        Args:
+            journal_path: path of the journal file
+            trial: last saved trial, None if trial was never saved
+
+        Returns:
+            trial with journaled changes
+        """
+        for record in TrialJournal.read(journal_path, cls=TrialDecoder):
+            if "header" in record:
+                trial = trial or Trial(**record["header"])
+            elif record["field"] == "description":
+                trial.description = record["entry"]
+            else:
+                getattr(trial, record["field"]).append(record["entry"])
+        return trial
+
+    @staticmethod
+    def _load_components(
+        trial_path: str, prefix: str, entries: List[List[Any]]
+    ) -> List[List[Any]]:
+        """Loads components of a trial from their files.
+
+        Args:
+            trial_path: path of the trial folder
+            prefix: prefix of component files, like circuit
+            entries: components as saved in trial.json
+
+        Returns:
+            loaded components
+        """
+        if prefix == "circuit" and os.path.isfile(
+            os.path.join(trial_path, "circuits.qpy")
+        ):
+            with span(IO), PackReader(os.path.join(trial_path, "circuits.qpy")) as pack:
+                entries = [
+                    [name, qpy.load(io.BytesIO(pack.read(name)))[0]]
+                    if isinstance(value, str)
+                    and value == "Check the circuits.qpy file."
+                    else [name, value]
+                    for name, value in entries
+                ]
+
+        components = []
+        for name, value in entries:
+            file_name = _component_file(prefix, name, value)
+            if file_name is None:
+                # stored inside trial.json by older versions
+                components.append([name, value])
+                continue
+            component_path = os.path.join(trial_path, file_name)
+            if component_path.endswith(".npy"):
+                # read-only view, data is read from disk on access
+                with span(IO):
+                    array = np.load(component_path, mmap_mode="r")
+                count_bytes(received=array.nbytes)
+                components.append(
+                    [name, Operator(array) if prefix == "operator" else array]
+                )
+                continue
+            components.append(read_json(component_path, cls=TrialDecoder))
+        return components
+
+    def get_circuit(self, trial_id: str, name: str) -> QuantumCircuit:
+        """Reads a single circuit of a trial.
+
+        Circuits saved with "qpy" format are read
+        without reading other circuits of the trial.
+
+        Args:
+            trial_id: trial uuid
+            name: name of the circuit
+
+        Returns:
+            circuit
+        """
+        trial_path = os.path.join(self.path, f"trial_{trial_id}")
+        pack_path = os.path.join(trial_path, "circuits.qpy")
+        if os.path.isfile(pack_path):
+            with PackReader(pack_path) as pack:
+                if name in pack.names():
+                    return qpy.load(io.BytesIO(pack.read(name)))[0]
+        circuit_path = os.path.join(trial_path, f"circuit_{name}.json")
+        if not os.path.isfile(circuit_path):
+            raise ValueError(f"{trial_id}/{name}")
+        return read_json(circuit_path, cls=TrialDecoder)[1]
+
+    def list(
+        self,
+        query: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        **kwargs,
+    ) -> List[Trial]:
+        """Returns list of trials.
+
+        Args:
+            query: search query
+            limit: limit
+            offset: offset
+            **kwargs: other filtering criteria
+
+        Returns:
+            list of trials
+        """
+        offset = offset or 0
+        limit = limit or 10
+
+        self._ensure_index()
+
+        # newest entries first so that equal mtimes keep saving order
+        summaries = [
+            summary
+            for summary in reversed(self._index.entries())
+            if match_summary(summary, query)
+        ]
+        summaries.sort(key=lambda summary: summary["mtime"], reverse=True)
+
+        trials = []
+        for summary in summaries[offset : offset + limit]:
+            try:
+                trials.append(self.get(trial_id=summary["uuid"]))
+            except ValueError:
+                # trial was removed from disk, run rebuild_index to clean up
+                continue
+        return trials
+
+    def collect_garbage(self) -> int:
+        """Removes blobs which are not referenced by any trial anymore.
+
+        Run it after removing trial folders of a storage with dedup.
+
+        Returns:
+            number of removed blobs
+        """
+        return self._blobs.collect_garbage()
+
+    def _ensure_index(self):
+        """Rebuilds index if it is missing or was appended to by older versions,
+        which did not index trials saved before."""
+        if self._index.is_complete():
+            return
+        with self._index_lock:
+            # concurrent saves wait for a single rebuild
+            if not self._index.is_complete():
+                self.rebuild_index()
+
+    def rebuild_index(self) -> int:
+        """Rebuilds the trials index from the trial folders.
+
+        Use it to repair the index or to index folders
+        written by older versions of purplecaffeine.
+
+        Returns:
+            number of indexed trials
+        """
+        summaries = []
+        for path in glob.glob(f"{self.path}/trial_*"):
+            trial_id = re.search(r"trial_([^/]+)", os.path.basename(path)).group(1)
+            try:
+                trial = self.get(trial_id=trial_id)
+            except ValueError:
+                continue
+            summaries.append(trial_summary(trial, mtime=os.path.getmtime(path)))
+        self._index.rewrite(summaries)
+        return len(summaries)
+
+
+class S3Storage(BaseStorage):
+    """S3 storage.
+
+    Every trial is stored under its own prefix, laid out by
+    :class:`~purplecaffeine.utils.KeyLayout`: ``trial.json`` holds
+    the header of the trial and circuits, texts, arrays, dense operators and
+    artifacts are separate objects next to it, written in parallel.
+    Trials saved by older versions are read by id. If ``legacy_prefix``
+    is set, trials under it are listed too and can be moved
+    into the layout by :meth:`migrate_legacy_keys`.
+    """
+
+    def __init__(
+        self,
+        bucket_name: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        directory: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        codec: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        lazy: bool = True,
+        sharding: Optional[str] = None,
+        legacy_prefix: Optional[str] = None,
+    ):
+        """Storage storage for s3 buckets.
+
+        Allows to store trial data inside s3 buckets.
+
+        Example:
+            >>> storage = S3Storage("my_bucket", key="<AWS_KEY>", access_key="<AWS_ACCESS_KEY>")
+
+        Args:
+            bucket_name: bucket name
+            access_key: aws key
             secret_access_key: aws access key
             directory: optional directory within bucket
             endpoint_url: optional endpoint url for custom S3 location
+            codec: compression of json objects, "none", "gzip" or "zstd",
+                Configuration.CODEC if None. Objects of any codec are read.
+            max_workers: number of objects transferred at once,
+                Configuration.S3_MAX_WORKERS if None
+            lazy: fetch circuits, operators, texts, arrays and artifacts
+                of a trial on first access
+            sharding: shard of trial keys, "none", "hash" or "date",
+                see :class:`~purplecaffeine.utils.KeyLayout`
+            legacy_prefix: prefix of trials saved by older versions,
+                "" for bucket root, listed by :meth:`rebuild_manifest`
+                and moved by :meth:`migrate_legacy_keys`. Not listed if None.
         """
         self.bucket_name = bucket_name or os.environ.get("PURPLE_CAFFEINE_S3_BUCKET")
         if self.bucket_name is None:
@@ -624,6 +1828,13 @@ class S3Storage(BaseStorage):
         self.endpoint_url = endpoint_url or os.environ.get(
             "PURPLE_CAFFEINE_S3_ENDPOINT"
         )
+        # boto3 is imported by s3 storages only
+        # pylint: disable=import-outside-toplevel
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        from purplecaffeine.utils.manifest import S3Manifest
+
         client_s3 = boto3.client(
             "s3",
             aws_access_key_id=self.access_key,
@@ -631,26 +1842,287 @@ class S3Storage(BaseStorage):
             endpoint_url=endpoint_url,
         )
         self.client_s3 = client_s3
+        self.codec = resolve_codec(codec)
+        self.max_workers = max_workers or Configuration.S3_MAX_WORKERS
+        self.lazy = lazy
+        self.layout = KeyLayout(
+            self.directory,
+            sharding or os.environ.get("PURPLE_CAFFEINE_S3_SHARDING", "none"),
+        )
+        if legacy_prefix is None:
+            legacy_prefix = os.environ.get("PURPLE_CAFFEINE_S3_LEGACY_PREFIX")
+        if legacy_prefix is not None and legacy_prefix.strip("/"):
+            legacy_prefix = f"{legacy_prefix.strip('/')}/"
+        elif legacy_prefix is not None:
+            legacy_prefix = ""
+        self.legacy_prefix = legacy_prefix
+        self._manifest = S3Manifest(
+            self.client_s3,
+            self.bucket_name,
+            self.layout.manifest_key(),
+            codec=self.codec,
+        )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=Configuration.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=Configuration.S3_MULTIPART_THRESHOLD,
+            max_concurrency=Configuration.S3_MULTIPART_CONCURRENCY,
+        )
+
+    def _upload(self, key: str, write: Callable[[BinaryIO], None], **extra_args):
+        """Uploads object, in parallel parts if it is big.
+
+        Content bigger than Configuration.S3_MULTIPART_THRESHOLD is
+        spooled to a temporary file, so memory of an upload is bounded.
+
+        Args:
+            key: key of the object
+            write: writes content into given stream
+            **extra_args: extra arguments of the upload, like ContentEncoding
+        """
+        with tempfile.SpooledTemporaryFile(
+            max_size=Configuration.S3_MULTIPART_THRESHOLD
+        ) as body:
+            with span(ENCODE):
+                write(body)
+            count_bytes(sent=body.tell())
+            body.seek(0)
+            with span(IO):
+                self.client_s3.upload_fileobj(
+                    body,
+                    self.bucket_name,
+                    key,
+                    ExtraArgs=extra_args or None,
+                    Config=self._transfer_config,
+                )
+
+    def _download(self, key: str) -> BinaryIO:
+        """Downloads object, in parallel parts if it is big.
+
+        Args:
+            key: key of the object
+
+        Returns:
+            temporary file with content of the object
+        """
+        # pylint: disable=consider-using-with
+        body = tempfile.SpooledTemporaryFile(
+            max_size=Configuration.S3_MULTIPART_THRESHOLD
+        )
+        with span(IO):
+            self.client_s3.download_fileobj(
+                self.bucket_name, key, body, Config=self._transfer_config
+            )
+        count_bytes(received=body.tell())
+        body.seek(0)
+        return body
+
+    def _components(
+        self, trial: Trial, tokens: Dict[Tuple[str, str], Any]
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, str, str, Callable[[BinaryIO], None]]]]:
+        """Splits trial into header and component objects.
+
+        Args:
+            trial: trial to split
+            tokens: fingerprints of components by (field, name)
+
+        Returns:
+            header for trial.json and (field, name, file name, writer)
+            of every component
+        """
+        header = dict(trial.__dict__)
+        writers = []
+
+        def add_json(field: str, prefix: str, name: str, value: Any, cls):
+            file_name = f"{prefix}_{name}.json"
+            writers.append(
+                (
+                    field,
+                    name,
+                    file_name,
+                    partial(dump_json, [name, value], codec=self.codec, cls=cls),
+                )
+            )
+            header[field].append([name, f"Check the {file_name} file."])
+
+        for field, prefix, cls in [
+            ("circuits", "circuit", RuntimeEncoder),
+            ("texts", "text", RuntimeEncoder),
+            ("artifacts", "artifact", TrialEncoder),
+        ]:
+            header[field] = []
+            for name, value in getattr(trial, field):
+                add_json(field, prefix, name, value, cls)
+
+        header["arrays"] = []
+        for name, array in trial.arrays:
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                writers.append(
+                    ("arrays", name, f"array_{name}.npy", partial(np.save, arr=array))
+                )
+                header["arrays"].append([name, f"Check the array_{name}.npy file."])
+            else:
+                add_json("arrays", "array", name, array, RuntimeEncoder)
+
+        header["operators"] = []
+        for name, operator in trial.operators:
+            qubit = isinstance(operator, Operator) and is_qubit_operator(operator)
+            encoded = (
+                encode_operator(operator, tokens[("operators", name)])
+                if qubit
+                else None
+            )
+            if qubit and encoded is None:
+                writers.append(
+                    (
+                        "operators",
+                        name,
+                        f"operator_{name}.npy",
+                        partial(np.save, arr=operator.data),
+                    )
+                )
+                header["operators"].append(
+                    [name, f"Check the operator_{name}.npy file."]
+                )
+            else:
+                # encoded once, not again by the json encoder
+                header["operators"].append(
+                    [name, operator if encoded is None else encoded]
+                )
+        return header, writers
+
+    def _stored_shard(self, trial_id: str) -> Optional[str]:
+        """Returns date shard of a saved trial, None if it was never saved."""
+        with span(IO):
+            try:
+                response = self.client_s3.get_object(
+                    Bucket=self.bucket_name, Key=self.layout.pointer_key(trial_id)
+                )
+            except self.client_s3.exceptions.NoSuchKey:
+                return None
+            return response["Body"].read().decode("utf-8")
 
     def save(self, trial: Trial) -> str:
         """Saves given trial.
 
+        Components are uploaded first and header last,
+        so a listed trial is always complete.
+
         Args:
             trial: trial to save
 
         Returns:
-            trial.uuid: key of the trial
+            trial.uuid: id of the trial
         """
-        trial_data = json.dumps(trial.__dict__, cls=TrialEncoder, indent=4)
-        response: Dict[str, Any] = self.client_s3.put_object(
-            Bucket=self.bucket_name, Key=trial.uuid, Body=trial_data
-        )
+        shard = self.layout.shard(trial.uuid)
+        if self.layout.sharding == "date":
+            # resaved trial stays in shard of its first save
+            shard = self._stored_shard(trial.uuid) or shard
+        self._write(trial, shard)
+        return trial.uuid
+
+    def _write(self, trial: Trial, shard: str):
+        """Uploads objects of a trial into its shard.
+
+        Components uploaded by an earlier save to the same prefix
+        are not uploaded again unless they changed, see :class:`TrialChanges`.
+
+        Args:
+            trial: trial to write
+            shard: shard of the trial
+        """
+        prefix = self.layout.prefix(trial.uuid, shard)
+        location = self._location(prefix)
+        tokens = {
+            (field, name): fingerprint(value)
+            for field in COMPONENT_FIELDS
+            for name, value in getattr(trial, field)
+        }
+        header, writers = self._components(trial, tokens)
+        extra_args = {} if self.codec == "none" else {"ContentEncoding": self.codec}
+
+        def upload(writer: Tuple[str, str, str, Callable[[BinaryIO], None]]):
+            _, _, file_name, write = writer
+            self._upload(
+                prefix + file_name,
+                write,
+                # npy objects are not compressed
+                **(extra_args if file_name.endswith(".json") else {}),
+            )
+
+        pending = [
+            writer
+            for writer in writers
+            if not trial.changes.is_written(
+                location, writer[0], writer[1], tokens[writer[:2]]
+            )
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(bind_context(upload), pending))
+
+        body = dumps_json(header, self.codec, cls=TrialEncoder)
+        count_bytes(sent=len(body))
+        with span(IO):
+            if self.layout.sharding == "date":
+                self.client_s3.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.layout.pointer_key(trial.uuid),
+                    Body=shard.encode("utf-8"),
+                )
+            response: Dict[str, Any] = self.client_s3.put_object(
+                Bucket=self.bucket_name,
+                Key=self.layout.header_key(trial.uuid, shard),
+                Body=body,
+                **extra_args,
+            )
         status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 500)
         if status != 200:
             raise PurpleCaffeineException(
                 f"Error response from boto client on attempt to write trial: {response}"
             )
-        return trial.uuid
+        trial.changes.written(
+            location, [(field, name, token) for (field, name), token in tokens.items()]
+        )
+        self._manifest.add(
+            {
+                **trial_summary(trial, mtime=time.time()),
+                "key": self.layout.header_key(trial.uuid, shard),
+            }
+        )
+
+    def _location(self, prefix: str) -> str:
+        """Returns location of trial objects for change tracking."""
+        return f"s3://{self.bucket_name}/{prefix}"
+
+    def save_many(
+        self, trials: List[Trial], max_workers: Optional[int] = None
+    ) -> List[Any]:
+        """Uploads given trials in parallel.
+
+        Args:
+            trials: trials to save
+            max_workers: number of threads, Configuration.SAVE_MAX_WORKERS if None
+
+        Returns:
+            keys of the trials
+        """
+        return self._save_concurrently(trials, max_workers)
+
+    def _header_keys_of(self, trial_id: str) -> List[str]:
+        """Returns possible keys of trial.json of a trial, newest layout first."""
+        keys = []
+        if self.layout.sharding != "date":
+            keys.append(self.layout.header_key(trial_id, self.layout.shard(trial_id)))
+        else:
+            shard = self._stored_shard(trial_id)
+            if shard is not None:
+                keys.append(self.layout.header_key(trial_id, shard))
+        return keys + self._legacy_keys(trial_id)
+
+    def _legacy_keys(self, trial_id: str) -> List[str]:
+        """Returns possible keys of a trial written by older versions,
+        split in trial.json and components or in a single object."""
+        prefix = self.legacy_prefix or ""
+        return [f"{prefix}{trial_id}/trial.json", f"{prefix}{trial_id}"]
 
     def get(self, trial_id: str) -> Trial:
         """Read a given trial file.
@@ -662,18 +2134,130 @@ class S3Storage(BaseStorage):
             trial: object of a trial
         """
         try:
-            response: Dict[str, Any] = self.client_s3.get_object(
-                Bucket=self.bucket_name, Key=trial_id
-            )
+            keys = self._header_keys_of(trial_id)
+        except Exception as get_exception:
+            raise PurpleCaffeineException from get_exception
+        for key in keys[:-1]:
+            try:
+                return self._read(key)
+            except PurpleCaffeineException as read_exception:
+                if not isinstance(
+                    read_exception.__cause__, self.client_s3.exceptions.NoSuchKey
+                ):
+                    raise
+        return self._read(keys[-1])
+
+    def _read(self, key: str) -> Trial:
+        """Reads trial.json of a trial, components are fetched next to it.
+
+        Args:
+            key: key of trial.json
+
+        Returns:
+            trial: object of a trial
+        """
+        try:
+            with span(IO):
+                response: Dict[str, Any] = self.client_s3.get_object(
+                    Bucket=self.bucket_name, Key=key
+                )
+            count_bytes(received=response.get("ContentLength", 0))
             status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 500)
             if status != 200:
                 raise PurpleCaffeineException(
                     f"Error response from boto client on attempt to read trial: {response}"
                 )
-            return Trial(**json.loads(response["Body"].read(), cls=TrialDecoder))
+            trial = Trial(**load_json(response["Body"], cls=TrialDecoder))
         except Exception as get_exception:
             raise PurpleCaffeineException from get_exception
 
+        prefix = key[: key.rfind("/") + 1]
+        components = [
+            ("circuits", "circuit"),
+            ("operators", "operator"),
+            ("texts", "text"),
+            ("arrays", "array"),
+            ("artifacts", "artifact"),
+        ]
+        for field, component_prefix in components:
+            entries = vars(trial)[field]
+            deferred = Deferred(
+                partial(
+                    self._load_tracked,
+                    trial.changes,
+                    prefix,
+                    field,
+                    component_prefix,
+                    entries,
+                ),
+                length=len(entries),
+            )
+            setattr(trial, field, deferred if self.lazy else deferred.resolve())
+        return trial
+
+    def _load_tracked(
+        self,
+        changes: TrialChanges,
+        key_prefix: str,
+        field: str,
+        prefix: str,
+        entries: List[List[Any]],
+    ) -> List[List[Any]]:
+        """Fetches components of a trial, saving the trial back does not
+        upload objects of components which can not have changed, like texts.
+
+        Args:
+            changes: changes of the fetched trial
+            key_prefix: prefix of objects of the trial
+            field: field of the components
+            prefix: prefix of component objects, like circuit
+            entries: components as saved in trial.json
+
+        Returns:
+            loaded components
+        """
+        components = self._load_components(key_prefix, prefix, entries)
+        changes.loaded(
+            self._location(key_prefix),
+            field,
+            [
+                component
+                for component, (name, value) in zip(components, entries)
+                # stored inside trial.json by older versions
+                if _component_file(prefix, name, value) is not None
+            ],
+        )
+        return components
+
+    def _load_components(
+        self, key_prefix: str, prefix: str, entries: List[List[Any]]
+    ) -> List[List[Any]]:
+        """Fetches components of a trial from their objects in parallel.
+
+        Args:
+            key_prefix: prefix of objects of the trial
+            prefix: prefix of component objects, like circuit
+            entries: components as saved in trial.json
+
+        Returns:
+            loaded components
+        """
+
+        def load(entry: List[Any]) -> List[Any]:
+            name, value = entry
+            file_name = _component_file(prefix, name, value)
+            if file_name is None:
+                # stored inside trial.json by older versions
+                return [name, value]
+            with self._download(key_prefix + file_name) as body:
+                if file_name.endswith(".npy"):
+                    array = np.load(body)
+                    return [name, Operator(array) if prefix == "operator" else array]
+                return load_json(body, cls=TrialDecoder)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(bind_context(load), entries))
+
     def list(
         self,
         query: Optional[str] = None,
@@ -687,7 +2271,8 @@ class S3Storage(BaseStorage):
             query: search query
             limit: limit
             offset: offset
-            **kwargs: other filtering criteria
+            **kwargs: other filtering criteria, ``since`` date
+                like 2024-01-31 skips older shards of date sharded layout
 
         Returns:
             list of trials
@@ -695,18 +2280,631 @@ class S3Storage(BaseStorage):
         offset = offset or 0
         limit = limit or 10
 
-        trials = []
+        summaries = self._manifest.entries()
+        if summaries is None:
+            self.rebuild_manifest()
+            summaries = self._manifest.entries() or []
+
+        since = kwargs.get("since")
+        # newest entries first so that equal mtimes keep saving order
+        summaries = [
+            summary
+            for summary in reversed(summaries)
+            if match_summary(summary, query)
+            and (not since or self._shard_of(summary) >= since)
+        ]
+        summaries.sort(key=lambda summary: summary["mtime"], reverse=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(
+                executor.map(
+                    bind_context(self._read),
+                    [summary["key"] for summary in summaries[offset : offset + limit]],
+                )
+            )
+
+    def _shard_of(self, summary: Dict[str, Any]) -> str:
+        """Returns shard of a manifest entry."""
+        if self.layout.is_header_key(summary["key"]):
+            return self.layout.shard_of(summary["key"])
+        # saved by older versions
+        return self.layout.shard(summary["uuid"], summary["mtime"])
+
+    def rebuild_manifest(self) -> int:
+        """Rebuilds the manifest of trials from trial objects.
+
+        Use it to repair the manifest or to index trials
+        written by older versions of purplecaffeine, including trials
+        under ``legacy_prefix`` which are not migrated yet, if it is set.
+        Objects which are not trials are skipped.
+
+        Returns:
+            number of indexed trials
+        """
+        objects = []
         paginator = self.client_s3.get_paginator("list_objects_v2")
-        page_iterator = paginator.paginate(
-            Bucket=self.bucket_name,
-            PaginationConfig={"MaxItems": offset + limit, "PageSize": limit},
-        )
-        for page, result in enumerate(page_iterator):
-            if "Contents" in result:
-                for idx, s3_object in enumerate(result["Contents"]):
-                    file_offset = page * limit + idx
-                    if file_offset >= offset:
-                        trial = self.get(s3_object["Key"])
-                        trials.append(trial)
+        with span(IO):
+            for result in paginator.paginate(
+                Bucket=self.bucket_name, Prefix=f"{self.layout.root}/"
+            ):
+                objects.extend(
+                    s3_object
+                    for s3_object in result.get("Contents", [])
+                    if self.layout.is_header_key(s3_object["Key"])
+                )
+        # trials of older versions are listed until they are migrated
+        if self.legacy_prefix is not None:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                objects.extend(
+                    s3_object
+                    for s3_object in executor.map(
+                        bind_context(self._legacy_header), self._legacy_trial_ids()
+                    )
+                    if s3_object is not None
+                )
+        objects.sort(key=lambda s3_object: s3_object["LastModified"])
+
+        def summarize(s3_object: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                trial = self._read(s3_object["Key"])
+            except Exception:  # pylint: disable=broad-except
+                logging.warning(
+                    "Skipping %s, it is not a trial.", s3_object["Key"], exc_info=True
+                )
+                return None
+            return {
+                **trial_summary(trial, mtime=s3_object["LastModified"].timestamp()),
+                "key": s3_object["Key"],
+            }
 
-        return trials
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            summaries = [
+                summary
+                for summary in executor.map(bind_context(summarize), objects)
+                if summary is not None
+            ]
+        self._manifest.rewrite(summaries)
+        return len(summaries)
+
+    def _legacy_trial_ids(self) -> List[str]:
+        """Returns ids of trials saved under legacy prefix by older versions."""
+        if self.legacy_prefix is None:
+            raise PurpleCaffeineException(
+                "Please specify legacy_prefix of trials saved by older versions"
+            )
+        trial_ids = set()
+        paginator = self.client_s3.get_paginator("list_objects_v2")
+        with span(IO):
+            for result in paginator.paginate(
+                Bucket=self.bucket_name, Prefix=self.legacy_prefix, Delimiter="/"
+            ):
+                names = [
+                    s3_object["Key"] for s3_object in result.get("Contents", [])
+                ] + [
+                    common_prefix["Prefix"].rstrip("/")
+                    for common_prefix in result.get("CommonPrefixes", [])
+                ]
+                names = [name[len(self.legacy_prefix) :] for name in names]
+                trial_ids.update(name for name in names if _is_uuid(name))
+        return sorted(trial_ids)
+
+    def _legacy_header(self, trial_id: str) -> Optional[Dict[str, Any]]:
+        """Returns key and last modification of the header of a trial saved
+        under legacy prefix by older versions, None if it has no header."""
+        for key in self._legacy_keys(trial_id):
+            try:
+                with span(IO):
+                    head = self.client_s3.head_object(Bucket=self.bucket_name, Key=key)
+            except self.client_s3.exceptions.ClientError as error:
+                if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                    continue
+                raise
+            return {"Key": key, "LastModified": head["LastModified"]}
+        return None
+
+    def migrate_legacy_keys(self, trial_ids: Optional[List[str]] = None) -> List[str]:
+        """Moves trials saved under legacy prefix by older versions into the key layout.
+
+        Trials are rewritten in the layout, then their old objects are deleted.
+        Date sharded trials are put in the shard of the date of their old object.
+        Objects which are not trials are skipped and left in place.
+
+        Args:
+            trial_ids: trials to move, all keys named by uuid
+                right under legacy prefix if None
+
+        Returns:
+            ids of moved trials
+        """
+        if trial_ids is None:
+            trial_ids = self._legacy_trial_ids()
+
+        def migrate(trial_id: str):
+            split_key, single_key = self._legacy_keys(trial_id)
+            old_keys = [
+                s3_object["Key"]
+                for result in self.client_s3.get_paginator("list_objects_v2").paginate(
+                    Bucket=self.bucket_name, Prefix=single_key
+                )
+                for s3_object in result.get("Contents", [])
+                if s3_object["Key"] == single_key
+                or s3_object["Key"].startswith(f"{single_key}/")
+            ]
+            header_key = split_key if split_key in old_keys else single_key
+            head = self.client_s3.head_object(Bucket=self.bucket_name, Key=header_key)
+            try:
+                trial = self._read(header_key)
+            except Exception:  # pylint: disable=broad-except
+                logging.warning(
+                    "Skipping %s, it is not a trial.", header_key, exc_info=True
+                )
+                return None
+            self._write(
+                trial,
+                self.layout.shard(trial_id, head["LastModified"].timestamp()),
+            )
+            for start in range(0, len(old_keys), 1000):
+                self.client_s3.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={
+                        "Objects": [
+                            {"Key": key} for key in old_keys[start : start + 1000]
+                        ]
+                    },
+                )
+            return trial_id
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            migrated = executor.map(bind_context(migrate), trial_ids)
+            return [trial_id for trial_id in migrated if trial_id is not None]
+
+
+class CachingStorage(BaseStorage):
+    """Read-through cache in front of any storage.
+
+    Trials returned by :meth:`get` are kept in memory, in a cache bounded
+    by estimated size of trials in bytes, and optionally on disk,
+    so repeated reads do not hit the wrapped storage again.
+    Saving a trial through the cache invalidates its cached copies.
+    Copies on disk are checked against version of the trial kept in
+    the cache folder, so saves through other caches sharing the folder,
+    like in other processes, are seen too, saves bypassing caches are not.
+    Cached trials are shared between callers, do not change them in place.
+    Other attributes are taken from the wrapped storage.
+
+    Example:
+        >>> storage = CachingStorage(S3Storage("my_bucket"), cache_path="./.cache")
+        >>> storage.get("<trial_id>")
+        >>> storage.stats()
+    """
+
+    # trial fields loaded on first access, resolved before writing to disk
+    LAZY_FIELDS = ("circuits", "operators", "texts", "arrays", "artifacts")
+
+    def __init__(
+        self,
+        storage: BaseStorage,
+        max_bytes: Optional[int] = None,
+        cache_path: Optional[str] = None,
+        disk_max_bytes: Optional[int] = None,
+    ):
+        """Creates cache.
+
+        Args:
+            storage: wrapped storage
+            max_bytes: size of in-memory cache,
+                Configuration.CACHE_MAX_BYTES if None
+            cache_path: folder of on-disk cache, no on-disk cache if None
+            disk_max_bytes: size of on-disk cache,
+                Configuration.CACHE_DISK_MAX_BYTES if None
+        """
+        self.storage = storage
+        self.memory = LRUCache(
+            max_bytes or Configuration.CACHE_MAX_BYTES,
+            sizeof=partial(estimate_size, max_depth=6),
+            on_evict=self._evicted,
+        )
+        self.disk = (
+            None
+            if cache_path is None
+            else DiskCache(
+                cache_path, disk_max_bytes or Configuration.CACHE_DISK_MAX_BYTES
+            )
+        )
+        # trial uuid to ids it is in memory by, like numeric ids of api server
+        self._keys: Dict[str, set] = {}
+        # trial id to number of lazy fields not loaded when its size was measured
+        self._unloaded: Dict[str, int] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for attributes missing on the cache
+        if name == "storage":
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    def get(self, trial_id: str) -> Trial:
+        """Returns trial from cache or from wrapped storage.
+
+        Args:
+            trial_id: trial id
+
+        Returns:
+            trial: object of a trial
+        """
+        trial = self.memory.get(trial_id)
+        if trial is not None:
+            # size grows only when lazy components are loaded
+            unloaded = self._count_unloaded(trial)
+            if unloaded < self._unloaded.get(trial_id, 0):
+                self._remember(trial_id, trial, unloaded)
+            return trial
+        trial = self._get_from_disk(trial_id)
+        if trial is None:
+            version = self._version(trial_id)
+            trial = self.storage.get(trial_id)
+            if self.disk is not None:
+                if trial.uuid != trial_id:
+                    # read by other id, like numeric ids of api server
+                    version = self._version(trial.uuid)
+                self.disk.put(trial_id, (version, self._state(trial)))
+        self._remember(trial_id, trial, self._count_unloaded(trial))
+        return trial
+
+    def _remember(self, trial_id: str, trial: Trial, unloaded: int):
+        """Puts trial in memory, measuring its size."""
+        self.memory.put(trial_id, trial)
+        if trial_id in self.memory:
+            self._unloaded[trial_id] = unloaded
+            self._keys.setdefault(trial.uuid, set()).add(trial_id)
+        else:
+            # too big for the cache
+            self._evicted(trial_id, trial)
+
+    def _evicted(self, trial_id: str, trial: Trial):
+        """Forgets trial evicted from memory."""
+        self._unloaded.pop(trial_id, None)
+        keys = self._keys.get(trial.uuid)
+        if keys is not None:
+            keys.discard(trial_id)
+            if not keys:
+                del self._keys[trial.uuid]
+
+    def _count_unloaded(self, trial: Trial) -> int:
+        """Returns number of lazy fields of trial which are not loaded."""
+        return sum(
+            isinstance(trial.__dict__.get(field), Deferred)
+            and not trial.__dict__[field].loaded
+            for field in self.LAZY_FIELDS
+        )
+
+    def _version_path(self, trial_uuid: str) -> str:
+        """Returns path of the file with version of a trial on disk."""
+        return os.path.join(
+            self.disk.path,
+            "versions",
+            hashlib.sha256(trial_uuid.encode("utf-8")).hexdigest(),
+        )
+
+    def _version(self, trial_uuid: str) -> Optional[str]:
+        """Returns version of a trial, changed by every save through a cache
+        sharing the folder, None if it was not saved through one."""
+        if self.disk is None:
+            return None
+        try:
+            with open(self._version_path(trial_uuid), "r", encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _bump_version(self, trial_uuid: str):
+        """Changes version of a trial, so its copies on disk are stale."""
+        path = self._version_path(trial_uuid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(uuid4().hex)
+        os.replace(tmp_path, path)
+
+    def _get_from_disk(self, trial_id: str) -> Optional[Trial]:
+        """Returns trial from on-disk cache, None if it is not cached or stale."""
+        if self.disk is None:
+            return None
+        entry = self.disk.get(trial_id)
+        if entry is None:
+            return None
+        if (
+            not isinstance(entry, tuple)
+            or len(entry) != 2
+            or entry[0] != self._version(entry[1].get("uuid", trial_id))
+        ):
+            # trial was saved by another process, or cached by older versions
+            self.disk.pop(trial_id)
+            return None
+        trial = Trial.__new__(Trial)
+        trial.__dict__.update(entry[1])
+        trial.storage = self.storage
+        return trial
+
+    def _state(self, trial: Trial) -> Dict[str, Any]:
+        """Returns picklable state of a trial, with all components loaded."""
+        state = {
+            field: value for field, value in vars(trial).items() if field != "storage"
+        }
+        for field in self.LAZY_FIELDS:
+            state[field] = getattr(trial, field)
+        return state
+
+    def invalidate(self, trial_uuid: str):
+        """Removes cached copies of a trial.
+
+        Args:
+            trial_uuid: trial uuid
+        """
+        if self.disk is not None:
+            self._bump_version(trial_uuid)
+        for key in self._keys.pop(trial_uuid, set()) | {trial_uuid}:
+            self.memory.pop(key)
+            self._unloaded.pop(key, None)
+            if self.disk is not None:
+                self.disk.pop(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns counters of the cache.
+
+        Returns:
+            hits, misses and evictions of in-memory and on-disk caches,
+            number and size in bytes of trials in memory
+        """
+        stats = {
+            "hits": self.memory.hits,
+            "misses": self.memory.misses,
+            "evictions": self.memory.evictions,
+            "entries": len(self.memory),
+            "bytes": self.memory.size,
+        }
+        if self.disk is not None:
+            stats.update(
+                {
+                    "disk_hits": self.disk.hits,
+                    "disk_misses": self.disk.misses,
+                    "disk_evictions": self.disk.evictions,
+                    "disk_bytes": self.disk.size,
+                }
+            )
+        return stats
+
+    def save(self, trial: Trial) -> Any:
+        """Saves given trial into wrapped storage and invalidates its cached copies.
+
+        Args:
+            trial: trial to save
+
+        Returns:
+            result of save of wrapped storage
+        """
+        try:
+            return self.storage.save(trial)
+        finally:
+            self.invalidate(trial.uuid)
+
+    def save_many(self, trials: List[Trial]) -> List[Any]:
+        """Saves given trials into wrapped storage and invalidates their cached copies.
+
+        Args:
+            trials: trials to save
+
+        Returns:
+            results of save for every trial
+        """
+        try:
+            return self.storage.save_many(trials)
+        finally:
+            for trial in trials:
+                self.invalidate(trial.uuid)
+
+    def record(self, trial: Trial, field: str, entry: Any):
+        """Records change of trial data in wrapped storage.
+
+        Args:
+            trial: changed trial
+            field: name of changed field
+            entry: added entry
+        """
+        self.invalidate(trial.uuid)
+        self.storage.record(trial, field, entry)
+
+    def list(
+        self,
+        query: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        **kwargs,
+    ) -> List[Trial]:
+        """Returns list of trials of wrapped storage.
+
+        Args:
+            query: search query
+            limit: limit
+            offset: offset
+            **kwargs: other filtering criteria
+
+        Returns:
+            list of trials
+        """
+        return self.storage.list(query=query, limit=limit, offset=offset, **kwargs)
+
+
+class TieredStorage(BaseStorage):
+    """Write-behind storage replicating a local spool to remote storages.
+
+    Trials are saved synchronously to a :class:`LocalStorage` spool
+    and replicated to remote storages by background threads,
+    so saving does not wait for the network.
+    Replication tasks are files in the queue folder, so replication
+    interrupted by a crash is resumed by the next storage on the same spool.
+    Remote storages are identified by their position, keep their order
+    between runs.
+
+    Example:
+        >>> storage = TieredStorage(
+        >>>     LocalStorage("./spool"),
+        >>>     [S3Storage("my_bucket"), ApiStorage(host="http://localhost:8000")],
+        >>> )
+        >>> storage.save(trial)
+        >>> storage.flush()
+    """
+
+    def __init__(
+        self,
+        local: LocalStorage,
+        remotes: List[BaseStorage],
+        queue_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+    ):
+        """Creates storage and resumes pending replications.
+
+        Args:
+            local: spool storage, trials are saved to it synchronously
+            remotes: storages trials are replicated to
+            queue_path: folder of replication tasks,
+                ``replication`` folder of the spool if None
+            max_workers: number of trials replicated at once,
+                Configuration.REPLICATION_MAX_WORKERS if None
+            max_retries: number of attempts to replicate a trial,
+                Configuration.REPLICATION_MAX_RETRIES if None
+        """
+        self.local = local
+        self.remotes = list(remotes)
+        # mean duration of get of every remote, fastest one is read first
+        self._latencies: List[Optional[float]] = [None] * len(self.remotes)
+        self.queue = ReplicationQueue(
+            queue_path or os.path.join(local.path, "replication"),
+            self._replicate,
+            max_workers=max_workers or Configuration.REPLICATION_MAX_WORKERS,
+            max_retries=max_retries or Configuration.REPLICATION_MAX_RETRIES,
+            backoff_factor=Configuration.REPLICATION_BACKOFF_FACTOR,
+            backoff_max=Configuration.REPLICATION_BACKOFF_MAX,
+        )
+
+    def _replicate(self, remote: str, trial_id: str):
+        """Saves trial of the spool to a remote storage."""
+        self.remotes[int(remote)].save(self.local.get(trial_id))
+
+    def save(self, trial: Trial) -> Any:
+        """Saves given trial to the spool and queues its replication.
+
+        Args:
+            trial: trial to save
+
+        Returns:
+            result of save of the spool
+        """
+        result = self.local.save(trial)
+        for index in range(len(self.remotes)):
+            self.queue.put(str(index), trial.uuid)
+        return result
+
+    def record(self, trial: Trial, field: str, entry: Any):
+        """Records change of trial data in the spool.
+
+        Args:
+            trial: changed trial
+            field: name of changed field
+            entry: added entry
+        """
+        self.local.record(trial, field, entry)
+
+    def get(self, trial_id: str) -> Trial:
+        """Returns trial from the spool or from the fastest remote having it.
+
+        Args:
+            trial_id: trial id
+
+        Returns:
+            trial: object of a trial
+        """
+        try:
+            return self.local.get(trial_id)
+        except ValueError:
+            pass
+        order = sorted(
+            range(len(self.remotes)),
+            key=lambda index: self._latencies[index] or 0.0,
+        )
+        error: Exception = ValueError(trial_id)
+        for index in order:
+            start = time.perf_counter()
+            try:
+                trial = self.remotes[index].get(trial_id)
+            except (ValueError, PurpleCaffeineException) as get_error:
+                error = get_error
+                continue
+            duration = time.perf_counter() - start
+            latency = self._latencies[index]
+            self._latencies[index] = (
+                duration if latency is None else 0.8 * latency + 0.2 * duration
+            )
+            return trial
+        raise error
+
+    def list(
+        self,
+        query: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        **kwargs,
+    ) -> List[Trial]:
+        """Returns list of trials of the spool,
+        which holds every trial saved through this storage.
+
+        Args:
+            query: search query
+            limit: limit
+            offset: offset
+            **kwargs: other filtering criteria
+
+        Returns:
+            list of trials
+        """
+        return self.local.list(query=query, limit=limit, offset=offset, **kwargs)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Syncs spool journals and replicates queued trials without backoff delay.
+
+        Args:
+            timeout: seconds to wait, no limit if None
+
+        Returns:
+            True if every queued trial was replicated or failed
+        """
+        self.local.flush()
+        return self.queue.flush(timeout)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued trial is replicated or failed.
+
+        Args:
+            timeout: seconds to wait, no limit if None
+
+        Returns:
+            True if every queued trial was replicated or failed
+        """
+        return self.queue.wait(timeout)
+
+    def metrics(self) -> Dict[str, int]:
+        """Returns depth and counters of the replication queue.
+
+        Returns:
+            numbers of pending, running and failed replications,
+            numbers of replications and retries
+        """
+        return self.queue.metrics()
+
+    def close(self, wait: bool = True):
+        """Stops replication, pending trials are replicated by the next storage.
+
+        Args:
+            wait: wait for running replications
+        """
+        self.queue.close(wait=wait)
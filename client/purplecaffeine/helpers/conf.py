@@ -1,13 +1,60 @@
 """Configuration info."""
-from typing import List, Any
+from typing import List, Any, Optional
 
 
 class Configuration:
     """Configuration list."""
 
     MAX_SIZE: float = 5e6
+    # action on artifacts bigger than MAX_SIZE: "warn", "reject" or "spill"
+    ARTIFACT_SIZE_POLICY: str = "warn"
+    # folder for spilled artifacts, temporary folder if None
+    ARTIFACT_SPILL_PATH: Optional[str] = None
+    # biggest operator converted to Pauli terms on save
+    OPERATOR_MAX_PAULI_QUBITS: int = 16
+    # size of cache of Pauli terms of saved operators in bytes
+    OPERATOR_ENCODING_CACHE_BYTES: int = 64 * 1024 * 1024
+    # size of in-memory cache of CachingStorage in bytes
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # size of on-disk cache of CachingStorage in bytes
+    CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+    # number of trials replicated at once by TieredStorage
+    REPLICATION_MAX_WORKERS: int = 4
+    # number of attempts to replicate a trial before it is marked as failed
+    REPLICATION_MAX_RETRIES: int = 8
+    # seconds before first retry of replication, doubled on every next retry
+    REPLICATION_BACKOFF_FACTOR: float = 1.0
+    REPLICATION_BACKOFF_MAX: float = 300.0
+    # number of superseded lines of local trial index, compacted by a read once exceeded
+    INDEX_COMPACTION_LINES: int = 1000
+    # components hashed on save to find changes made in place: "arrays" for
+    # numeric arrays and operators, "all" for circuits, texts and artifacts too
+    CHANGE_HASHING: str = "arrays"
+    # number of trials saved at once by save_many
+    SAVE_MAX_WORKERS: int = 8
+    API_BATCH_SIZE: int = 100
+    # number of objects fetched at once by S3Storage
+    S3_MAX_WORKERS: int = 16
+    # objects bigger than this are transferred in parts, smaller ones are kept in memory
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    # number of parts of an object transferred at once
+    S3_MULTIPART_CONCURRENCY: int = 4
+    # folder of local cache of S3 manifests, temporary folder if None
+    S3_CACHE_PATH: Optional[str] = None
+    # number of S3 manifest segments, one per save, merged into its base by a read
+    S3_MANIFEST_SEGMENTS: int = 100
+    # number of in-flight requests of async storage methods
+    ASYNC_MAX_CONCURRENCY: int = 100
+    # compression of trial payloads: "none", "gzip" or "zstd"
+    CODEC: str = "none"
     API_TRIAL_ENDPOINT: str = "api/trials"
     API_TOKEN_ENDPOINT: str = "api/token"
+    API_TOKEN_REFRESH_ENDPOINT: str = "api/token/refresh"
+    # seconds before expiration to refresh access token
+    API_TOKEN_REFRESH_MARGIN: int = 30
+    API_POOL_SIZE: int = 10
+    API_RETRIES: int = 3
+    API_BACKOFF_FACTOR: float = 0.5
     API_HEADERS: dict = {
         "Accept": "application/json",
         "Content-Type": "application/json",
@@ -19,8 +66,34 @@ class Configuration:
         """Returns all Configurations."""
         return [
             Configuration.MAX_SIZE,
+            Configuration.ARTIFACT_SIZE_POLICY,
+            Configuration.ARTIFACT_SPILL_PATH,
+            Configuration.OPERATOR_MAX_PAULI_QUBITS,
+            Configuration.OPERATOR_ENCODING_CACHE_BYTES,
+            Configuration.CACHE_MAX_BYTES,
+            Configuration.CACHE_DISK_MAX_BYTES,
+            Configuration.REPLICATION_MAX_WORKERS,
+            Configuration.REPLICATION_MAX_RETRIES,
+            Configuration.REPLICATION_BACKOFF_FACTOR,
+            Configuration.REPLICATION_BACKOFF_MAX,
+            Configuration.INDEX_COMPACTION_LINES,
+            Configuration.CHANGE_HASHING,
+            Configuration.SAVE_MAX_WORKERS,
+            Configuration.API_BATCH_SIZE,
+            Configuration.S3_MAX_WORKERS,
+            Configuration.S3_MULTIPART_THRESHOLD,
+            Configuration.S3_MULTIPART_CONCURRENCY,
+            Configuration.S3_CACHE_PATH,
+            Configuration.S3_MANIFEST_SEGMENTS,
+            Configuration.ASYNC_MAX_CONCURRENCY,
+            Configuration.CODEC,
             Configuration.API_TRIAL_ENDPOINT,
             Configuration.API_TOKEN_ENDPOINT,
+            Configuration.API_TOKEN_REFRESH_ENDPOINT,
+            Configuration.API_TOKEN_REFRESH_MARGIN,
+            Configuration.API_POOL_SIZE,
+            Configuration.API_RETRIES,
+            Configuration.API_BACKOFF_FACTOR,
             Configuration.API_HEADERS,
             Configuration.API_TIMEOUT,
         ]
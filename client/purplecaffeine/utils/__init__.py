@@ -4,6 +4,105 @@
 
     TrialEncoder
     TrialDecoder
+    encode_json
+    decode_json
+    TrialIndex
+    MetricLog
+    TrialJournal
+    PackWriter
+    PackReader
+    BlobStore
+    ReplicationQueue
+    Instrumentation
+    JsonLinesExporter
+    print_breakdown
+    span
+    count_bytes
+    KeyLayout
+    S3Manifest
+    ApiSession
+    AsyncApiSession
+    resolve_codec
+    dump_json
+    load_json
+    pauli_decomposition
+    LRUCache
+    DiskCache
+    estimate_size
+    deep_size
+    Deferred
+    LazyField
+    TrialChanges
 """
 
-from .json import TrialEncoder, TrialDecoder
+import importlib
+from typing import TYPE_CHECKING
+
+from .instrumentation import (
+    Instrumentation,
+    JsonLinesExporter,
+    print_breakdown,
+    aggregate,
+    span,
+    spanned,
+    count_bytes,
+    bind_context,
+    instrumented,
+    active,
+    INSTRUMENTED_METHODS,
+    ENCODE,
+    DECODE,
+    IO,
+    HTTP,
+    TOKEN,
+)
+from .json import TrialEncoder, TrialDecoder, encode_json, decode_json
+from .metrics import MetricLog
+from .journal import TrialJournal, JOURNAL_FILE_NAME
+from .size import estimate_size, deep_size
+from .codec import (
+    resolve_codec,
+    dump_json,
+    dumps_json,
+    load_json,
+    write_json,
+    read_json,
+)
+from .blobs import BlobStore, BLOBS_DIR_NAME
+from .pack import PackWriter, PackReader
+from .layout import KeyLayout
+from .operators import (
+    pauli_decomposition,
+    is_qubit_operator,
+    encode_operator,
+)
+from .lazy import Deferred, LazyField
+from .changes import TrialChanges, ChangeTracked, COMPONENT_FIELDS, fingerprint
+from .cache import LRUCache, DiskCache
+from .replication import ReplicationQueue
+from .index import TrialIndex, trial_summary, match_summary
+
+if TYPE_CHECKING:
+    from .session import ApiSession, AsyncApiSession, token_expiration
+    from .manifest import S3Manifest
+
+# modules of backend specific dependencies, like requests or botocore,
+# are imported on first access of their attributes
+_LAZY_ATTRIBUTES = {
+    "ApiSession": "session",
+    "AsyncApiSession": "session",
+    "token_expiration": "session",
+    "S3Manifest": "manifest",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(
+            importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__), name
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
@@ -0,0 +1,166 @@
+"""Content-addressed blob store."""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+BLOBS_DIR_NAME = "blobs"
+TMP_PREFIX = ".tmp-"
+# temporary files older than this are leftovers of interrupted writes
+TMP_MAX_AGE = 3600
+
+
+class _HashingFile(io.RawIOBase):
+    """Write-only stream which hashes written data."""
+
+    def __init__(self, file: BinaryIO):
+        super().__init__()
+        self._file = file
+        self.hasher = hashlib.sha256()
+
+    def write(self, data) -> int:
+        """Writes and hashes data."""
+        self.hasher.update(data)
+        return self._file.write(data)
+
+    def writable(self) -> bool:
+        """Returns True, stream is writable."""
+        return True
+
+
+class BlobStore:
+    """Stores files by sha256 of their content.
+
+    Files of trials are hard links to blobs, so equal files
+    of different trials share disk space. Number of links of a blob
+    is its reference count, blobs without trial files referencing
+    them are removed by :meth:`collect_garbage`.
+    If file system does not support hard links, files are copied.
+
+    Example:
+        >>> blobs = BlobStore("./")
+        >>> blobs.store("./trial_1/text_x.json", lambda file: file.write(b"{}"))
+    """
+
+    def __init__(self, root: str):
+        """Creates blob store.
+
+        Args:
+            root: folder to store blobs folder in
+        """
+        self.path = os.path.join(root, BLOBS_DIR_NAME)
+
+    def blob_path(self, digest: str) -> str:
+        """Returns path of a blob.
+
+        Args:
+            digest: sha256 of blob content
+
+        Returns:
+            path of the blob
+        """
+        return os.path.join(self.path, digest[:2], digest)
+
+    def store(self, target: str, write: Callable[[BinaryIO], None]) -> str:
+        """Writes content into blob store and links target to it.
+
+        Args:
+            target: path of the file to link
+            write: writes content into given stream
+
+        Returns:
+            sha256 of content
+        """
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+        descriptor, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, dir=self.path)
+        try:
+            with os.fdopen(descriptor, "wb") as tmp_file:
+                hashing_file = _HashingFile(tmp_file)
+                write(hashing_file)
+            digest = hashing_file.hasher.hexdigest()
+            self._commit(tmp_path, digest, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def adopt(self, target: str) -> str:
+        """Moves already written file into blob store and links it back.
+
+        Args:
+            target: path of the file
+
+        Returns:
+            sha256 of content
+        """
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        with open(target, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        descriptor, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, dir=self.path)
+        os.close(descriptor)
+        try:
+            os.replace(target, tmp_path)
+            self._commit(tmp_path, digest, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def _commit(self, tmp_path: str, digest: str, target: str):
+        """Moves temporary file to its blob, unless blob exists, and links target."""
+        blob = self.blob_path(digest)
+        if not os.path.isfile(blob):
+            Path(os.path.dirname(blob)).mkdir(exist_ok=True)
+            os.replace(tmp_path, blob)
+        # link next to target and move in place, so target is never missing
+        link_path = f"{target}{TMP_PREFIX}link"
+        if os.path.exists(link_path):
+            os.remove(link_path)
+        try:
+            os.link(blob, link_path)
+        except OSError:
+            shutil.copyfile(blob, link_path)
+        os.replace(link_path, target)
+
+    def refcount(self, digest: str) -> int:
+        """Returns number of files referencing a blob.
+
+        Args:
+            digest: sha256 of blob content
+
+        Returns:
+            number of references, 0 if blob does not exist
+        """
+        blob = self.blob_path(digest)
+        if not os.path.isfile(blob):
+            return 0
+        return os.stat(blob).st_nlink - 1
+
+    def collect_garbage(self) -> int:
+        """Removes blobs which are not referenced by any file.
+
+        Returns:
+            number of removed blobs
+        """
+        removed = 0
+        if not os.path.isdir(self.path):
+            return removed
+        now = time.time()
+        for folder, _, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                if name.startswith(TMP_PREFIX):
+                    if now - stat.st_mtime > TMP_MAX_AGE:
+                        os.remove(path)
+                elif stat.st_nlink <= 1:
+                    os.remove(path)
+                    removed += 1
+        return removed
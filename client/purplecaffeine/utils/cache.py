@@ -0,0 +1,238 @@
+"""Size bounded caches."""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from purplecaffeine.utils.size import estimate_size
+
+
+class LRUCache:
+    """In-memory cache bounded by total size of values in bytes.
+
+    Least recently used values are evicted first.
+    Cache can be shared between threads.
+
+    Example:
+        >>> cache = LRUCache(max_bytes=1024 * 1024)
+        >>> cache.put("key", "value")
+        >>> cache.get("key")
+        'value'
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = estimate_size,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        """Creates cache.
+
+        Args:
+            max_bytes: maximal total size of values
+            sizeof: returns size of a value in bytes
+            on_evict: called with key and value evicted to make room,
+                lock of the cache is held
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._values: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns cached value and marks it as recently used.
+
+        Args:
+            key: key of the value
+            default: returned if key is not cached
+
+        Returns:
+            value
+        """
+        with self._lock:
+            if key not in self._values:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def put(self, key: str, value: Any, size: Optional[int] = None):
+        """Caches value, values bigger than the cache are not cached.
+
+        Args:
+            key: key of the value
+            value: value to cache
+            size: size of the value, measured with sizeof if None
+        """
+        size = self.sizeof(value) if size is None else size
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._values[key] = value
+            self._sizes[key] = size
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted = next(iter(self._values))
+                evicted_value = self._values[evicted]
+                self._remove(evicted)
+                self.evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(evicted, evicted_value)
+
+    def pop(self, key: str):
+        """Removes value from cache.
+
+        Args:
+            key: key of the value
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """Removes all values."""
+        with self._lock:
+            self._values.clear()
+            self._sizes.clear()
+            self.size = 0
+
+    def _remove(self, key: str):
+        """Removes value, lock must be held."""
+        if key in self._values:
+            del self._values[key]
+            self.size -= self._sizes.pop(key)
+
+
+class DiskCache:
+    """On-disk cache of pickled values bounded by total size of files.
+
+    Least recently read files are evicted first.
+    Values are pickled, so cache folder must not be shared with untrusted users.
+
+    Example:
+        >>> cache = DiskCache("./.cache", max_bytes=1024 * 1024 * 1024)
+        >>> cache.put("key", {"value": 42})
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        """Creates cache.
+
+        Args:
+            path: folder of cached files
+            max_bytes: maximal total size of cached files
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self.size = sum(
+            entry.stat().st_size
+            for entry in os.scandir(path)
+            if entry.name.endswith(".pkl")
+        )
+
+    def _file(self, key: str) -> str:
+        """Returns path of cached file of a key."""
+        return os.path.join(
+            self.path, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.pkl"
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns cached value and marks it as recently used.
+
+        Args:
+            key: key of the value
+            default: returned if key is not cached or file is broken
+
+        Returns:
+            value
+        """
+        file_path = self._file(key)
+        try:
+            with open(file_path, "rb") as file:
+                value = pickle.load(file)
+            os.utime(file_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            logging.warning("Cached file %s is broken, it is removed.", file_path)
+            self.pop(key)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """Caches value, values which can not be pickled are not cached.
+
+        Args:
+            key: key of the value
+            value: value to cache
+        """
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as error:
+            logging.debug("Value of %s is not cached on disk: %s", key, error)
+            return
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            descriptor, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, self._file(key))
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def pop(self, key: str):
+        """Removes value from cache.
+
+        Args:
+            key: key of the value
+        """
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        """Removes cached file, lock must be held."""
+        file_path = self._file(key)
+        if os.path.isfile(file_path):
+            self.size -= os.path.getsize(file_path)
+            os.remove(file_path)
+
+    def _evict(self):
+        """Removes least recently used files until cache fits, lock must be held."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.path) if entry.name.endswith(".pkl")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self.size <= self.max_bytes:
+                break
+            self.size -= entry.stat().st_size
+            os.remove(entry.path)
+            self.evictions += 1
@@ -0,0 +1,211 @@
+"""Tracking of trial components written to storages."""
+import hashlib
+import mmap
+import pickle
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from qiskit.quantum_info import Operator
+
+from purplecaffeine.helpers import Configuration
+
+# fields of trial components which storages write apart from trial.json
+COMPONENT_FIELDS = ("circuits", "operators", "texts", "arrays", "artifacts")
+# values hashed to detect changes made in place
+HASHING_MODES = ("arrays", "all")
+
+
+class _Same:
+    """Fingerprint equal to fingerprints of the same object only.
+
+    Value is referenced weakly if it can be, so fingerprints kept in caches
+    do not keep values, like memory maps, alive.
+    """
+
+    __slots__ = ("ref", "key")
+
+    def __init__(self, value: Any):
+        try:
+            self.ref = weakref.ref(value)
+        except TypeError:
+            # like lists, kept alive so that their id is not reused
+            self.ref = lambda: value
+        self.key = id(value)
+
+    def __eq__(self, other: Any) -> bool:
+        value = self.ref()
+        return isinstance(other, _Same) and value is not None and other.ref() is value
+
+    def __hash__(self) -> int:
+        return self.key
+
+
+def _is_frozen(array: np.ndarray) -> bool:
+    """Returns True if array is a read-only view of a read-only memory map."""
+    base: Any = array
+    while isinstance(base, np.ndarray):
+        if base.flags.writeable:
+            return False
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def _array_fingerprint(array: np.ndarray, deep: bool) -> Any:
+    """Returns fingerprint of a numeric array, see :func:`fingerprint`."""
+    if _is_frozen(array):
+        return _Same(array)
+    if not deep:
+        return None
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{array.dtype.str}{array.shape}".encode("utf-8"))
+    hasher.update(np.ascontiguousarray(array).reshape(-1).view(np.uint8))
+    return ("array", hasher.digest())
+
+
+def _pickle_fingerprint(value: Any) -> Any:
+    """Returns hash of pickled value, None if it can not be pickled."""
+    try:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return ("pickle", hashlib.blake2b(data, digest_size=16).digest())
+
+
+def fingerprint(value: Any, deep: bool = True, hashing: Optional[str] = None) -> Any:
+    """Returns fingerprint of component content.
+
+    Equal fingerprints mean equal content. Immutable values and
+    read-only memory-mapped arrays are compared as they are.
+    With "arrays" hashing, numeric arrays and matrices of operators,
+    which are often changed in place, are hashed and other values,
+    like circuits, are compared by identity: they are written again
+    when they are replaced or marked by :meth:`TrialChanges.changed`.
+    With "all" hashing, other values are hashed through pickle too.
+
+    Args:
+        value: component value
+        deep: hash values, else only fingerprints needing no hashing are returned
+        hashing: "arrays" or "all", Configuration.CHANGE_HASHING if None
+
+    Returns:
+        fingerprint, None if it is unknown
+    """
+    hashing = hashing or Configuration.CHANGE_HASHING
+    if hashing not in HASHING_MODES:
+        raise ValueError(f"Unknown hashing {hashing}, expected one of {HASHING_MODES}.")
+    if value is None or isinstance(value, (str, bytes, int, float, complex)):
+        return (type(value).__name__, value)
+    if isinstance(value, Operator):
+        data = _array_fingerprint(value.data, deep)
+        return (
+            None
+            if data is None
+            else ("operator", value.input_dims(), value.output_dims(), data)
+        )
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return _array_fingerprint(value, deep)
+    if hashing == "arrays":
+        return _Same(value)
+    return _pickle_fingerprint(value) if deep else None
+
+
+class TrialChanges:
+    """Fingerprints of trial components written to storage locations.
+
+    A component, like a circuit, is identified by its field and name.
+    A storage saving a trial again to the same location writes only
+    components which were added, replaced or marked as changed since,
+    or whose fingerprint differs from the written one,
+    like arrays changed in place, see :func:`fingerprint`.
+
+    Example:
+        >>> changes = TrialChanges()
+        >>> array = np.zeros(5)
+        >>> changes.written("./trial_1", [("arrays", "results", fingerprint(array))])
+        >>> array[:] = 7
+        >>> changes.is_written("./trial_1", "arrays", "results", fingerprint(array))
+        False
+    """
+
+    def __init__(self):
+        """Creates tracking of a trial written nowhere."""
+        self._written: Dict[str, Dict[Tuple[str, str], Any]] = {}
+
+    def changed(self, field: str, name: Optional[str] = None):
+        """Marks component as changed, so it is written by the next save.
+
+        Args:
+            field: field of the component, like "circuits"
+            name: name of the component, all components of field if None
+        """
+        for components in self._written.values():
+            for component in list(components):
+                if component[0] == field and name in (None, component[1]):
+                    del components[component]
+
+    def is_written(self, location: str, field: str, name: str, token: Any) -> bool:
+        """Returns True if component with given fingerprint is written to location.
+
+        Args:
+            location: location of the trial, like path of its folder
+            field: field of the component
+            name: name of the component
+            token: fingerprint of the component, see :func:`fingerprint`
+        """
+        if token is None:
+            return False
+        return self._written.get(location, {}).get((field, name)) == token
+
+    def written(self, location: str, components: Iterable[Tuple[str, str, Any]]):
+        """Records all components written to location.
+
+        Args:
+            location: location of the trial
+            components: (field, name, fingerprint) of all components
+                stored at location
+        """
+        self._written[location] = {
+            (field, name): token
+            for field, name, token in components
+            if token is not None
+        }
+
+    def loaded(
+        self, location: str, field: str, components: List[List[Any]]
+    ) -> List[List[Any]]:
+        """Records components read from location, which can be told
+        unchanged without hashing, like memory-mapped arrays.
+
+        Args:
+            location: location of the trial
+            field: field of the components
+            components: loaded [name, value] components
+
+        Returns:
+            components
+        """
+        records = self._written.setdefault(location, {})
+        for name, value in components:
+            token = fingerprint(value, deep=False)
+            if token is not None:
+                records[(field, name)] = token
+        return components
+
+
+class ChangeTracked:
+    """Base of objects with :class:`TrialChanges` kept out of their ``__dict__``,
+    which is serialized by storages."""
+
+    __slots__ = ("_changes",)
+
+    @property
+    def changes(self) -> TrialChanges:
+        """Components written to storages and their fingerprints."""
+        try:
+            return self._changes
+        except AttributeError:
+            # objects restored without __init__, like from caches
+            # pylint: disable=attribute-defined-outside-init
+            self._changes = TrialChanges()
+            return self._changes
@@ -0,0 +1,241 @@
+"""Compression codecs for trial payloads."""
+import gzip
+import io
+import json
+import logging
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterator, Optional, Type
+
+from purplecaffeine.exception import PurpleCaffeineException
+from purplecaffeine.helpers import Configuration
+from purplecaffeine.utils.instrumentation import (
+    DECODE,
+    ENCODE,
+    IO,
+    count_bytes,
+    span,
+    spanned,
+)
+from purplecaffeine.utils.json import encode_json, decode_json
+
+CODECS = ("none", "gzip", "zstd")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# bytes read from a stream at once
+CHUNK_SIZE = 1 << 16
+
+
+def _zstandard():
+    """Returns zstandard module or None if it is not installed."""
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel
+
+        return zstandard
+    except ImportError:
+        return None
+
+
+def resolve_codec(codec: Optional[str] = None) -> str:
+    """Returns codec to write payloads with.
+
+    Args:
+        codec: "none", "gzip" or "zstd", Configuration.CODEC if None
+
+    Returns:
+        codec name, "gzip" if zstd was asked but zstandard is not installed
+    """
+    codec = codec or Configuration.CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec}, expected one of {CODECS}.")
+    if codec == "zstd" and _zstandard() is None:
+        logging.warning(
+            "zstandard is not installed, gzip is used instead. "
+            "Install it with `pip install purplecaffeine[zstd]`."
+        )
+        return "gzip"
+    return codec
+
+
+def detect_codec(header: bytes) -> str:
+    """Returns codec of payload from its first bytes.
+
+    Args:
+        header: first bytes of the payload
+
+    Returns:
+        codec name
+    """
+    if header.startswith(GZIP_MAGIC):
+        return "gzip"
+    if header.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "none"
+
+
+class _PrefixedStream(io.RawIOBase):
+    """Stream which returns already read bytes before the rest of a stream."""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def compress_stream(stream: BinaryIO, codec: str) -> Iterator[BinaryIO]:
+    """Returns stream which compresses written data into stream.
+
+    Underlying stream is left open.
+
+    Args:
+        stream: binary stream to write compressed data into
+        codec: "none", "gzip" or "zstd"
+    """
+    if codec == "gzip":
+        # fixed mtime, so equal payloads give equal bytes
+        with gzip.GzipFile(fileobj=stream, mode="wb", mtime=0) as compressed:
+            yield compressed
+    elif codec == "zstd":
+        compressor = _zstandard().ZstdCompressor()
+        with compressor.stream_writer(stream, closefd=False) as compressed:
+            yield compressed
+    else:
+        yield stream
+
+
+@contextmanager
+def decompress_stream(stream: BinaryIO) -> Iterator[BinaryIO]:
+    """Returns stream of decompressed data, codec is detected from magic bytes.
+
+    Args:
+        stream: binary stream of a payload
+    """
+    header = stream.read(len(ZSTD_MAGIC))
+    codec = detect_codec(header)
+    buffered = io.BufferedReader(_PrefixedStream(header, stream), CHUNK_SIZE)
+    if codec == "gzip":
+        with gzip.GzipFile(fileobj=buffered, mode="rb") as decompressed:
+            yield decompressed
+    elif codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise PurpleCaffeineException(
+                "Payload is compressed with zstd, install zstandard to read it."
+            )
+        with zstandard.ZstdDecompressor().stream_reader(buffered) as decompressed:
+            yield decompressed
+    else:
+        yield buffered
+
+
+@spanned(ENCODE)
+def dump_json(
+    obj: Any,
+    stream: BinaryIO,
+    codec: str,
+    cls: Optional[Type[json.JSONEncoder]] = None,
+    indent: Optional[int] = None,
+):
+    """Encodes obj chunk by chunk into compressed stream.
+
+    Args:
+        obj: object to encode
+        stream: binary stream to write into
+        codec: "none", "gzip" or "zstd"
+        cls: json encoder
+        indent: json indent
+    """
+    with compress_stream(stream, codec) as compressed:
+        text = io.TextIOWrapper(compressed, encoding="utf-8", write_through=True)
+        json.dump(obj, text, cls=cls, indent=indent)
+        text.flush()
+        text.detach()
+
+
+def dumps_json(
+    obj: Any,
+    codec: str,
+    cls: Optional[Type[json.JSONEncoder]] = None,
+    indent: Optional[int] = None,
+) -> bytes:
+    """Returns compressed json payload of obj.
+
+    Uncompressed payloads without indent are encoded in a single pass
+    by :func:`~purplecaffeine.utils.json.encode_json`.
+
+    Args:
+        obj: object to encode
+        codec: "none", "gzip" or "zstd"
+        cls: json encoder
+        indent: json indent
+
+    Returns:
+        payload
+    """
+    if codec == "none" and indent is None:
+        return encode_json(obj, cls=cls or json.JSONEncoder)
+    buffer = io.BytesIO()
+    dump_json(obj, buffer, codec, cls=cls, indent=indent)
+    return buffer.getvalue()
+
+
+@spanned(DECODE)
+def load_json(stream: BinaryIO, cls: Optional[Type[json.JSONDecoder]] = None) -> Any:
+    """Decodes json payload of any codec.
+
+    Args:
+        stream: binary stream of the payload
+        cls: json decoder
+
+    Returns:
+        decoded object
+    """
+    with decompress_stream(stream) as decompressed:
+        return decode_json(decompressed.read(), cls=cls)
+
+
+def write_json(
+    path: str,
+    obj: Any,
+    codec: str,
+    cls: Optional[Type[json.JSONEncoder]] = None,
+):
+    """Writes json file, indented if not compressed.
+
+    Args:
+        path: path of the file
+        obj: object to encode
+        codec: "none", "gzip" or "zstd"
+        cls: json encoder
+    """
+    with span(IO), open(path, "wb") as file:
+        dump_json(obj, file, codec, cls=cls, indent=4 if codec == "none" else None)
+        count_bytes(sent=file.tell())
+
+
+def read_json(path: str, cls: Optional[Type[json.JSONDecoder]] = None) -> Any:
+    """Reads json file of any codec.
+
+    Args:
+        path: path of the file
+        cls: json decoder
+
+    Returns:
+        decoded object
+    """
+    with span(IO), open(path, "rb") as file:
+        obj = load_json(file, cls=cls)
+        count_bytes(received=file.tell())
+        return obj
@@ -0,0 +1,188 @@
+"""Trial index."""
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from purplecaffeine.helpers.conf import Configuration
+from purplecaffeine.utils.instrumentation import IO, spanned
+
+INDEX_FILE_NAME = "index.jsonl"
+INDEX_VERSION = 1
+COUNTED_FIELDS = (
+    "metrics",
+    "parameters",
+    "circuits",
+    "operators",
+    "artifacts",
+    "texts",
+    "arrays",
+)
+
+
+def trial_summary(trial: Any, mtime: float) -> Dict[str, Any]:
+    """Returns summary of a trial as stored in the index.
+
+    Args:
+        trial: trial to summarize
+        mtime: modification time of the trial
+
+    Returns:
+        summary entry
+    """
+    return {
+        "uuid": trial.uuid,
+        "name": trial.name,
+        "description": trial.description,
+        "tags": list(trial.tags),
+        "mtime": mtime,
+        # read raw values to not trigger loading of lazy components
+        "counts": {field: len(vars(trial)[field]) for field in COUNTED_FIELDS},
+    }
+
+
+def match_summary(summary: Dict[str, Any], query: Optional[str]) -> bool:
+    """Checks if summary matches search query.
+
+    Args:
+        summary: index entry
+        query: search query
+
+    Returns:
+        True if entry matches query
+    """
+    if not query:
+        return True
+    return (
+        query in summary["tags"]
+        or summary["name"].find(query) != -1
+        or (summary["description"] or "").find(query) != -1
+    )
+
+
+class TrialIndex:
+    """Append-only index of trial summaries.
+
+    First line of the file is a header with version of the index,
+    written by :meth:`rewrite`. Files without it were appended to
+    by older versions and miss trials saved before, see :meth:`is_complete`.
+    Every save appends one json line, last line for a uuid wins.
+    File is read incrementally: only lines appended since last read are parsed.
+    A read finding more superseded lines than live entries,
+    and at least Configuration.INDEX_COMPACTION_LINES of them, compacts the file.
+    Index can be shared between threads.
+    """
+
+    def __init__(self, path: str):
+        """Creates index stored in given folder.
+
+        Args:
+            path: folder of the index file
+        """
+        self.file_path = os.path.join(path, INDEX_FILE_NAME)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._offset = 0
+        self._lines = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Returns True if index file exists."""
+        return os.path.isfile(self.file_path)
+
+    def is_complete(self) -> bool:
+        """Returns True if index file exists and was built by :meth:`rewrite`."""
+        try:
+            with open(self.file_path, "rb") as index_file:
+                header = json.loads(index_file.readline())
+        except (OSError, ValueError):
+            return False
+        return isinstance(header, dict) and header.get("version") == INDEX_VERSION
+
+    @spanned(IO)
+    def add(self, summary: Dict[str, Any]):
+        """Appends summary to index.
+
+        Args:
+            summary: index entry
+        """
+        line = json.dumps(summary, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.file_path, "a", encoding="utf-8") as index_file:
+                index_file.write(line)
+
+    @spanned(IO)
+    def entries(self) -> List[Dict[str, Any]]:
+        """Returns all index entries.
+
+        Returns:
+            list of summaries
+        """
+        with self._lock:
+            if not self.exists():
+                self._entries, self._offset, self._lines = {}, 0, 0
+                return []
+            if os.path.getsize(self.file_path) < self._offset:
+                # index was rewritten
+                self._entries, self._offset, self._lines = {}, 0, 0
+            with open(self.file_path, "rb") as index_file:
+                index_file.seek(self._offset)
+                for line in index_file:
+                    if not line.endswith(b"\n"):
+                        # partially written line, read it next time
+                        break
+                    self._offset += len(line)
+                    try:
+                        summary = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "uuid" not in summary:
+                        # header
+                        continue
+                    self._lines += 1
+                    self._entries.pop(summary["uuid"], None)
+                    self._entries[summary["uuid"]] = summary
+            superseded = self._lines - len(self._entries)
+            if superseded >= max(
+                Configuration.INDEX_COMPACTION_LINES, len(self._entries)
+            ):
+                self._compact()
+            return list(self._entries.values())
+
+    def _compact(self):
+        """Rewrites index file with live entries only.
+
+        Compaction is skipped if lines were appended since the file was read,
+        like by saves of other processes.
+        """
+        tmp_path = self._write_tmp(list(self._entries.values()))
+        if os.path.getsize(self.file_path) != self._offset:
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, self.file_path)
+        self._offset = os.path.getsize(self.file_path)
+        self._lines = len(self._entries)
+
+    def _write_tmp(self, summaries: List[Dict[str, Any]]) -> str:
+        """Writes header and summaries to a temporary file next to the index.
+
+        Returns:
+            path of the temporary file
+        """
+        tmp_path = f"{self.file_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            index_file.write(json.dumps({"version": INDEX_VERSION}) + "\n")
+            for summary in summaries:
+                index_file.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        return tmp_path
+
+    @spanned(IO)
+    def rewrite(self, summaries: List[Dict[str, Any]]):
+        """Replaces index content with given summaries.
+
+        Args:
+            summaries: list of index entries
+        """
+        with self._lock:
+            os.replace(self._write_tmp(summaries), self.file_path)
+            self._entries, self._offset, self._lines = {}, 0, 0
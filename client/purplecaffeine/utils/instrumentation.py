@@ -0,0 +1,424 @@
+"""Timing and byte counting of storage operations."""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Union,
+)
+
+ENCODE = "encode"
+DECODE = "decode"
+IO = "io"
+HTTP = "http"
+TOKEN = "token"
+# time of an operation which is not covered by any phase
+OTHER = "other"
+INSTRUMENTED_METHODS = (
+    "save",
+    "save_many",
+    "get",
+    "list",
+    "asave",
+    "asave_many",
+    "aget",
+    "alist",
+)
+
+_operation: contextvars.ContextVar = contextvars.ContextVar(
+    "purplecaffeine_operation", default=None
+)
+_span: contextvars.ContextVar = contextvars.ContextVar(
+    "purplecaffeine_span", default=None
+)
+_NULL_SPAN = nullcontext()
+
+
+class Operation:
+    """Phases and transferred bytes of a single storage call."""
+
+    def __init__(self, storage: str, name: str):
+        """Starts operation.
+
+        Args:
+            storage: name of the storage class
+            name: name of the storage method
+        """
+        self.storage = storage
+        self.name = name
+        self.phases: Dict[str, float] = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.error: Optional[str] = None
+        self.timestamp = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_phase(self, phase: str, seconds: float):
+        """Adds time spent in a phase, phases of parallel threads add up."""
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_bytes(self, sent: int = 0, received: int = 0):
+        """Adds written or sent and read or received bytes."""
+        with self._lock:
+            self.bytes_out += sent
+            self.bytes_in += received
+
+    def record(self) -> Dict[str, Any]:
+        """Returns record of the finished operation."""
+        return {
+            "timestamp": self.timestamp,
+            "storage": self.storage,
+            "operation": self.name,
+            "duration": time.perf_counter() - self._start,
+            "phases": dict(self.phases),
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "error": self.error,
+        }
+
+
+class _Span:
+    """Times a phase of the current operation.
+
+    Time of nested spans is attributed to the innermost span only.
+    """
+
+    __slots__ = ("operation", "phase", "child", "_start", "_parent", "_token")
+
+    def __init__(self, operation: Operation, phase: str):
+        self.operation = operation
+        self.phase = phase
+        self.child = 0.0
+        self._start = 0.0
+        self._parent: Optional[_Span] = None
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> "_Span":
+        self._parent = _span.get()
+        self._token = _span.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._start
+        _span.reset(self._token)
+        self.operation.add_phase(self.phase, elapsed - self.child)
+        if self._parent is not None and self._parent.operation is self.operation:
+            self._parent.child += elapsed
+
+
+def active() -> bool:
+    """Returns True if an instrumented operation is running,
+    use it to skip measurements which are not free, like file sizes."""
+    return _operation.get() is not None
+
+
+def span(phase: str) -> Any:
+    """Returns context manager timing a phase of the current operation.
+
+    Example:
+        >>> with span(IO):
+        >>>     file.write(data)
+
+    Args:
+        phase: name of the phase, like :data:`IO`
+
+    Returns:
+        context manager, which does nothing outside of instrumented operations
+    """
+    operation = _operation.get()
+    if operation is None:
+        return _NULL_SPAN
+    return _Span(operation, phase)
+
+
+def spanned(phase: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function as a phase.
+
+    Args:
+        phase: name of the phase
+
+    Returns:
+        decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            operation = _operation.get()
+            if operation is None:
+                return function(*args, **kwargs)
+            with _Span(operation, phase):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count_bytes(sent: int = 0, received: int = 0):
+    """Adds transferred bytes to the current operation.
+
+    Args:
+        sent: written or sent bytes
+        received: read or received bytes
+    """
+    operation = _operation.get()
+    if operation is not None:
+        operation.add_bytes(sent, received)
+
+
+def bind_context(function: Callable) -> Callable:
+    """Returns function running in the context of the caller,
+    so its phases are added to the current operation from other threads."""
+    if _operation.get() is None:
+        return function
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # a context can not be entered by several threads at once
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
+
+
+def instrumented(method: Callable) -> Callable:
+    """Decorator recording calls of a storage method as operations.
+
+    Calls are recorded if storage has an instrumentation, calls made
+    during another operation, like gets of a list, are part of it.
+
+    Args:
+        method: storage method
+
+    Returns:
+        instrumented method
+    """
+    if getattr(method, "__instrumented__", False):
+        return method
+
+    if asyncio.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            if self.instrumentation is None or _operation.get() is not None:
+                return await method(self, *args, **kwargs)
+            with self.instrumentation.operation(type(self).__name__, method.__name__):
+                return await method(self, *args, **kwargs)
+
+        async_wrapper.__instrumented__ = True
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.instrumentation is None or _operation.get() is not None:
+            return method(self, *args, **kwargs)
+        with self.instrumentation.operation(type(self).__name__, method.__name__):
+            return method(self, *args, **kwargs)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def aggregate(
+    records: Iterable[Dict[str, Any]],
+    totals: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Sums operation records by storage and operation.
+
+    Args:
+        records: operation records
+        totals: totals to add records to, new totals if None
+
+    Returns:
+        totals by "<storage>.<operation>"
+    """
+    totals = {} if totals is None else totals
+    for record in records:
+        total = totals.setdefault(
+            f"{record['storage']}.{record['operation']}",
+            {
+                "calls": 0,
+                "errors": 0,
+                "duration": 0.0,
+                "bytes_out": 0,
+                "bytes_in": 0,
+                "phases": {},
+            },
+        )
+        total["calls"] += 1
+        total["errors"] += record["error"] is not None
+        total["duration"] += record["duration"]
+        total["bytes_out"] += record["bytes_out"]
+        total["bytes_in"] += record["bytes_in"]
+        for phase, seconds in record["phases"].items():
+            total["phases"][phase] = total["phases"].get(phase, 0.0) + seconds
+    return totals
+
+
+class Instrumentation:
+    """Collector of storage operations.
+
+    Every save, get and list of an instrumented storage is recorded with
+    time spent in encode, decode, io, http and token phases and
+    with written and read bytes. Records are summed up and passed to
+    callbacks, like :class:`JsonLinesExporter`.
+    Storages without instrumentation are not slowed down.
+
+    Example:
+        >>> instrumentation = Instrumentation([JsonLinesExporter("./spans.jsonl")])
+        >>> storage = LocalStorage("./").instrument(instrumentation)
+        >>> storage.save(trial)
+        >>> print_breakdown(instrumentation)
+    """
+
+    def __init__(
+        self, callbacks: Optional[List[Callable[[Dict[str, Any]], None]]] = None
+    ):
+        """Creates instrumentation.
+
+        Args:
+            callbacks: functions called with record of every operation
+        """
+        self.callbacks = list(callbacks or [])
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def operation(self, storage: str, name: str) -> Iterator[Operation]:
+        """Records operation running in the context.
+
+        Args:
+            storage: name of the storage class
+            name: name of the storage method
+
+        Yields:
+            running operation
+        """
+        operation = Operation(storage, name)
+        token = _operation.set(operation)
+        try:
+            yield operation
+        except BaseException as error:
+            operation.error = type(error).__name__
+            raise
+        finally:
+            _operation.reset(token)
+            self.emit(operation.record())
+
+    def emit(self, record: Dict[str, Any]):
+        """Adds record to totals and passes it to callbacks.
+
+        Args:
+            record: operation record
+        """
+        with self._lock:
+            aggregate([record], self._totals)
+        for callback in self.callbacks:
+            try:
+                callback(record)
+            except Exception as error:  # pylint: disable=broad-except
+                logging.warning("Instrumentation callback failed: %s", error)
+
+    def totals(self) -> Dict[str, Dict[str, Any]]:
+        """Returns sums of recorded operations.
+
+        Returns:
+            totals by "<storage>.<operation>"
+        """
+        with self._lock:
+            return json.loads(json.dumps(self._totals))
+
+    def reset(self):
+        """Forgets recorded operations."""
+        with self._lock:
+            self._totals = {}
+
+
+class JsonLinesExporter:
+    """Instrumentation callback appending records to a JSON lines file.
+
+    Example:
+        >>> Instrumentation([JsonLinesExporter("./spans.jsonl")])
+    """
+
+    def __init__(self, path: str):
+        """Creates exporter.
+
+        Args:
+            path: path of the file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Returns exported records."""
+        with open(self.path, "r", encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+
+def print_breakdown(
+    source: Union[Instrumentation, str, Iterable[Dict[str, Any]]],
+    file: Optional[TextIO] = None,
+):
+    """Prints time of every phase of recorded operations.
+
+    Phases of parallel threads add up, so their sum may exceed duration.
+
+    Example:
+        >>> print_breakdown("./spans.jsonl")
+
+    Args:
+        source: instrumentation, path of exported JSON lines file or records
+        file: stream to print to, stdout if None
+    """
+    if isinstance(source, Instrumentation):
+        totals = source.totals()
+    elif isinstance(source, str):
+        totals = aggregate(JsonLinesExporter(source).read())
+    else:
+        totals = aggregate(source)
+
+    phases = [ENCODE, DECODE, IO, HTTP, TOKEN]
+    phases += sorted(
+        {phase for total in totals.values() for phase in total["phases"]} - set(phases)
+    )
+    width = max([len("operation")] + [len(name) for name in totals])
+    lines = [
+        f"{'operation':{width}}  {'calls':>6}  {'mean ms':>9}  "
+        + "  ".join(f"{phase:>7}" for phase in phases + [OTHER])
+        + f"  {'out KB':>9}  {'in KB':>9}"
+    ]
+    for name, total in sorted(totals.items()):
+        duration = total["duration"] or 1e-12
+        shares = [total["phases"].get(phase, 0.0) / duration for phase in phases]
+        shares.append(max(0.0, 1 - sum(shares)))
+        lines.append(
+            f"{name:{width}}  {total['calls']:>6}  "
+            f"{total['duration'] / total['calls'] * 1000:>9.2f}  "
+            + "  ".join(f"{share:>7.1%}" for share in shares)
+            + f"  {total['bytes_out'] / 1024:>9.1f}  {total['bytes_in'] / 1024:>9.1f}"
+        )
+    print("\n".join(lines), file=file or sys.stdout)
@@ -0,0 +1,87 @@
+"""Trial journal."""
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Type
+
+JOURNAL_FILE_NAME = "journal.jsonl"
+
+
+class TrialJournal:
+    """Append-only journal of trial changes.
+
+    Records are json lines written through a buffered file.
+    File is flushed and synced to disk every ``fsync_every`` records.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 1):
+        """Creates journal.
+
+        Args:
+            path: path of journal file
+            fsync_every: number of records between syncs to disk
+        """
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self._file = None
+        self._pending = 0
+
+    def append(self, record: Dict[str, Any], cls: Optional[Type] = None):
+        """Appends record to journal.
+
+        Args:
+            record: json serializable record
+            cls: json encoder class
+        """
+        line = json.dumps(record, cls=cls) + "\n"
+        if self._file is None:
+            # pylint: disable=consider-using-with
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """Flushes buffered records and syncs them to disk."""
+        if self._file is not None and self._pending > 0:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self):
+        """Syncs and closes journal file."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Closes and removes journal file."""
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    @staticmethod
+    def read(path: str, cls: Optional[Type] = None) -> List[Dict[str, Any]]:
+        """Reads records of journal file.
+
+        Reading stops at first incomplete record,
+        like the one interrupted by a crash.
+
+        Args:
+            path: path of journal file
+            cls: json decoder class
+
+        Returns:
+            list of records
+        """
+        records = []
+        with open(path, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    records.append(json.loads(line, cls=cls))
+                except ValueError:
+                    logging.warning("Journal %s has incomplete record.", path)
+                    break
+        return records
@@ -1,13 +1,29 @@
 """Encoder / Decoder"""
+import json
+import math
 import pickle
-from typing import Any
+from typing import Any, Optional, Type, Union
 
 from qiskit.providers import Backend
 from qiskit.circuit import QuantumCircuit
+from qiskit.quantum_info import Operator, SparsePauliOp
 from qiskit_ibm_runtime.utils import RuntimeEncoder, RuntimeDecoder
 
+from purplecaffeine.utils.instrumentation import DECODE, ENCODE, spanned
+from purplecaffeine.utils.lazy import Deferred
+from purplecaffeine.utils.metrics import MetricLog
+from purplecaffeine.utils.operators import encode_operator, decode_operator
 
-# pylint: disable=no-else-return, import-outside-toplevel, cyclic-import
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# dicts with this key are decoded by object hooks
+TYPE_MARKER = b'"__type__"'
+
+
+# pylint: disable=no-else-return, import-outside-toplevel, cyclic-import, too-many-return-statements
 class TrialEncoder(RuntimeEncoder):
     """Json encoder for trial."""
 
@@ -24,6 +40,14 @@ class TrialEncoder(RuntimeEncoder):
             return {"__type__": "PurpleCaffeineStorage"}
         elif isinstance(obj, QuantumCircuit):
             return None
+        elif isinstance(obj, Deferred):
+            return obj.resolve()
+        elif isinstance(obj, MetricLog):
+            # legacy form read by api server and older versions
+            return obj.to_list()
+        elif isinstance(obj, (Operator, SparsePauliOp)):
+            # dense matrix is encoded only if Pauli terms are not smaller
+            return encode_operator(obj) or super().default(obj)
         return super().default(obj)
 
 
@@ -40,5 +64,112 @@ class TrialDecoder(RuntimeDecoder):
             elif obj_type == "PurpleCaffeineStorage":
                 # we should not recover trial backend
                 return None
+            elif obj_type == "MetricLog":
+                # written by earlier versions of the columnar log
+                return MetricLog.from_dict(obj["__value__"])
+            elif obj_type in ("PauliOperator", "SparsePauliOp"):
+                return decode_operator(obj)
             return super().object_hook(obj)
         return obj
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """Returns True if obj holds NaN or infinite floats outside of custom types."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+@spanned(ENCODE)
+def encode_json(obj: Any, cls: Type[json.JSONEncoder] = TrialEncoder) -> bytes:
+    """Encodes obj to json bytes in a single pass.
+
+    Uses orjson if it is installed, with encoder default for custom types.
+    orjson encodes NaN and infinite floats as null, so payloads with null
+    are checked for them and encoded by json module, which keeps them.
+
+    Args:
+        obj: object to encode
+        cls: json encoder
+
+    Returns:
+        json bytes
+    """
+    encoder = cls()
+    if orjson is not None:
+        converted = []
+
+        def default(value: Any) -> Any:
+            if isinstance(value, float):
+                # subclasses like numpy.float32
+                value = float(value)
+            else:
+                value = encoder.default(value)
+            converted.append(value)
+            return value
+
+        try:
+            data = orjson.dumps(
+                obj,
+                default=default,
+                option=orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+            if b"null" not in data or not _has_non_finite([obj, converted]):
+                return data
+        except orjson.JSONEncodeError:
+            # like integers bigger than 64 bits
+            pass
+    return encoder.encode(obj).encode("utf-8")
+
+
+def _apply_hook(obj: Any, hook) -> Any:
+    """Applies object hook to dicts with type marker, innermost first."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, (dict, list)):
+                obj[key] = _apply_hook(value, hook)
+        return hook(obj) if "__type__" in obj else obj
+    if isinstance(obj, list):
+        for index, value in enumerate(obj):
+            if isinstance(value, (dict, list)):
+                obj[index] = _apply_hook(value, hook)
+    return obj
+
+
+@spanned(DECODE)
+def decode_json(
+    data: Union[bytes, str], cls: Optional[Type[json.JSONDecoder]] = TrialDecoder
+) -> Any:
+    """Decodes json in a single pass.
+
+    Object hooks of the decoder run only if data has typed objects.
+    Uses orjson if it is installed.
+
+    Args:
+        data: json bytes or string
+        cls: json decoder with object hook
+
+    Returns:
+        decoded object
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    typed = cls is not None and TYPE_MARKER in data
+    if orjson is not None:
+        try:
+            obj = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # like NaN written by json module
+            return json.loads(data, cls=cls) if typed else json.loads(data)
+        return _apply_hook(obj, cls().object_hook) if typed else obj
+    return json.loads(data, cls=cls) if typed else json.loads(data)
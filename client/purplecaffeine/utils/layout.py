@@ -0,0 +1,108 @@
+"""Key layout of trials in object storages."""
+import hashlib
+import re
+import time
+from typing import Optional
+
+SCHEMA_VERSION = "v1"
+SHARDINGS = ("none", "hash", "date")
+HEADER_FILE_NAME = "trial.json"
+MANIFEST_FILE_NAME = "manifest.json"
+# folder of objects pointing date sharded trials to their shard
+IDS_DIR_NAME = "ids"
+DATE_SHARD_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class KeyLayout:
+    """Keys of trial objects in a bucket.
+
+    Objects of a trial are stored under
+    ``<directory>/<schema version>/<shard>/<uuid>/``,
+    so trials of a storage can be listed by prefix
+    without scanning other data of the bucket.
+
+    Shards are:
+        * "none": no shard
+        * "hash": first two hex digits of sha256 of trial uuid,
+          which spreads trials over 256 prefixes
+        * "date": UTC date of first save, like 2024-01-31,
+          so trials of a day can be listed, copied or expired together.
+          As the date is not known from the uuid, a pointer object
+          ``<directory>/<schema version>/ids/<uuid>`` holds the shard.
+
+    Example:
+        >>> layout = KeyLayout("experiments", sharding="hash")
+        >>> layout.header_key("trial_id", layout.shard("trial_id"))
+        'experiments/v1/f1/trial_id/trial.json'
+    """
+
+    def __init__(self, directory: Optional[str] = None, sharding: str = "none"):
+        """Creates layout.
+
+        Args:
+            directory: optional directory within bucket
+            sharding: "none", "hash" or "date"
+        """
+        if sharding not in SHARDINGS:
+            raise ValueError(
+                f"Unknown sharding {sharding}, expected one of {SHARDINGS}."
+            )
+        self.sharding = sharding
+        self.root = "/".join(
+            part for part in [(directory or "").strip("/"), SCHEMA_VERSION] if part
+        )
+
+    def shard(self, trial_id: str, created: Optional[float] = None) -> str:
+        """Returns shard of a trial.
+
+        Args:
+            trial_id: trial uuid
+            created: timestamp of first save for date sharding, now if None
+
+        Returns:
+            shard, empty if layout is not sharded
+        """
+        if self.sharding == "hash":
+            return hashlib.sha256(trial_id.encode("utf-8")).hexdigest()[:2]
+        if self.sharding == "date":
+            return time.strftime("%Y-%m-%d", time.gmtime(created))
+        return ""
+
+    def prefix(self, trial_id: str, shard: str) -> str:
+        """Returns prefix of all objects of a trial."""
+        return "/".join(part for part in [self.root, shard, trial_id] if part) + "/"
+
+    def header_key(self, trial_id: str, shard: str) -> str:
+        """Returns key of trial.json of a trial."""
+        return self.prefix(trial_id, shard) + HEADER_FILE_NAME
+
+    def pointer_key(self, trial_id: str) -> str:
+        """Returns key of object holding date shard of a trial."""
+        return f"{self.root}/{IDS_DIR_NAME}/{trial_id}"
+
+    def manifest_key(self) -> str:
+        """Returns key of manifest of trials."""
+        return f"{self.root}/{MANIFEST_FILE_NAME}"
+
+    def is_header_key(self, key: str) -> bool:
+        """Returns True if key is trial.json of a trial of this layout."""
+        if not key.startswith(f"{self.root}/") or not key.endswith(
+            f"/{HEADER_FILE_NAME}"
+        ):
+            return False
+        parts = key[len(self.root) + 1 :].split("/")
+        return len(parts) == (2 if self.sharding == "none" else 3)
+
+    @staticmethod
+    def is_date_shard(shard: str) -> bool:
+        """Returns True if shard is a date shard."""
+        return DATE_SHARD_PATTERN.fullmatch(shard) is not None
+
+    @staticmethod
+    def trial_id(header_key: str) -> str:
+        """Returns trial uuid of trial.json key."""
+        return header_key.rsplit("/", 2)[-2]
+
+    def shard_of(self, header_key: str) -> str:
+        """Returns shard of trial.json key, empty if layout is not sharded."""
+        return "" if self.sharding == "none" else header_key.rsplit("/", 3)[-3]
@@ -0,0 +1,54 @@
+"""Lazy loading of trial components."""
+from typing import Any, Callable, List
+
+
+class Deferred:
+    """Component value which is loaded on first access.
+
+    Args:
+        loader: function returning loaded value
+        length: number of entries of the value, known without loading it
+    """
+
+    def __init__(self, loader: Callable[[], List[Any]], length: int = 0):
+        self._loader = loader
+        self._length = length
+        self._value = None
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._value) if self.loaded else self._length
+
+    def __repr__(self) -> str:
+        return f"<Deferred [{self._length} entries]>"
+
+    def resolve(self) -> List[Any]:
+        """Loads value once and returns it."""
+        if not self.loaded:
+            self._value = self._loader()
+            self._loader = None
+            self.loaded = True
+        return self._value
+
+
+class LazyField:
+    """Trial attribute resolving :class:`Deferred` values on first access.
+
+    Value is kept in instance ``__dict__`` under the attribute name,
+    so trial serialization is not affected.
+    """
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name  # pylint: disable=attribute-defined-outside-init
+
+    def __get__(self, instance: Any, owner: type) -> Any:
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name]
+        if isinstance(value, Deferred):
+            value = value.resolve()
+            instance.__dict__[self.name] = value
+        return value
+
+    def __set__(self, instance: Any, value: Any):
+        instance.__dict__[self.name] = value
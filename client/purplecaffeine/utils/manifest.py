@@ -0,0 +1,326 @@
+"""Manifest of trials in object storages."""
+import hashlib
+import logging
+import os
+import threading
+import time
+from tempfile import gettempdir
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from purplecaffeine.helpers import Configuration
+from purplecaffeine.utils.codec import dumps_json, load_json, read_json
+from purplecaffeine.utils.instrumentation import IO, count_bytes, span
+
+# errors of conditional writes when manifest was changed or removed concurrently
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "NoSuchKey")
+NOT_FOUND_CODES = ("404", "NoSuchKey")
+
+
+class S3Manifest:
+    """Index of trial summaries stored in objects of a bucket.
+
+    Manifest is a base object and segment objects under
+    ``<base key without extension>.d/``. Every save writes a segment
+    with its summary only, so saves do not read the manifest
+    and concurrent saves do not conflict.
+    Reads merge segments into the base, in order of their keys,
+    and a read finding Configuration.S3_MANIFEST_SEGMENTS segments
+    compacts them into the base with a conditional write.
+    Base and segments are cached locally, so reading an unchanged
+    manifest costs a HEAD and a LIST request.
+    Manifest is not created by saves, storages build it
+    from trial objects on first read.
+
+    Example:
+        >>> manifest = S3Manifest(boto3.client("s3"), "bucket", "v1/manifest.json")
+        >>> manifest.entries()
+    """
+
+    def __init__(
+        self,
+        client_s3: Any,
+        bucket_name: str,
+        key: str,
+        codec: str = "none",
+        cache_path: Optional[str] = None,
+    ):
+        """Creates manifest.
+
+        Args:
+            client_s3: boto3 s3 client
+            bucket_name: bucket name
+            key: key of the base object of the manifest
+            codec: compression of the manifest, "none", "gzip" or "zstd"
+            cache_path: folder of local cache,
+                Configuration.S3_CACHE_PATH or temporary folder if None
+        """
+        self.client_s3 = client_s3
+        self.bucket_name = bucket_name
+        self.key = key
+        self.segments_prefix = f"{os.path.splitext(key)[0]}.d/"
+        self.codec = codec
+        cache_path = cache_path or Configuration.S3_CACHE_PATH
+        self.cache_path = cache_path or os.path.join(
+            gettempdir(), "purplecaffeine", "s3"
+        )
+        cache_name = hashlib.sha256(
+            f"{client_s3.meta.endpoint_url}/{bucket_name}/{key}".encode("utf-8")
+        ).hexdigest()
+        self.cache_file = os.path.join(self.cache_path, f"{cache_name}.json")
+        self._etag: Optional[str] = None
+        self._base: Dict[str, Dict[str, Any]] = {}
+        # keys of segments merged into the base, which may be not deleted yet
+        self._merged: List[str] = []
+        # entries of listed segments not merged into the base, by key
+        self._segments: Dict[str, List[Dict[str, Any]]] = {}
+        # base is known to exist, so saves write segments without checking it
+        self._exists = False
+        self._lock = threading.Lock()
+
+    def _head(self) -> Optional[str]:
+        """Returns ETag of the base, None if it does not exist."""
+        try:
+            with span(IO):
+                return self.client_s3.head_object(
+                    Bucket=self.bucket_name, Key=self.key
+                )["ETag"]
+        except ClientError as error:
+            if error.response["Error"]["Code"] in NOT_FOUND_CODES:
+                return None
+            raise
+
+    def _load(self) -> bool:
+        """Reads base if it changed since last read and segments not read yet.
+
+        Returns:
+            False if manifest does not exist
+        """
+        etag = self._head()
+        if etag is None:
+            self._etag, self._base, self._merged = None, {}, []
+            self._exists = False
+            return False
+        self._exists = True
+        changed = False
+        if etag != self._etag:
+            cached = self._read_cache()
+            for key, entries in cached.get("segments", {}).items():
+                self._segments.setdefault(key, entries)
+            if cached.get("etag") == etag:
+                self._set_base(etag, cached["entries"], cached.get("merged", []))
+            else:
+                try:
+                    with span(IO):
+                        response = self.client_s3.get_object(
+                            Bucket=self.bucket_name, Key=self.key, IfMatch=etag
+                        )
+                except ClientError as error:
+                    if error.response["Error"]["Code"] in CONFLICT_CODES:
+                        # changed after HEAD
+                        return self._load()
+                    raise
+                count_bytes(received=response.get("ContentLength", 0))
+                base = load_json(response["Body"])
+                self._set_base(
+                    response["ETag"], base["entries"], base.get("merged", [])
+                )
+                changed = True
+        changed |= self._load_segments()
+        if changed:
+            self._write_cache()
+        return True
+
+    def _load_segments(self) -> bool:
+        """Lists segments, reads new ones and forgets merged ones.
+
+        Returns:
+            True if known segments changed
+        """
+        listed = []
+        paginator = self.client_s3.get_paginator("list_objects_v2")
+        with span(IO):
+            for result in paginator.paginate(
+                Bucket=self.bucket_name, Prefix=self.segments_prefix
+            ):
+                listed.extend(
+                    s3_object["Key"] for s3_object in result.get("Contents", [])
+                )
+        merged = set(self._merged)
+        # segments merged and deleted by compaction are not listed anymore
+        listed_keys = set(listed)
+        self._merged = [key for key in self._merged if key in listed_keys]
+        pending = [key for key in listed if key not in merged]
+        missing = [key for key in pending if key not in self._segments]
+        forgotten = set(self._segments) - set(pending)
+        for key in forgotten:
+            del self._segments[key]
+        # segments are read once, compaction bounds their number
+        for key in missing:
+            entries = self._read_segment(key)
+            if entries is not None:
+                self._segments[key] = entries
+        return bool(missing or forgotten)
+
+    def _read_segment(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns entries of a segment, None if it was removed by compaction."""
+        try:
+            with span(IO):
+                response = self.client_s3.get_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as error:
+            if error.response["Error"]["Code"] in NOT_FOUND_CODES:
+                return None
+            raise
+        count_bytes(received=response.get("ContentLength", 0))
+        return load_json(response["Body"])["entries"]
+
+    def _set_base(self, etag: str, entries: List[Dict[str, Any]], merged: List[str]):
+        """Replaces base in memory."""
+        self._etag = etag
+        self._base = {entry["uuid"]: entry for entry in entries}
+        self._merged = list(merged)
+        for key in merged:
+            self._segments.pop(key, None)
+
+    def _read_cache(self) -> Dict[str, Any]:
+        """Returns content of local cache, empty if there is no cache."""
+        if not os.path.isfile(self.cache_file):
+            return {}
+        return read_json(self.cache_file)
+
+    def _write_cache(self):
+        """Writes base and segments in memory to local cache."""
+        os.makedirs(self.cache_path, exist_ok=True)
+        tmp_path = f"{self.cache_file}.{uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as cache_file:
+            cache_file.write(
+                dumps_json(
+                    {
+                        "etag": self._etag,
+                        "entries": list(self._base.values()),
+                        "merged": self._merged,
+                        "segments": self._segments,
+                    },
+                    self.codec,
+                )
+            )
+        os.replace(tmp_path, self.cache_file)
+
+    def _put(self, key: str, content: Dict[str, Any], **conditions) -> str:
+        """Writes object of the manifest, returns its ETag."""
+        extra_args = {} if self.codec == "none" else {"ContentEncoding": self.codec}
+        body = dumps_json(content, self.codec)
+        count_bytes(sent=len(body))
+        with span(IO):
+            response = self.client_s3.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=body,
+                **extra_args,
+                **conditions,
+            )
+        return response["ETag"]
+
+    def _merge(self) -> Dict[str, Dict[str, Any]]:
+        """Returns entries of base with segments merged in."""
+        entries = dict(self._base)
+        for key in sorted(self._segments):
+            for entry in self._segments[key]:
+                entries.pop(entry["uuid"], None)
+                entries[entry["uuid"]] = entry
+        return entries
+
+    def _compact(self, entries: List[Dict[str, Any]]):
+        """Merges segments into the base and deletes them.
+
+        Compaction is skipped if the base was changed concurrently,
+        like compacted by another reader, or if it can not be written.
+        """
+        merged = self._merged + sorted(self._segments)
+        try:
+            etag = self._put(
+                self.key, {"entries": entries, "merged": merged}, IfMatch=self._etag
+            )
+        except (BotoCoreError, ClientError) as error:
+            logging.debug("Manifest %s is not compacted: %s", self.key, error)
+            return
+        self._set_base(etag, entries, merged)
+        self._write_cache()
+        try:
+            with span(IO):
+                for start in range(0, len(merged), 1000):
+                    self.client_s3.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={
+                            "Objects": [
+                                {"Key": key} for key in merged[start : start + 1000]
+                            ]
+                        },
+                    )
+        except (BotoCoreError, ClientError) as error:
+            # merged segments are skipped by reads until they are deleted
+            logging.debug(
+                "Segments of manifest %s are not deleted: %s", self.key, error
+            )
+
+    def entries(self) -> Optional[List[Dict[str, Any]]]:
+        """Returns all manifest entries, in order of saving.
+
+        Returns:
+            list of summaries or None if manifest does not exist
+        """
+        with self._lock:
+            if not self._load():
+                return None
+            entries = list(self._merge().values())
+            if len(self._segments) >= Configuration.S3_MANIFEST_SEGMENTS:
+                self._compact(entries)
+            return entries
+
+    def add(self, summary: Dict[str, Any]) -> bool:
+        """Writes segment with summary.
+
+        Failures are logged and not raised, as the trial is already saved,
+        :meth:`rewrite` with summaries of all trials indexes it.
+
+        Args:
+            summary: index entry
+
+        Returns:
+            False if summary was not added, like if manifest does not exist
+        """
+        # segment keys sort in order of saving
+        key = f"{self.segments_prefix}{time.time_ns():020d}-{uuid4().hex}.json"
+        try:
+            if not self._exists:
+                self._exists = self._head() is not None
+                if not self._exists:
+                    return False
+            self._put(key, {"entries": [summary]})
+        except (BotoCoreError, ClientError) as error:
+            logging.warning(
+                "Trial %s is saved, but not added to manifest %s: %s",
+                summary["uuid"],
+                self.key,
+                error,
+            )
+            return False
+        with self._lock:
+            self._segments[key] = [summary]
+        return True
+
+    def rewrite(self, summaries: List[Dict[str, Any]]):
+        """Replaces base of the manifest with given summaries.
+
+        Segments are kept and merged on read,
+        so saves during a rebuild are not lost.
+
+        Args:
+            summaries: list of index entries
+        """
+        with self._lock:
+            self._set_base(self._put(self.key, {"entries": summaries}), summaries, [])
+            self._exists = True
+            self._write_cache()
@@ -0,0 +1,384 @@
+"""Metric log."""
+import time
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+import numpy as np
+
+INITIAL_CAPACITY = 16
+# largest integer magnitude up to which all integers are exact in float64
+MAX_EXACT_INT = 2**53
+
+
+def _grow(buffer: np.ndarray, size: int) -> np.ndarray:
+    """Returns buffer with capacity for at least one more element."""
+    if size < len(buffer):
+        return buffer
+    grown = np.empty(max(INITIAL_CAPACITY, 2 * len(buffer)), dtype=buffer.dtype)
+    grown[:size] = buffer[:size]
+    return grown
+
+
+def _scalar(value: Any) -> Any:
+    """Converts numpy scalar to python object."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class MetricColumn:
+    """Growable columns of values, steps and timestamps of one metric."""
+
+    def __init__(self):
+        """Creates empty metric column."""
+        self.size = 0
+        self._values = np.empty(0, dtype=np.int64)
+        self._steps = np.empty(0, dtype=np.int64)
+        self._timestamps = np.empty(0, dtype=np.float64)
+
+    @classmethod
+    def from_arrays(
+        cls, values: np.ndarray, steps: np.ndarray, timestamps: np.ndarray
+    ) -> "MetricColumn":
+        """Creates column from arrays.
+
+        Args:
+            values: metric values, list for values kept as objects
+            steps: steps of the values
+            timestamps: wall-clock times of the values
+
+        Returns:
+            metric column
+        """
+        column = cls()
+        column.size = len(values)
+        column._values = (
+            np.array(values, dtype=object)
+            if isinstance(values, list)
+            else np.array(values)
+        )
+        column._steps = np.array(steps, dtype=np.int64)
+        column._timestamps = np.array(timestamps, dtype=np.float64)
+        return column
+
+    def _promote(self, value: Any):
+        """Widens values dtype if value does not fit in it.
+
+        Integers and floats share a float64 column only while all of them
+        are exactly representable as floats, else values are kept as objects.
+        """
+        dtype = self._values.dtype
+        if dtype == object:
+            return
+        if isinstance(value, (bool, np.bool_)) or not isinstance(
+            value, (int, float, np.integer, np.floating)
+        ):
+            new_dtype = np.dtype(object)
+        elif isinstance(value, (int, np.integer)):
+            if not -(2**63) <= value < 2**63 or (
+                dtype == np.float64 and not -MAX_EXACT_INT <= value <= MAX_EXACT_INT
+            ):
+                new_dtype = np.dtype(object)
+            else:
+                return
+        elif dtype == np.int64:
+            values = self.values
+            exact = bool(np.all((values >= -MAX_EXACT_INT) & (values <= MAX_EXACT_INT)))
+            new_dtype = np.dtype(np.float64 if exact else object)
+        else:
+            return
+        self._values = self._values.astype(new_dtype)
+
+    def append(self, value: Any, step: int, timestamp: float):
+        """Appends value to the column.
+
+        Args:
+            value: metric value
+            step: step of the value
+            timestamp: wall-clock time of the value
+        """
+        self._promote(value)
+        self._values = _grow(self._values, self.size)
+        self._steps = _grow(self._steps, self.size)
+        self._timestamps = _grow(self._timestamps, self.size)
+        self._values[self.size] = value
+        self._steps[self.size] = step
+        self._timestamps[self.size] = timestamp
+        self.size += 1
+
+    @property
+    def values(self) -> np.ndarray:
+        """Metric values."""
+        return self._values[: self.size]
+
+    @property
+    def steps(self) -> np.ndarray:
+        """Steps of the values."""
+        return self._steps[: self.size]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Wall-clock times of the values."""
+        return self._timestamps[: self.size]
+
+
+class MetricLog:
+    """Columnar log of trial metrics.
+
+    Each metric is stored in its own growable numpy buffers
+    with step and timestamp columns.
+    Iterating over the log gives legacy ``[name, value]`` entries
+    in the order they were added, json encoders write them,
+    :meth:`to_arrays` gives the columns with steps and timestamps.
+
+    Example:
+        >>> metrics = MetricLog()
+        >>> metrics.add("energy", -1.1, step=0)
+        >>> metrics.last("energy")
+        -1.1
+        >>> list(metrics)
+        [['energy', -1.1]]
+    """
+
+    def __init__(self, metrics: Optional[List[List[Any]]] = None):
+        """Creates metric log.
+
+        Args:
+            metrics: legacy list of ``[name, value]`` entries
+        """
+        self._columns: Dict[str, MetricColumn] = {}
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._order = np.empty(0, dtype=np.int32)
+        self._size = 0
+        for metric in metrics or []:
+            self.append(metric)
+
+    def add(
+        self,
+        name: str,
+        value: Any,
+        step: Optional[int] = None,
+        timestamp: Optional[float] = None,
+    ):
+        """Adds metric value.
+
+        Args:
+            name: name of metric
+            value: value of metric
+            step: step of value, defaults to number of previous values of the metric
+            timestamp: wall-clock time of value, defaults to current time
+        """
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = MetricColumn()
+            self._ids[name] = len(self._names)
+            self._names.append(name)
+        self._order = _grow(self._order, self._size)
+        self._order[self._size] = self._ids[name]
+        self._size += 1
+        column.append(
+            value,
+            column.size if step is None else step,
+            time.time() if timestamp is None else timestamp,
+        )
+
+    def append(self, metric: List[Any]):
+        """Adds legacy metric entry.
+
+        Args:
+            metric: ``[name, value]`` or ``[name, value, step, timestamp]``
+        """
+        self.add(*metric)
+
+    def names(self) -> List[str]:
+        """Returns names of metrics in order of first appearance."""
+        return list(self._names)
+
+    def _column(self, name: str) -> MetricColumn:
+        """Returns column of metric."""
+        if name not in self._columns:
+            raise KeyError(name)
+        return self._columns[name]
+
+    def values(
+        self, name: str, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> np.ndarray:
+        """Returns values of metric, optionally sliced by step.
+
+        Args:
+            name: name of metric
+            start: first step to include
+            stop: first step to exclude
+
+        Returns:
+            array of values
+        """
+        column = self._column(name)
+        if start is None and stop is None:
+            return column.values
+        mask = np.ones(column.size, dtype=bool)
+        if start is not None:
+            mask &= column.steps >= start
+        if stop is not None:
+            mask &= column.steps < stop
+        return column.values[mask]
+
+    def steps(self, name: str) -> np.ndarray:
+        """Returns steps of metric values."""
+        return self._column(name).steps
+
+    def timestamps(self, name: str) -> np.ndarray:
+        """Returns wall-clock times of metric values."""
+        return self._column(name).timestamps
+
+    def last(self, name: str) -> Any:
+        """Returns last value of metric."""
+        return _scalar(self._column(name).values[-1])
+
+    def min(self, name: str) -> Any:
+        """Returns minimal value of metric."""
+        return _scalar(self._column(name).values.min())
+
+    def max(self, name: str) -> Any:
+        """Returns maximal value of metric."""
+        return _scalar(self._column(name).values.max())
+
+    def mean(self, name: str) -> float:
+        """Returns mean value of metric."""
+        return float(self._column(name).values.mean())
+
+    def to_list(self) -> List[List[Any]]:
+        """Returns legacy list of ``[name, value]`` entries."""
+        return list(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns columnar representation of the log.
+
+        Values of mixed or big numbers are given as lists,
+        so that they are not cast when they are decoded.
+        """
+        return {
+            "names": list(self._names),
+            "order": self._order[: self._size],
+            "columns": {
+                name: {
+                    "values": column.values.tolist()
+                    if column.values.dtype == object
+                    else column.values,
+                    "steps": column.steps,
+                    "timestamps": column.timestamps,
+                }
+                for name, column in self._columns.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetricLog":
+        """Creates log from columnar representation.
+
+        Args:
+            data: output of :meth:`to_dict`
+
+        Returns:
+            metric log
+        """
+        return cls._from_columns(
+            data["names"],
+            data["order"],
+            {
+                name: MetricColumn.from_arrays(
+                    column["values"], column["steps"], column["timestamps"]
+                )
+                for name, column in data["columns"].items()
+            },
+        )
+
+    def to_arrays(self, encode: Callable[[List[Any]], bytes]) -> Dict[str, np.ndarray]:
+        """Returns columns of the log as numeric arrays, like for ``np.savez``.
+
+        Values kept as objects are encoded to bytes.
+
+        Args:
+            encode: encodes list of values to bytes
+
+        Returns:
+            arrays by name
+        """
+        arrays = {
+            "names": np.array(self._names, dtype=str),
+            "order": self._order[: self._size],
+        }
+        for index, name in enumerate(self._names):
+            column = self._columns[name]
+            if column.values.dtype == object:
+                arrays[f"encoded_{index}"] = np.frombuffer(
+                    encode(column.values.tolist()), dtype=np.uint8
+                )
+            else:
+                arrays[f"values_{index}"] = column.values
+            arrays[f"steps_{index}"] = column.steps
+            arrays[f"timestamps_{index}"] = column.timestamps
+        return arrays
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Mapping[str, np.ndarray], decode: Callable[[bytes], List[Any]]
+    ) -> "MetricLog":
+        """Creates log from its columns as numeric arrays.
+
+        Args:
+            arrays: output of :meth:`to_arrays`, like a loaded ``.npz`` file
+            decode: decodes bytes to list of values
+
+        Returns:
+            metric log
+        """
+        names = arrays["names"].tolist()
+        return cls._from_columns(
+            names,
+            arrays["order"],
+            {
+                name: MetricColumn.from_arrays(
+                    decode(arrays[f"encoded_{index}"].tobytes())
+                    if f"encoded_{index}" in arrays
+                    else arrays[f"values_{index}"],
+                    arrays[f"steps_{index}"],
+                    arrays[f"timestamps_{index}"],
+                )
+                for index, name in enumerate(names)
+            },
+        )
+
+    @classmethod
+    def _from_columns(
+        cls, names: List[str], order: Any, columns: Dict[str, MetricColumn]
+    ) -> "MetricLog":
+        """Creates log from names, order of entries and columns of metrics."""
+        log = cls()
+        log._names = list(names)
+        log._ids = {name: index for index, name in enumerate(log._names)}
+        log._order = np.array(order, dtype=np.int32)
+        log._size = len(log._order)
+        log._columns = columns
+        return log
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        columns = [self._columns[name].values.tolist() for name in self._names]
+        cursors = [0] * len(self._names)
+        for index in self._order[: self._size].tolist():
+            yield [self._names[index], columns[index][cursors[index]]]
+            cursors[index] += 1
+
+    def __getitem__(self, index: int) -> List[Any]:
+        return self.to_list()[index]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, MetricLog):
+            return self.to_list() == other.to_list()
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<MetricLog {self._names} [{self._size} entries]>"
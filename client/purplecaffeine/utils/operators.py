@@ -0,0 +1,150 @@
+"""Compact operators encoding."""
+from typing import Any, Dict, Optional
+
+import numpy as np
+from qiskit.quantum_info import Operator, SparsePauliOp
+
+from purplecaffeine.helpers import Configuration
+from purplecaffeine.utils.cache import LRUCache
+from purplecaffeine.utils.changes import fingerprint
+
+# rounding error of Pauli decomposition allowed per qubit, in units of float epsilon
+ROUNDING_ULPS = 4
+# memory used at once to compare a Pauli decomposition with the matrix
+CHECK_BLOCK_BYTES = 16 * 1024 * 1024
+# encodings of operators by their fingerprint, unchanged operators
+# are not decomposed again when they are saved again
+_ENCODINGS = LRUCache(max_bytes=Configuration.OPERATOR_ENCODING_CACHE_BYTES)
+
+
+def is_qubit_operator(operator: Operator) -> bool:
+    """Returns True if operator acts on qubits only."""
+    return set(operator.input_dims()) | set(operator.output_dims()) == {2}
+
+
+def _parity(values: np.ndarray) -> np.ndarray:
+    """Returns parity of number of set bits of 64 bits integers."""
+    for shift in (32, 16, 8, 4, 2, 1):
+        values = values ^ (values >> shift)
+    return values & 1
+
+
+def _reconstruction_error(sparse: SparsePauliOp, data: np.ndarray) -> float:
+    """Returns biggest difference between entries of Pauli operator and matrix.
+
+    Operator is expanded a block of rows at a time, so memory used
+    is bounded by CHECK_BLOCK_BYTES and not by size of the matrix.
+    """
+    num_qubits = sparse.num_qubits
+    dim = 2**num_qubits
+    weights = 1 << np.arange(num_qubits, dtype=np.int64)
+    x_masks = sparse.paulis.x.astype(np.int64) @ weights
+    z_masks = sparse.paulis.z.astype(np.int64) @ weights
+    # Pauli is (-i)^q Z^z X^x, entry of row r is in column r ^ x,
+    # with sign of parity of r & z
+    group_phases = sparse.paulis.phase + np.count_nonzero(
+        sparse.paulis.x & sparse.paulis.z, axis=1
+    )
+    factors = sparse.coeffs * (-1j) ** (group_phases % 4)
+    block_rows = max(1, CHECK_BLOCK_BYTES // (16 * max(dim, len(sparse))))
+    error = 0.0
+    for start in range(0, dim, block_rows):
+        rows = np.arange(start, min(dim, start + block_rows), dtype=np.int64)
+        indices = ((rows - start)[:, None] * dim + (rows[:, None] ^ x_masks)).ravel()
+        values = (factors * (1 - 2 * _parity(rows[:, None] & z_masks))).ravel()
+        size = len(rows) * dim
+        block = np.bincount(indices, weights=values.real, minlength=size) + 1j * (
+            np.bincount(indices, weights=values.imag, minlength=size)
+        )
+        block -= data[start : start + len(rows)].ravel()
+        error = max(error, float(np.abs(block).max(initial=0.0)))
+    return error
+
+
+def pauli_decomposition(operator: Operator) -> Optional[SparsePauliOp]:
+    """Returns Pauli decomposition of operator if it is smaller than dense matrix.
+
+    No coefficient is dropped as negligible, and the decomposition is used
+    only if it gives back the matrix up to rounding of its biggest entries,
+    so small entries are kept exactly.
+
+    Args:
+        operator: qubit operator
+
+    Returns:
+        sparse Pauli operator or None if dense matrix is more compact or exact
+    """
+    if (
+        not is_qubit_operator(operator)
+        or operator.input_dims() != operator.output_dims()
+        or operator.num_qubits > Configuration.OPERATOR_MAX_PAULI_QUBITS
+    ):
+        return None
+    sparse = SparsePauliOp.from_operator(operator, atol=0, rtol=0)
+    # label and complex coefficient per term
+    if len(sparse) * (operator.num_qubits + 16) >= operator.data.nbytes:
+        return None
+    error = _reconstruction_error(sparse, operator.data)
+    scale = np.abs(operator.data).max(initial=0.0)
+    if error > ROUNDING_ULPS * operator.num_qubits * np.finfo(float).eps * scale:
+        return None
+    return sparse
+
+
+def encode_operator(operator: Any, token: Any = None) -> Optional[Dict[str, Any]]:
+    """Returns compact json representation of operator.
+
+    Encodings of Operators are cached by fingerprint of the operator,
+    so an unchanged operator is decomposed once.
+
+    Args:
+        operator: SparsePauliOp or Operator
+        token: fingerprint of Operator if it is known, see
+            :func:`~purplecaffeine.utils.fingerprint`
+
+    Returns:
+        labels and coefficients of Pauli terms or
+        None if operator has no compact representation
+    """
+    if isinstance(operator, SparsePauliOp):
+        return _encode("SparsePauliOp", operator)
+    if not isinstance(operator, Operator):
+        return None
+    if token is None:
+        token = fingerprint(operator)
+    cached = None if token is None else _ENCODINGS.get(token)
+    if cached is not None:
+        return cached[0]
+    encoded = _encode("PauliOperator", pauli_decomposition(operator))
+    if token is not None:
+        # dense operators are cached too, as they are checked the same way
+        _ENCODINGS.put(token, (encoded,))
+    return encoded
+
+
+def _encode(obj_type: str, sparse: Optional[SparsePauliOp]) -> Optional[Dict[str, Any]]:
+    """Returns json representation of Pauli terms, None if there are none."""
+    if sparse is None:
+        return None
+    return {
+        "__type__": obj_type,
+        "__value__": {
+            "labels": sparse.paulis.to_labels(),
+            "coeffs": np.asarray(sparse.coeffs),
+        },
+    }
+
+
+def decode_operator(obj: Dict[str, Any]) -> Any:
+    """Returns operator from its compact json representation.
+
+    Args:
+        obj: output of :func:`encode_operator`
+
+    Returns:
+        SparsePauliOp or Operator
+    """
+    sparse = SparsePauliOp(obj["__value__"]["labels"], obj["__value__"]["coeffs"])
+    if obj["__type__"] == "PauliOperator":
+        return Operator(sparse)
+    return sparse
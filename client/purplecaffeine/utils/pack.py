@@ -0,0 +1,213 @@
+"""Pack file."""
+import io
+import json
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+PACK_MAGIC = b"PCPACK01"
+# index offset, index length, magic
+FOOTER = struct.Struct("<QQ8s")
+# permissions of written pack files
+PACK_MODE = 0o644
+
+
+class PackWriter:
+    """Writes members into a single seekable file.
+
+    Members are written one after another, table of
+    member name to offset and length is written at the end of the file.
+    File is written to a temporary path and moved in place on close.
+
+    Example:
+        >>> with PackWriter("circuits.qpy") as writer:
+        >>>     writer.add("bell", b"...")
+    """
+
+    def __init__(self, path: str):
+        """Creates pack file.
+
+        Args:
+            path: path of the file
+        """
+        self.path = path
+        # unique temporary file, so writers of the same path do not clash
+        descriptor, self._tmp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(path)),
+        )
+        # mkstemp files are private, packs are shared like other trial files
+        os.fchmod(descriptor, PACK_MODE)
+        self._file: BinaryIO = os.fdopen(descriptor, "wb")
+        self._file.write(PACK_MAGIC)
+        self._members: Dict[str, Tuple[int, int]] = {}
+
+    @contextmanager
+    def member(self, name: str) -> Iterator[BinaryIO]:
+        """Returns stream to write member data into.
+
+        Args:
+            name: name of the member
+        """
+        start = self._file.tell()
+        yield self._file
+        self._members[name] = (start, self._file.tell() - start)
+
+    def add(self, name: str, data: bytes):
+        """Adds member.
+
+        Args:
+            name: name of the member
+            data: content of the member
+        """
+        with self.member(name) as stream:
+            stream.write(data)
+
+    def close(self):
+        """Writes member table and moves file in place."""
+        index = json.dumps(self._members).encode("utf-8")
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(FOOTER.pack(index_offset, len(index), PACK_MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self) -> "PackWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+
+class PackReader:
+    """Reads members of a pack file by offset, without reading other members.
+
+    Memory-mapped pack files are read without copies by :meth:`view`
+    and :meth:`array`, pages of a member are read from disk on access.
+
+    Example:
+        >>> with PackReader("trial.pack", use_mmap=True) as reader:
+        >>>     array = reader.array("array_results.npy")
+    """
+
+    def __init__(self, path: str, use_mmap: bool = False):
+        """Opens pack file.
+
+        Args:
+            path: path of the file
+            use_mmap: map the file into memory instead of reading it
+        """
+        self.path = path
+        # pylint: disable=consider-using-with
+        self._file: BinaryIO = open(path, "rb")
+        size = os.path.getsize(path)
+        if size < len(PACK_MAGIC) + FOOTER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a pack file.")
+        self._file.seek(size - FOOTER.size)
+        index_offset, index_length, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+        if magic != PACK_MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a pack file.")
+        self._file.seek(index_offset)
+        self._members: Dict[str, List[int]] = json.loads(self._file.read(index_length))
+        self._mmap: Optional[mmap.mmap] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if use_mmap
+            else None
+        )
+
+    def names(self) -> List[str]:
+        """Returns names of members."""
+        return list(self._members)
+
+    def read(self, name: str) -> bytes:
+        """Returns content of member.
+
+        Args:
+            name: name of the member
+
+        Returns:
+            member content
+        """
+        offset, length = self._members[name]
+        if self._mmap is not None:
+            return self._mmap[offset : offset + length]
+        self._file.seek(offset)
+        return self._file.read(length)
+
+    def view(self, name: str) -> Union[memoryview, bytes]:
+        """Returns content of member without copying it if file is memory-mapped.
+
+        Args:
+            name: name of the member
+
+        Returns:
+            read-only view of member content, or member content
+        """
+        if self._mmap is None:
+            return self.read(name)
+        offset, length = self._members[name]
+        return memoryview(self._mmap)[offset : offset + length]
+
+    def array(self, name: str) -> np.ndarray:
+        """Returns array of a member written by ``np.save``.
+
+        Array of a memory-mapped file is a read-only view of the file.
+
+        Args:
+            name: name of the member
+
+        Returns:
+            array
+        """
+        if self._mmap is None:
+            return np.load(io.BytesIO(self.read(name)))
+        offset, length = self._members[name]
+        self._file.seek(offset)
+        version = np.lib.format.read_magic(self._file)
+        if version not in [(1, 0), (2, 0)]:
+            return np.load(io.BytesIO(self.read(name)))
+        read_header = (
+            np.lib.format.read_array_header_1_0
+            if version == (1, 0)
+            else np.lib.format.read_array_header_2_0
+        )
+        shape, fortran_order, dtype = read_header(self._file)
+        data_offset = self._file.tell()
+        count = int(np.prod(shape))
+        if data_offset + count * dtype.itemsize > offset + length:
+            raise ValueError(f"{name} is not a complete array.")
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_offset)
+        return array.reshape(shape, order="F" if fortran_order else "C")
+
+    def close(self):
+        """Closes file.
+
+        Mapped memory is released when views and arrays
+        read from it are not used anymore.
+        """
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # still exported to views, closed when they are collected
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,260 @@
+"""Persistent queue of background replication tasks."""
+import heapq
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+FAILED_DIR_NAME = "failed"
+
+
+class ReplicationQueue:
+    """Queue of (remote, trial id) tasks replicated by a pool of threads.
+
+    Every task is a file in the queue folder until it is done,
+    so tasks of a crashed process are resumed by the next queue
+    created on the same folder. Failed tasks are retried with
+    exponential backoff, tasks failing ``max_retries`` times are
+    moved to the ``failed`` subfolder, see :meth:`retry_failed`.
+
+    Example:
+        >>> queue = ReplicationQueue("./queue", lambda remote, trial_id: ...)
+        >>> queue.put("0", "<trial_id>")
+        >>> queue.wait()
+    """
+
+    def __init__(
+        self,
+        path: str,
+        replicate: Callable[[str, str], Any],
+        max_workers: int = 4,
+        max_retries: int = 8,
+        backoff_factor: float = 1.0,
+        backoff_max: float = 300.0,
+    ):
+        """Creates queue and resumes tasks stored in its folder.
+
+        Args:
+            path: folder of task files
+            replicate: replicates trial to remote, raises on failure
+            max_workers: number of tasks replicated at once
+            max_retries: number of attempts before task fails
+            backoff_factor: delay before first retry in seconds,
+                doubled on every next retry
+            backoff_max: maximal delay between retries in seconds
+        """
+        self.path = path
+        self.replicate = replicate
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.replicated = 0
+        self.retries = 0
+
+        # (due time, sequence, task key) of waiting tasks
+        self._heap: List[Tuple[float, int, str]] = []
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, bool] = {}
+        self._sequence = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="purplecaffeine-replication"
+        )
+
+        Path(os.path.join(path, FAILED_DIR_NAME)).mkdir(parents=True, exist_ok=True)
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                with open(os.path.join(path, name), "r", encoding="utf-8") as file:
+                    task = json.load(file)
+                self._schedule(task, time.time())
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="purplecaffeine-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    @staticmethod
+    def _key(remote: str, trial_id: str) -> str:
+        """Returns key and file name of a task."""
+        return f"{remote}-{trial_id}"
+
+    def _task_file(self, key: str, failed: bool = False) -> str:
+        """Returns path of task file."""
+        folder = os.path.join(self.path, FAILED_DIR_NAME) if failed else self.path
+        return os.path.join(folder, f"{key}.json")
+
+    def _write_task(self, task: Dict[str, Any], failed: bool = False):
+        """Writes task file atomically."""
+        folder = os.path.join(self.path, FAILED_DIR_NAME) if failed else self.path
+        descriptor, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump(task, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._task_file(task["key"], failed))
+
+    def _schedule(self, task: Dict[str, Any], due: float):
+        """Pushes task to waiting tasks, condition must be held or not shared yet."""
+        self._tasks[task["key"]] = task
+        self._sequence += 1
+        heapq.heappush(self._heap, (due, self._sequence, task["key"]))
+
+    def put(self, remote: str, trial_id: str):
+        """Adds task, task already in the queue replicates latest trial once more.
+
+        Args:
+            remote: name of remote
+            trial_id: trial id
+        """
+        key = self._key(remote, trial_id)
+        task = {"key": key, "remote": remote, "trial_id": trial_id, "attempts": 0}
+        with self._condition:
+            if key in self._running:
+                # replicated trial may be older, run again when it is done
+                self._running[key] = True
+                self._write_task(task)
+                return
+            if key in self._tasks:
+                return
+            self._write_task(task)
+            self._schedule(task, time.time())
+            self._condition.notify_all()
+
+    def _dispatch(self):
+        """Submits due tasks to the pool."""
+        with self._condition:
+            while not self._closed:
+                now = time.time()
+                if not self._heap or self._heap[0][0] > now:
+                    self._condition.wait(
+                        timeout=self._heap[0][0] - now if self._heap else None
+                    )
+                    continue
+                _, _, key = heapq.heappop(self._heap)
+                task = self._tasks.pop(key, None)
+                if task is None:
+                    continue
+                self._running[key] = False
+                self._pool.submit(self._run, task)
+
+    def _run(self, task: Dict[str, Any]):
+        """Replicates task, reschedules it on failure."""
+        error = None
+        try:
+            self.replicate(task["remote"], task["trial_id"])
+        except Exception as replicate_error:  # pylint: disable=broad-except
+            error = replicate_error
+        with self._condition:
+            rerun = self._running.pop(task["key"])
+            if error is None:
+                self.replicated += 1
+                if rerun:
+                    self._schedule({**task, "attempts": 0}, time.time())
+                else:
+                    os.remove(self._task_file(task["key"]))
+            else:
+                self._retry(task, error, rerun)
+            self._condition.notify_all()
+
+    def _retry(self, task: Dict[str, Any], error: Exception, rerun: bool):
+        """Reschedules failed task with backoff, condition must be held."""
+        attempts = 0 if rerun else task["attempts"] + 1
+        task = {**task, "attempts": attempts, "error": repr(error)}
+        if attempts >= self.max_retries:
+            logging.warning(
+                "Replication of %s to %s failed %s times: %s",
+                task["trial_id"],
+                task["remote"],
+                attempts,
+                error,
+            )
+            self._write_task(task, failed=True)
+            os.remove(self._task_file(task["key"]))
+            return
+        self.retries += 1
+        self._write_task(task)
+        delay = min(self.backoff_factor * 2 ** max(0, attempts - 1), self.backoff_max)
+        self._schedule(task, time.time() + delay)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Runs waiting tasks without their backoff delay and waits for them.
+
+        Args:
+            timeout: seconds to wait, no limit if None
+
+        Returns:
+            True if all tasks are done or failed
+        """
+        with self._condition:
+            self._heap = [(0, sequence, key) for _, sequence, key in self._heap]
+            heapq.heapify(self._heap)
+            self._condition.notify_all()
+        return self.wait(timeout)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all tasks are done or failed.
+
+        Args:
+            timeout: seconds to wait, no limit if None
+
+        Returns:
+            True if all tasks are done or failed
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._tasks and not self._running, timeout=timeout
+            )
+
+    def retry_failed(self) -> int:
+        """Moves failed tasks back to the queue.
+
+        Returns:
+            number of retried tasks
+        """
+        folder = os.path.join(self.path, FAILED_DIR_NAME)
+        names = [name for name in os.listdir(folder) if name.endswith(".json")]
+        for name in names:
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as file:
+                task = json.load(file)
+            os.remove(os.path.join(folder, name))
+            self.put(task["remote"], task["trial_id"])
+        return len(names)
+
+    def metrics(self) -> Dict[str, int]:
+        """Returns depth and counters of the queue.
+
+        Returns:
+            numbers of waiting, running and failed tasks,
+            numbers of replications and retries since queue was created
+        """
+        with self._condition:
+            return {
+                "pending": len(self._tasks),
+                "running": len(self._running),
+                "failed": len(
+                    [
+                        name
+                        for name in os.listdir(os.path.join(self.path, FAILED_DIR_NAME))
+                        if name.endswith(".json")
+                    ]
+                ),
+                "replicated": self.replicated,
+                "retries": self.retries,
+            }
+
+    def close(self, wait: bool = True):
+        """Stops dispatching tasks, waiting tasks are resumed by the next queue.
+
+        Args:
+            wait: wait for running tasks
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,319 @@
+"""Http session for api server."""
+import asyncio
+import base64
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from purplecaffeine.exception import PurpleCaffeineException
+from purplecaffeine.helpers import Configuration
+from purplecaffeine.utils.instrumentation import HTTP, TOKEN, active, count_bytes, span
+
+
+def _count_transferred(response: Any):
+    """Counts bytes of request and response bodies of an instrumented operation."""
+    if active():
+        body = (
+            response.request.content
+            if hasattr(response.request, "content")
+            else response.request.body
+        )
+        count_bytes(sent=len(body or b""), received=len(response.content))
+
+
+def token_expiration(token: str) -> Optional[float]:
+    """Returns expiration time of a JWT token, without verifying it.
+
+    Args:
+        token: JWT token
+
+    Returns:
+        expiration timestamp or None if token has no expiration
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+    except (IndexError, ValueError):
+        return None
+
+
+class _Tokens:
+    """Access and refresh tokens of api server."""
+
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+        self.access: Optional[str] = None
+        self.refresh: Optional[str] = None
+        self.expiration: Optional[float] = None
+
+    def valid(self) -> bool:
+        """Returns True if access token exists and does not expire soon."""
+        return self.access is not None and (
+            self.expiration is None
+            or self.expiration - time.time() >= Configuration.API_TOKEN_REFRESH_MARGIN
+        )
+
+    def refresh_payload(self) -> Optional[Dict[str, Any]]:
+        """Returns payload of refresh request, None if there is no refresh token."""
+        return None if self.refresh is None else {"refresh": self.refresh}
+
+    def login_payload(self) -> Dict[str, Any]:
+        """Returns payload of token request."""
+        return {"username": self.username, "password": self.password}
+
+    def update(self, status_code: int, tokens: Dict[str, Any]):
+        """Stores tokens from response of token endpoints."""
+        if status_code != 200:
+            raise PurpleCaffeineException(
+                f"Error response from api server on authorization: {tokens}"
+            )
+        self.access = tokens["access"]
+        # refresh endpoint rotates refresh token only if configured so
+        self.refresh = tokens.get("refresh", self.refresh)
+        self.expiration = token_expiration(self.access)
+
+    def invalidate(self, token: str):
+        """Forgets access token rejected by server."""
+        if self.access == token:
+            self.access = None
+
+
+class ApiSession:
+    """Pooled keep-alive session with authorization tokens.
+
+    Access token is refreshed through refresh endpoint before it expires,
+    or after server rejects it. Session can be shared between threads.
+
+    Example:
+        >>> session = ApiSession("http://localhost:8000", "admin", "admin")
+        >>> session.request("GET", "api/trials/")
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        pool_size: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+    ):
+        """Creates session.
+
+        Args:
+            host: host of api server
+            username: username
+            password: password
+            pool_size: number of kept alive connections,
+                Configuration.API_POOL_SIZE if None
+            retries: number of retries of failed requests,
+                Configuration.API_RETRIES if None
+            backoff_factor: factor of exponential delay between retries,
+                Configuration.API_BACKOFF_FACTOR if None
+        """
+        self.host = host.rstrip("/")
+        self._tokens = _Tokens(username, password)
+
+        pool_size = pool_size or Configuration.API_POOL_SIZE
+        retry = Retry(
+            total=Configuration.API_RETRIES if retries is None else retries,
+            backoff_factor=Configuration.API_BACKOFF_FACTOR
+            if backoff_factor is None
+            else backoff_factor,
+            # statuses are retried for idempotent methods only
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.headers.update(Configuration.API_HEADERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+
+    @property
+    def token(self) -> str:
+        """Valid access token, refreshed if it expires soon."""
+        with self._lock:
+            if not self._tokens.valid():
+                self._renew()
+            return self._tokens.access
+
+    def _renew(self):
+        """Refreshes access token, logs in again if refresh token is rejected."""
+        response = None
+        if self._tokens.refresh_payload() is not None:
+            response = self.session.post(
+                f"{self.host}/{Configuration.API_TOKEN_REFRESH_ENDPOINT}/",
+                json=self._tokens.refresh_payload(),
+                timeout=Configuration.API_TIMEOUT,
+            )
+        if response is None or response.status_code != 200:
+            response = self.session.post(
+                f"{self.host}/{Configuration.API_TOKEN_ENDPOINT}/",
+                json=self._tokens.login_payload(),
+                timeout=Configuration.API_TIMEOUT,
+            )
+        self._tokens.update(response.status_code, response.json())
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """Sends authorized request, retried once with new token on 401.
+
+        Args:
+            method: http method
+            endpoint: endpoint relative to host, like "api/trials/"
+            **kwargs: arguments of :meth:`requests.Session.request`
+
+        Returns:
+            response
+        """
+        headers = kwargs.pop("headers", {})
+        kwargs.setdefault("timeout", Configuration.API_TIMEOUT)
+        for attempt in range(2):
+            with span(TOKEN):
+                token = self.token
+            with span(HTTP):
+                response = self.session.request(
+                    method,
+                    f"{self.host}/{endpoint}",
+                    headers={**headers, "Authorization": f"Bearer {token}"},
+                    **kwargs,
+                )
+            _count_transferred(response)
+            if response.status_code != 401 or attempt == 1:
+                break
+            with self._lock:
+                self._tokens.invalidate(token)
+        return response
+
+    def close(self):
+        """Closes pooled connections."""
+        self.session.close()
+
+
+class AsyncApiSession:
+    """Non-blocking version of :class:`ApiSession`, based on httpx.
+
+    Connections and token are bound to the event loop of first request,
+    session is recreated for other event loops and connections
+    of the previous one are closed.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        pool_size: Optional[int] = None,
+        retries: Optional[int] = None,
+    ):
+        """Creates session.
+
+        Args:
+            host: host of api server
+            username: username
+            password: password
+            pool_size: number of kept alive connections,
+                Configuration.API_POOL_SIZE if None
+            retries: number of retries of failed connections,
+                Configuration.API_RETRIES if None
+        """
+        self.host = host.rstrip("/")
+        self.pool_size = pool_size or Configuration.API_POOL_SIZE
+        self.retries = Configuration.API_RETRIES if retries is None else retries
+        self._tokens = _Tokens(username, password)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _bind(self):
+        """Creates client and lock for running event loop,
+        client of previous event loop is closed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            import httpx  # pylint: disable=import-outside-toplevel
+
+            await self.aclose()
+
+            self._client = httpx.AsyncClient(
+                headers=Configuration.API_HEADERS,
+                timeout=Configuration.API_TIMEOUT,
+                transport=httpx.AsyncHTTPTransport(
+                    retries=self.retries,
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=self.pool_size,
+                    ),
+                ),
+            )
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+    async def token(self) -> str:
+        """Returns valid access token, refreshed if it expires soon."""
+        await self._bind()
+        async with self._lock:
+            if not self._tokens.valid():
+                response = None
+                if self._tokens.refresh_payload() is not None:
+                    response = await self._client.post(
+                        f"{self.host}/{Configuration.API_TOKEN_REFRESH_ENDPOINT}/",
+                        json=self._tokens.refresh_payload(),
+                    )
+                if response is None or response.status_code != 200:
+                    response = await self._client.post(
+                        f"{self.host}/{Configuration.API_TOKEN_ENDPOINT}/",
+                        json=self._tokens.login_payload(),
+                    )
+                self._tokens.update(response.status_code, response.json())
+            return self._tokens.access
+
+    async def request(self, method: str, endpoint: str, **kwargs):
+        """Sends authorized request, retried once with new token on 401.
+
+        Args:
+            method: http method
+            endpoint: endpoint relative to host, like "api/trials/"
+            **kwargs: arguments of :meth:`httpx.AsyncClient.request`
+
+        Returns:
+            httpx response
+        """
+        headers = kwargs.pop("headers", {})
+        for attempt in range(2):
+            with span(TOKEN):
+                token = await self.token()
+            with span(HTTP):
+                response = await self._client.request(
+                    method,
+                    f"{self.host}/{endpoint}",
+                    headers={**headers, "Authorization": f"Bearer {token}"},
+                    **kwargs,
+                )
+            _count_transferred(response)
+            if response.status_code != 401 or attempt == 1:
+                break
+            async with self._lock:
+                self._tokens.invalidate(token)
+        return response
+
+    async def aclose(self):
+        """Closes pooled connections."""
+        client, self._client, self._loop = self._client, None, None
+        if client is not None:
+            try:
+                await client.aclose()
+            except RuntimeError as error:
+                # connections of an event loop which is closed already
+                logging.debug("Connections of api session are not closed: %s", error)
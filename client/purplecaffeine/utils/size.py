@@ -0,0 +1,104 @@
+"""Size estimation."""
+import io
+import os
+import random
+import sys
+from itertools import islice
+from typing import Any
+
+import numpy as np
+
+CONTAINERS = (list, tuple, set, frozenset, dict)
+
+
+def _estimate(obj: Any, sample_size: int, depth: int) -> int:
+    """Returns estimated size of object in bytes."""
+    # pylint: disable=too-many-return-statements
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object and depth > 0:
+            return obj.nbytes + _estimate_items(obj.ravel(), sample_size, depth)
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray, str)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, os.PathLike) and os.path.isfile(obj):
+        return os.path.getsize(obj)
+    if isinstance(obj, io.BytesIO):
+        return obj.getbuffer().nbytes
+    if isinstance(obj, io.IOBase) and hasattr(obj, "fileno"):
+        try:
+            return os.fstat(obj.fileno()).st_size
+        except (OSError, ValueError):
+            return sys.getsizeof(obj)
+    if isinstance(obj, CONTAINERS):
+        return _estimate_container(obj, sample_size, depth)
+    if depth > 0 and hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + _estimate_container(vars(obj), sample_size, depth)
+    return sys.getsizeof(obj)
+
+
+def _estimate_items(items: Any, sample_size: int, depth: int) -> int:
+    """Returns estimated size of sequence items from a sample."""
+    if len(items) == 0:
+        return 0
+    if len(items) <= sample_size:
+        sample = items
+    else:
+        # seeded for reproducible estimates
+        indices = random.Random(len(items)).sample(range(len(items)), sample_size)
+        sample = [items[index] for index in indices]
+    sample_bytes = sum(_estimate(item, sample_size, depth - 1) for item in sample)
+    return sample_bytes * len(items) // len(sample)
+
+
+def _estimate_container(obj: Any, sample_size: int, depth: int) -> int:
+    """Returns estimated size of container and its items."""
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, (dict, set, frozenset)):
+        # not indexable, sample first items
+        sample = list(islice(obj, sample_size))
+        if isinstance(obj, dict):
+            sample += [obj[key] for key in sample]
+        sample_bytes = _estimate_items(sample, len(sample), depth)
+        return size + sample_bytes * len(obj) // max(1, min(len(obj), sample_size))
+    return size + _estimate_items(obj, sample_size, depth)
+
+
+def estimate_size(obj: Any, sample_size: int = 100, max_depth: int = 3) -> int:
+    """Returns fast estimate of object size in bytes.
+
+    Arrays, buffers, strings, paths and files are measured in constant time.
+    Containers are estimated from a sample of ``sample_size`` items,
+    nested up to ``max_depth`` levels.
+
+    Args:
+        obj: object to measure
+        sample_size: number of sampled items of containers
+        max_depth: depth of nested containers to inspect
+
+    Returns:
+        estimated size in bytes
+    """
+    return _estimate(obj, max(1, sample_size), max_depth)
+
+
+def deep_size(obj: Any) -> int:
+    """Returns exact size of object in bytes.
+
+    Uses pympler when it is installed, falls back to :func:`estimate_size`.
+
+    Args:
+        obj: object to measure
+
+    Returns:
+        size in bytes
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        from pympler import asizeof
+    except ImportError:
+        return estimate_size(obj)
+    return asizeof.asizeof(obj)
@@ -2,12 +2,11 @@
 from typing import List, Optional
 
 import ipywidgets as widgets
-import pandas as pd
 from IPython.display import display, clear_output
 from ipywidgets import Layout, GridspecLayout, AppLayout
 from matplotlib import pyplot as plt
 
-from purplecaffeine.core import BaseStorage, LocalStorage, Trial
+from purplecaffeine.core import BaseStorage, CachingStorage, LocalStorage, Trial
 
 
 def display_message(required_message):
@@ -65,7 +64,11 @@ class Widget:
         Attributes:
             storage (BaseStorage): storage where the trials are going to be saved
         """
-        self.storage = storage or LocalStorage("./trials")
+        storage = storage or LocalStorage("./trials")
+        # opened trials are read from storage once
+        self.storage = (
+            storage if isinstance(storage, CachingStorage) else CachingStorage(storage)
+        )
         self.limit = 10
         self.offset = 0
         self.trials: List[Trial] = self.storage.list(
@@ -301,14 +304,11 @@ class Widget:
         metrics_tab = widgets.Output()
         metrics_tab.layout = Layout(overflow="scroll", max_height="500px")
         with metrics_tab:
-            dataframe = (
-                pd.DataFrame(self.selected_trial.metrics, columns=["name", "value"])
-                .groupby("name")
-                .agg(list)
-            )
+            metrics = self.selected_trial.metrics
             metrics_to_table = []
             metrics_to_plot = []
-            for metric_name, values in dataframe.to_dict()["value"].items():
+            for metric_name in sorted(metrics.names()):
+                values = metrics.values(metric_name).tolist()
                 if len(values) == 1:
                     metrics_to_table.append((metric_name, values[0]))
                 else:
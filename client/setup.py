@@ -23,6 +23,12 @@ setuptools.setup(
     keywords="quantum tracking experiments",
     packages=setuptools.find_packages(),
     install_requires=install_requires,
+    extras_require={
+        "pympler": ["pympler~=1.1"],
+        "zstd": ["zstandard>=0.21"],
+        "orjson": ["orjson>=3.9"],
+        "async": ["httpx>=0.24"],
+    },
     python_requires=">=3.8",
     version=version,
     classifiers=[
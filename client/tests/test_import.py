@@ -0,0 +1,35 @@
+"""Tests for import of the package."""
+import json
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+IMPORT_SCRIPT = """
+import json, sys
+import purplecaffeine
+package = sorted(sys.modules)
+purplecaffeine.LocalStorage
+print(json.dumps({"package": package, "local_storage": sorted(sys.modules)}))
+"""
+
+
+class TestImport(TestCase):
+    """TestImport."""
+
+    def test_import_modules(self):
+        """Test package and local storage are imported without heavy dependencies."""
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        modules = json.loads(result.stdout)
+        package = set(modules["package"])
+        for dependency in ["qiskit", "numpy", "boto3", "purplecaffeine.core"]:
+            self.assertNotIn(dependency, package)
+        local_storage = set(modules["local_storage"])
+        for dependency in ["boto3", "ipywidgets", "IPython", "matplotlib", "pandas"]:
+            self.assertNotIn(dependency, local_storage)
+        self.assertNotIn("purplecaffeine.widget", local_storage)
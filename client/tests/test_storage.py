@@ -1,18 +1,56 @@
 """Tests for Storage."""
+import asyncio
+import json
 import os
 import shutil
 from pathlib import Path
 from unittest import TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+from moto import mock_aws
 from qiskit import QuantumCircuit
+from qiskit.quantum_info import Operator, SparsePauliOp, random_unitary
+from qiskit_ibm_runtime.utils import RuntimeEncoder
 from testcontainers.compose import DockerCompose
 from testcontainers.localstack import LocalStackContainer
 
-from purplecaffeine.core import Trial, LocalStorage, S3Storage, ApiStorage
+from purplecaffeine.core import (
+    Trial,
+    LocalStorage,
+    S3Storage,
+    ApiStorage,
+    BaseStorage,
+    CachingStorage,
+    TieredStorage,
+)
 from purplecaffeine.exception import PurpleCaffeineException
+from purplecaffeine.helpers import Configuration
+from purplecaffeine.utils import Deferred, Instrumentation, TrialEncoder
 from .test_trial import dummy_trial
 
 
-class TestStorage(TestCase):
+class FlakyStorage(BaseStorage):
+    """Storage failing a number of saves before saving into a local storage."""
+
+    def __init__(self, storage: LocalStorage, failures: int):
+        self.storage = storage
+        self.failures = failures
+
+    def save(self, trial: Trial):
+        if self.failures > 0:
+            self.failures -= 1
+            raise PurpleCaffeineException("Network is down.")
+        return self.storage.save(trial)
+
+    def get(self, trial_id: str) -> Trial:
+        return self.storage.get(trial_id)
+
+    def list(self, query=None, limit=None, offset=None, **kwargs):
+        return self.storage.list(query=query, limit=limit, offset=offset)
+
+
+class TestStorage(TestCase):  # pylint: disable=too-many-public-methods
     """TestStorage."""
 
     def setUp(self) -> None:
@@ -49,6 +87,818 @@ class TestStorage(TestCase):
         self.assertTrue(isinstance(list_trials, list))
         self.assertEqual(len(list_trials), 0)
 
+    def test_local_storage_index(self):
+        """Test local storage index."""
+        for idx in range(5):
+            self.local_storage.save(
+                trial=dummy_trial(name=f"index_trial_{idx}", storage=self.local_storage)
+            )
+        index_path = os.path.join(self.save_path, "index.jsonl")
+        self.assertTrue(os.path.isfile(index_path))
+
+        # list only loads returned trials
+        with patch.object(
+            LocalStorage, "get", autospec=True, side_effect=LocalStorage.get
+        ) as get_mock:
+            list_trials = self.local_storage.list(limit=2)
+        self.assertEqual(get_mock.call_count, 2)
+        self.assertEqual(list_trials[0].name, "index_trial_4")
+        self.assertEqual(len(self.local_storage.list(query="index_trial_3")), 1)
+
+        # folders written without index
+        os.remove(index_path)
+        self.assertEqual(len(self.local_storage.list(limit=10)), 5)
+        self.assertTrue(os.path.isfile(index_path))
+
+        # repair after removed trial folder
+        shutil.rmtree(os.path.join(self.save_path, f"trial_{list_trials[0].uuid}"))
+        self.assertEqual(self.local_storage.rebuild_index(), 4)
+        self.assertEqual(len(self.local_storage.list(limit=10)), 4)
+
+        # index appended to by older versions misses trials saved before it
+        with open(index_path, "r", encoding="utf-8") as index_file:
+            lines = index_file.readlines()
+        with open(index_path, "w", encoding="utf-8") as index_file:
+            index_file.writelines(lines[-1:])
+        self.local_storage.save(trial=dummy_trial(name="upgraded_trial"))
+        self.assertEqual(len(self.local_storage.list(limit=10)), 5)
+
+        # superseded lines are compacted by a read
+        trial = dummy_trial(name="compacted_trial")
+        with patch.object(Configuration, "INDEX_COMPACTION_LINES", 10):
+            for _ in range(12):
+                self.local_storage.save(trial=trial)
+            self.assertEqual(len(self.local_storage.list(limit=10)), 6)
+        with open(index_path, "r", encoding="utf-8") as index_file:
+            self.assertEqual(len(index_file.readlines()), 7)
+        self.local_storage.save(trial=trial)
+        self.assertEqual(len(self.local_storage.list(limit=10)), 6)
+
+    def test_local_storage_metrics(self):
+        """Test metric columns are kept in a sidecar file."""
+        trial = dummy_trial(name="metrics_trial")
+        trial.metrics.add("energy", -1.5, step=10, timestamp=12.5)
+        trial.add_metric("label", "ground state")
+        self.local_storage.save(trial=trial)
+        trial_path = os.path.join(self.save_path, f"trial_{trial.uuid}")
+        with open(os.path.join(trial_path, "trial.json"), encoding="utf-8") as file:
+            self.assertEqual(json.load(file)["metrics"], "Check the metrics.npz file.")
+
+        recovered = self.local_storage.get(trial_id=trial.uuid)
+        self.assertEqual(recovered.metrics, trial.metrics)
+        np.testing.assert_array_equal(recovered.metrics.steps("energy"), [10])
+        np.testing.assert_array_equal(recovered.metrics.timestamps("energy"), [12.5])
+
+        # unchanged metrics are not written again
+        with patch.object(np, "savez", wraps=np.savez) as savez_mock:
+            self.local_storage.save(trial=trial)
+            self.assertEqual(savez_mock.call_count, 0)
+            trial.add_metric("energy", -1.75)
+            self.local_storage.save(trial=trial)
+            self.assertEqual(savez_mock.call_count, 1)
+        self.assertEqual(
+            self.local_storage.get(trial.uuid).metrics.last("energy"), -1.75
+        )
+
+    def test_local_storage_lazy_get(self):
+        """Test lazy loading of trial components."""
+        self.local_storage.save(trial=self.my_trial)
+        trial_path = os.path.join(self.save_path, f"trial_{self.my_trial.uuid}")
+
+        recovered = self.local_storage.get(trial_id=self.my_trial.uuid)
+        self.assertIsInstance(vars(recovered)["circuits"], Deferred)
+        self.assertEqual(recovered.metrics, [["test_metric", 42]])
+        # sidecar files are read only on first access
+        text_path = os.path.join(trial_path, "text_test_text.json")
+        os.rename(text_path, f"{text_path}.bak")
+        self.assertEqual(recovered.circuits, [["test_circuit", QuantumCircuit(2)]])
+        self.assertEqual(recovered.arrays, [["test_array", np.array([42])]])
+        self.assertIsInstance(recovered.arrays[0][1], np.memmap)
+        self.assertIs(recovered.circuits, vars(recovered)["circuits"])
+        with self.assertRaises(FileNotFoundError):
+            _ = recovered.texts
+        os.rename(f"{text_path}.bak", text_path)
+
+        # arrays embedded in trial.json by older versions
+        with open(
+            os.path.join(trial_path, "trial.json"), "r", encoding="utf-8"
+        ) as file:
+            header = json.load(file)
+        header["arrays"] = json.loads(
+            json.dumps([["test_array", np.array([42])]], cls=RuntimeEncoder)
+        )
+        with open(
+            os.path.join(trial_path, "trial.json"), "w", encoding="utf-8"
+        ) as file:
+            json.dump(header, file)
+        eager_storage = LocalStorage(path=self.save_path, lazy=False)
+        recovered = eager_storage.get(trial_id=self.my_trial.uuid)
+        self.assertEqual(recovered.arrays, [["test_array", np.array([42])]])
+
+    def test_local_storage_journal(self):
+        """Test replay of journaled trial changes."""
+        storage = LocalStorage(path=self.save_path, journal=True, fsync_every=1)
+        trial = dummy_trial(name="journal_trial", storage=storage)
+        journal_path = os.path.join(
+            self.save_path, f"trial_{trial.uuid}", "journal.jsonl"
+        )
+        self.assertTrue(os.path.isfile(journal_path))
+
+        # read running trial from another storage
+        recovered = LocalStorage(path=self.save_path).get(trial_id=trial.uuid)
+        self.assertEqual(recovered.name, "journal_trial")
+        self.assertEqual(recovered.description, "Short desc")
+        self.assertEqual(recovered.metrics, [["test_metric", 42]])
+        self.assertEqual(recovered.circuits, [["test_circuit", QuantumCircuit(2)]])
+        self.assertEqual(recovered.arrays, [["test_array", np.array([42])]])
+        self.assertEqual(recovered.tags, ["qiskit", "test"])
+
+        # save compacts journal
+        trial.save()
+        self.assertFalse(os.path.isfile(journal_path))
+
+        # changes after save are replayed on top of saved trial
+        trial.add_metric("test_metric", 43)
+        recovered = LocalStorage(path=self.save_path).get(trial_id=trial.uuid)
+        self.assertEqual(recovered.metrics, [["test_metric", 42], ["test_metric", 43]])
+        self.assertEqual(recovered.parameters, [["test_parameter", "parameter"]])
+
+        # interrupted record is ignored
+        with open(journal_path, "a", encoding="utf-8") as journal_file:
+            journal_file.write('{"field": "metrics", "entry": ["test_me')
+        recovered = LocalStorage(path=self.save_path).get(trial_id=trial.uuid)
+        self.assertEqual(len(recovered.metrics), 2)
+
+    def test_local_storage_qpy_circuits(self):
+        """Test circuits saved in a single qpy container."""
+        storage = LocalStorage(path=self.save_path, circuit_format="qpy")
+        trial = Trial(name="qpy_trial", storage=storage)
+        circuits = []
+        for idx in range(20):
+            circuit = QuantumCircuit(2, name=f"circuit_{idx}")
+            circuit.rx(0.1 * idx, 0)
+            circuit.cx(0, 1)
+            circuits.append(circuit)
+            trial.add_circuit(f"circuit_{idx}", circuit)
+        trial.save()
+
+        trial_path = os.path.join(self.save_path, f"trial_{trial.uuid}")
+        self.assertEqual(os.listdir(trial_path).count("circuits.qpy"), 1)
+        self.assertFalse(os.path.isfile(os.path.join(trial_path, "circuit_0.json")))
+
+        recovered = storage.get(trial_id=trial.uuid)
+        self.assertEqual(recovered.circuits[7], ["circuit_7", circuits[7]])
+        self.assertEqual(len(recovered.circuits), 20)
+        self.assertEqual(storage.get_circuit(trial.uuid, "circuit_3"), circuits[3])
+
+        # json trials stay readable
+        self.local_storage.save(trial=self.my_trial)
+        self.assertEqual(
+            storage.get(trial_id=self.my_trial.uuid).circuits,
+            [["test_circuit", QuantumCircuit(2)]],
+        )
+        self.assertEqual(
+            storage.get_circuit(self.my_trial.uuid, "test_circuit"), QuantumCircuit(2)
+        )
+
+    def test_local_storage_operators(self):
+        """Test compact and binary operators files."""
+        trial = Trial(name="operator_trial", storage=self.local_storage)
+        sparse = Operator(SparsePauliOp(["ZZI", "XII"], [1.0, 0.5]))
+        dense = random_unitary(8, seed=42).to_operator()
+        trial.add_operator("sparse", sparse)
+        trial.add_operator("dense", dense)
+        trial.save()
+
+        trial_path = os.path.join(self.save_path, f"trial_{trial.uuid}")
+        self.assertTrue(os.path.isfile(os.path.join(trial_path, "operator_dense.npy")))
+        self.assertFalse(
+            os.path.isfile(os.path.join(trial_path, "operator_sparse.npy"))
+        )
+
+        recovered = self.local_storage.get(trial_id=trial.uuid)
+        self.assertEqual(recovered.operators[0], ["sparse", sparse])
+        self.assertEqual(recovered.operators[1], ["dense", dense])
+
+    def test_local_storage_resave_mapped(self):
+        """Test trial got with memory-mapped arrays is saved back in place."""
+        trial = Trial(name="mapped_trial", storage=self.local_storage)
+        trial.add_array("large", np.arange(100000.0))
+        trial.add_operator("dense", random_unitary(8, seed=42).to_operator())
+        trial.save()
+
+        recovered = self.local_storage.get(trial_id=trial.uuid)
+        recovered.changes.changed("arrays")
+        recovered.changes.changed("operators")
+        self.local_storage.save(recovered)
+        # views of replaced files are not changed
+        self.assertEqual(recovered.arrays[0][1][-1], 99999.0)
+
+        resaved = self.local_storage.get(trial_id=trial.uuid)
+        np.testing.assert_array_equal(resaved.arrays[0][1], np.arange(100000.0))
+        self.assertEqual(resaved.operators, trial.operators)
+        self.assertEqual(
+            os.listdir(os.path.join(self.save_path, f"trial_{trial.uuid}")).count(
+                "array_large.npy"
+            ),
+            1,
+        )
+
+    def test_local_storage_codec(self):
+        """Test compressed local storage."""
+        storage = LocalStorage(path=self.save_path, codec="gzip")
+        storage.save(trial=self.my_trial)
+        trial_path = os.path.join(self.save_path, f"trial_{self.my_trial.uuid}")
+        with open(os.path.join(trial_path, "trial.json"), "rb") as trial_file:
+            self.assertEqual(trial_file.read(2), b"\x1f\x8b")
+
+        recovered = self.local_storage.get(trial_id=self.my_trial.uuid)
+        self.assertEqual(recovered.parameters, [["test_parameter", "parameter"]])
+        self.assertEqual(recovered.circuits, [["test_circuit", QuantumCircuit(2)]])
+        self.assertEqual(recovered.texts, [["test_text", "text"]])
+
+    def test_local_storage_incremental_save(self):
+        """Test saving a trial again writes only new and changed components."""
+        trial = dummy_trial(name="incremental_trial", storage=self.local_storage)
+        trial.add_operator("dense", random_unitary(4, seed=42).to_operator())
+        trial.save()
+        # saved trial is not changed
+        self.assertEqual(trial.circuits, [["test_circuit", QuantumCircuit(2)]])
+        self.assertEqual(trial.texts, [["test_text", "text"]])
+
+        trial_path = os.path.join(self.save_path, f"trial_{trial.uuid}")
+
+        def files():
+            return {
+                name: (stat.st_ino, stat.st_mtime_ns)
+                for name in os.listdir(trial_path)
+                if name != "journal.jsonl"
+                for stat in [os.stat(os.path.join(trial_path, name))]
+            }
+
+        def written_by(save):
+            before = files()
+            save()
+            return sorted(
+                name for name, state in files().items() if before.get(name) != state
+            )
+
+        trial.add_text("notes", "new text")
+        self.assertEqual(written_by(trial.save), ["text_notes.json", "trial.json"])
+
+        # arrays changed in place, like checkpointed results, or removed from disk
+        trial.arrays[0][1][:] = 43
+        trial.circuits[0][1].h(0)
+        os.remove(os.path.join(trial_path, "text_test_text.json"))
+        self.assertEqual(
+            written_by(trial.save),
+            ["array_test_array.npy", "text_test_text.json", "trial.json"],
+        )
+        # other components changed in place are marked or hashed
+        trial.changes.changed("circuits", "test_circuit")
+        self.assertEqual(
+            written_by(trial.save), ["circuit_test_circuit.json", "trial.json"]
+        )
+        # replaced components
+        trial.texts = [["test_text", "replaced"], trial.texts[1]]
+        self.assertEqual(
+            written_by(trial.save),
+            ["text_notes.json", "text_test_text.json", "trial.json"],
+        )
+        with patch.object(Configuration, "CHANGE_HASHING", "all"):
+            trial.save()
+            trial.circuits[0][1].x(1)
+            self.assertEqual(
+                written_by(trial.save), ["circuit_test_circuit.json", "trial.json"]
+            )
+
+        # got trial saved back does not write loaded components
+        recovered = self.local_storage.get(trial_id=trial.uuid)
+        recovered.add_metric("loss", 0.5)
+        self.assertEqual(
+            written_by(lambda: self.local_storage.save(recovered)),
+            ["metrics.npz", "trial.json"],
+        )
+
+        recovered = self.local_storage.get(trial_id=trial.uuid)
+        self.assertEqual(recovered.arrays[0][1].tolist(), [43])
+        self.assertEqual(recovered.circuits, trial.circuits)
+        self.assertEqual(recovered.texts[1], ["notes", "new text"])
+        self.assertEqual(recovered.operators, trial.operators)
+        self.assertEqual(recovered.metrics[-1][:2], ["loss", 0.5])
+
+    def test_local_storage_dedup(self):
+        """Test trials share equal files through blob store."""
+        storage = LocalStorage(path=self.save_path, dedup=True)
+        trials = []
+        for idx in range(3):
+            trial = dummy_trial(name=f"sweep_{idx}", storage=storage)
+            trial.add_array("reference", np.arange(1000))
+            trial.save()
+            trials.append(trial)
+
+        paths = [
+            os.path.join(self.save_path, f"trial_{trial.uuid}", "array_reference.npy")
+            for trial in trials
+        ]
+        self.assertEqual(len({os.stat(path).st_ino for path in paths}), 1)
+        self.assertEqual(os.stat(paths[0]).st_nlink, 4)
+        recovered = storage.get(trial_id=trials[1].uuid)
+        self.assertEqual(recovered.circuits, [["test_circuit", QuantumCircuit(2)]])
+        self.assertTrue(np.array_equal(recovered.arrays[1][1], np.arange(1000)))
+
+        # referenced blobs are kept
+        self.assertEqual(storage.collect_garbage(), 0)
+
+        # saving without dedup does not change files of other trials
+        trials[0].arrays[1][1] = np.arange(10)
+        self.local_storage.save(trial=trials[0])
+        self.assertEqual(len(np.load(paths[1])), 1000)
+
+        for trial in trials:
+            shutil.rmtree(os.path.join(self.save_path, f"trial_{trial.uuid}"))
+        self.assertGreater(storage.collect_garbage(), 0)
+        blobs_path = os.path.join(self.save_path, "blobs")
+        self.assertFalse(any(files for _, _, files in os.walk(blobs_path)))
+
+    def test_save_many(self):
+        """Test saving trials at once."""
+        trials = [
+            dummy_trial(name=f"many_trial_{idx}", storage=self.local_storage)
+            for idx in range(20)
+        ]
+        self.local_storage.save_many(trials, max_workers=4)
+        self.assertEqual(len(self.local_storage.list(limit=100)), 20)
+        recovered = self.local_storage.get(trial_id=trials[7].uuid)
+        self.assertEqual(recovered.circuits, [["test_circuit", QuantumCircuit(2)]])
+
+        with patch("purplecaffeine.utils.session.ApiSession") as session_mock:
+            storage = ApiStorage(host="http://api", username="admin", password="admin")
+            request_mock = session_mock.return_value.request
+            request_mock.return_value = MagicMock(
+                status_code=207,
+                json=lambda: {
+                    "results": [
+                        {"index": 0, "status": 201},
+                        {"index": 1, "status": 400, "errors": {"name": "invalid"}},
+                    ]
+                },
+            )
+            with self.assertRaises(PurpleCaffeineException):
+                storage.save_many(trials[:4], batch_size=2)
+            self.assertEqual(request_mock.call_count, 2)
+            self.assertTrue(request_mock.call_args[0][1].endswith("bulk/"))
+
+            # request rejected as a whole
+            request_mock.reset_mock()
+            request_mock.return_value = MagicMock(
+                status_code=400, json=lambda: {"detail": "JSON parse error"}
+            )
+            with self.assertRaises(PurpleCaffeineException) as context:
+                storage.save_many(trials[:4], batch_size=2)
+            self.assertIn("many_trial_3", str(context.exception))
+
+            # server without bulk endpoint
+            request_mock.reset_mock()
+            request_mock.return_value = MagicMock(status_code=404)
+            self.assertEqual(len(storage.save_many(trials[:5], batch_size=2)), 5)
+            # one bulk request, then every trial is posted once
+            self.assertEqual(request_mock.call_count, 6)
+            self.assertEqual(
+                [
+                    call.args[1].endswith("bulk/")
+                    for call in request_mock.call_args_list
+                ],
+                [True] + [False] * 5,
+            )
+
+            # first batch decides fallback of non-blocking saves too
+            storage.async_session = MagicMock(
+                request=AsyncMock(return_value=MagicMock(status_code=404))
+            )
+            request_mock.reset_mock()
+            with patch.object(ApiStorage, "_native_async", return_value=True):
+                names = asyncio.run(storage.asave_many(trials[:5], batch_size=2))
+            self.assertEqual(len(names), 5)
+            self.assertEqual(storage.async_session.request.call_count, 6)
+
+    def test_caching_storage(self):
+        """Test trials are read from wrapped storage once until saved."""
+        cache_path = os.path.join(self.save_path, "cache")
+        self.local_storage.save(self.my_trial)
+        storage = CachingStorage(self.local_storage, cache_path=cache_path)
+        with patch.object(
+            self.local_storage, "get", wraps=self.local_storage.get
+        ) as get_mock:
+            for _ in range(3):
+                recovered = storage.get(self.my_trial.uuid)
+            self.assertEqual(get_mock.call_count, 1)
+            self.assertEqual(recovered.circuits, [["test_circuit", QuantumCircuit(2)]])
+
+            recovered.add_text("new_text", "text")
+            storage.save(recovered)
+            self.assertEqual(len(storage.get(self.my_trial.uuid).texts), 2)
+            self.assertEqual(get_mock.call_count, 2)
+
+            # on-disk cache is shared with new instances
+            other = CachingStorage(self.local_storage, cache_path=cache_path)
+            self.assertEqual(len(other.get(self.my_trial.uuid).texts), 2)
+            self.assertEqual(get_mock.call_count, 2)
+        self.assertEqual(
+            storage.stats(),
+            {
+                "hits": 2,
+                "misses": 2,
+                "evictions": 0,
+                "entries": 1,
+                "bytes": storage.memory.size,
+                "disk_hits": 0,
+                "disk_misses": 2,
+                "disk_evictions": 0,
+                "disk_bytes": storage.disk.size,
+            },
+        )
+        self.assertEqual(other.stats()["disk_hits"], 1)
+        # other attributes come from wrapped storage
+        self.assertEqual(storage.path, self.save_path)
+
+    def test_caching_storage_versions(self):
+        """Test memory hits are not measured again and stale disk copies are dropped."""
+        cache_path = os.path.join(self.save_path, "cache")
+        self.local_storage.save(self.my_trial)
+        # lazy components are loaded, so trial is measured again once
+        storage = CachingStorage(self.local_storage)
+        with patch.object(
+            storage.memory, "sizeof", wraps=storage.memory.sizeof
+        ) as sizeof_mock:
+            for _ in range(3):
+                recovered = storage.get(self.my_trial.uuid)
+            self.assertEqual(sizeof_mock.call_count, 1)
+            self.assertEqual(len(recovered.arrays), 1)
+            storage.get(self.my_trial.uuid)
+            storage.get(self.my_trial.uuid)
+            self.assertEqual(sizeof_mock.call_count, 2)
+
+        # trial saved by another process while it is read
+        writer = CachingStorage(self.local_storage, cache_path=cache_path)
+        get = self.local_storage.get
+
+        def get_during_save(trial_id):
+            trial = get(trial_id)
+            changed = get(trial_id)
+            changed.add_text("new_text", "text")
+            writer.save(changed)
+            return trial
+
+        reader = CachingStorage(self.local_storage, cache_path=cache_path)
+        with patch.object(self.local_storage, "get", side_effect=get_during_save):
+            self.assertEqual(len(reader.get(self.my_trial.uuid).texts), 1)
+        other = CachingStorage(self.local_storage, cache_path=cache_path)
+        self.assertEqual(len(other.get(self.my_trial.uuid).texts), 2)
+
+    @patch.object(Configuration, "REPLICATION_BACKOFF_FACTOR", 0.01)
+    def test_tiered_storage(self):
+        """Test trials are replicated in background and resumed after restart."""
+        spool = LocalStorage(os.path.join(self.save_path, "spool"))
+        remote = LocalStorage(os.path.join(self.save_path, "remote"))
+
+        storage = TieredStorage(spool, [FlakyStorage(remote, failures=2)])
+        storage.save(self.my_trial)
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(remote.get(self.my_trial.uuid).name, "keep_trial")
+        self.assertEqual(
+            storage.metrics(),
+            {"pending": 0, "running": 0, "failed": 0, "replicated": 1, "retries": 2},
+        )
+        storage.close()
+
+        # replication interrupted by a restart is resumed
+        with patch.object(Configuration, "REPLICATION_BACKOFF_FACTOR", 100):
+            storage = TieredStorage(spool, [FlakyStorage(remote, failures=100)])
+            trial = dummy_trial(name="interrupted_trial")
+            storage.save(trial)
+            while storage.metrics()["retries"] == 0:
+                storage.wait(timeout=0.01)
+            self.assertFalse(storage.wait(timeout=0.1))
+            storage.close()
+        storage = TieredStorage(spool, [FlakyStorage(remote, failures=0)])
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(remote.get(trial.uuid).name, "interrupted_trial")
+
+        # trials missing in spool are read from remotes
+        shutil.rmtree(os.path.join(spool.path, f"trial_{trial.uuid}"))
+        self.assertEqual(storage.get(trial.uuid).name, "interrupted_trial")
+        with self.assertRaises(ValueError):
+            storage.get("999")
+        storage.close()
+
+        storage = TieredStorage(
+            spool, [FlakyStorage(remote, failures=1)], max_retries=1
+        )
+        storage.save(dummy_trial(name="failed_trial"))
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(storage.metrics()["failed"], 1)
+        self.assertEqual(storage.queue.retry_failed(), 1)
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(storage.metrics()["replicated"], 1)
+        storage.close()
+
+    def test_local_storage_async(self):
+        """Test async methods of local storage."""
+        trials = [
+            dummy_trial(name=f"async_trial_{idx}", storage=self.local_storage)
+            for idx in range(10)
+        ]
+
+        async def run():
+            await self.local_storage.asave_many(trials, max_concurrency=3)
+            return await asyncio.gather(
+                self.local_storage.aget(trials[2].uuid),
+                self.local_storage.alist(query="async_trial", limit=20),
+            )
+
+        recovered, listed = asyncio.run(run())
+        self.assertEqual(recovered.name, "async_trial_2")
+        self.assertEqual(len(listed), 10)
+
+    @mock_aws
+    def test_storage_instrumentation(self):
+        """Test operations of instrumented storages are recorded."""
+        instrumentation = Instrumentation()
+        self.local_storage.instrument(instrumentation)
+        self.local_storage.save(self.my_trial)
+        self.local_storage.get(self.my_trial.uuid)
+        self.local_storage.save_many(
+            [dummy_trial(name=f"span_{idx}") for idx in range(3)]
+        )
+        self.assertEqual(len(self.local_storage.list(limit=10)), 4)
+
+        totals = instrumentation.totals()
+        self.assertEqual(
+            sorted(totals),
+            [
+                "LocalStorage.get",
+                "LocalStorage.list",
+                "LocalStorage.save",
+                "LocalStorage.save_many",
+            ],
+        )
+        # saves of save_many and gets of list are part of them
+        self.assertEqual(totals["LocalStorage.save"]["calls"], 1)
+        self.assertGreater(totals["LocalStorage.save"]["bytes_out"], 0)
+        self.assertGreater(totals["LocalStorage.save_many"]["bytes_out"], 0)
+        self.assertTrue({"encode", "io"} <= set(totals["LocalStorage.save"]["phases"]))
+        self.assertIn("decode", totals["LocalStorage.list"]["phases"])
+        self.assertGreater(totals["LocalStorage.get"]["bytes_in"], 0)
+
+        self.local_storage.instrument(None)
+        self.local_storage.get(self.my_trial.uuid)
+        self.assertEqual(instrumentation.totals()["LocalStorage.get"]["calls"], 1)
+
+        s3_storage = S3Storage(
+            "bucket", access_key="", secret_access_key="", lazy=False
+        ).instrument(instrumentation)
+        s3_storage.client_s3.create_bucket(Bucket=s3_storage.bucket_name)
+        s3_storage.save(self.my_trial)
+        s3_storage.get(self.my_trial.uuid)
+        totals = instrumentation.totals()
+        for operation in ["S3Storage.save", "S3Storage.get"]:
+            self.assertIn("io", totals[operation]["phases"])
+        self.assertGreater(totals["S3Storage.save"]["bytes_out"], 0)
+        # components are fetched by other threads
+        self.assertGreater(
+            totals["S3Storage.get"]["bytes_in"],
+            totals["S3Storage.save"]["bytes_out"] / 2,
+        )
+
+    @mock_aws
+    def test_s3_storage_list(self):
+        """Test S3 listing searches manifest and reads page bodies only."""
+        s3_storage = S3Storage(
+            "bucket", access_key="", secret_access_key="", legacy_prefix=""
+        )
+        s3_storage.client_s3.create_bucket(Bucket=s3_storage.bucket_name)
+        for idx in range(12):
+            trial = dummy_trial(name=f"s3_trial_{idx}")
+            if idx % 3 == 0:
+                trial.add_tag("third")
+            s3_storage.save(trial)
+        # trials saved at bucket root by older versions, in one object or split
+        legacy_trials = [dummy_trial(name=f"legacy_trial_{idx}") for idx in range(2)]
+        for key, legacy in zip(["{}", "{}/trial.json"], legacy_trials):
+            s3_storage.client_s3.put_object(
+                Bucket=s3_storage.bucket_name,
+                Key=key.format(legacy.uuid),
+                Body=json.dumps(legacy.__dict__, cls=TrialEncoder),
+            )
+        # unrelated object named by uuid is skipped
+        s3_storage.client_s3.put_object(
+            Bucket=s3_storage.bucket_name,
+            Key=dummy_trial().uuid,
+            Body=b"not a trial",
+        )
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(s3_storage.rebuild_manifest(), 14)
+
+        with patch.object(
+            s3_storage.client_s3,
+            "get_object",
+            wraps=s3_storage.client_s3.get_object,
+        ) as get_mock, patch.object(
+            s3_storage.client_s3,
+            "head_object",
+            wraps=s3_storage.client_s3.head_object,
+        ) as head_mock:
+            listed = s3_storage.list(limit=5)
+        self.assertEqual(get_mock.call_count, 5)
+        self.assertEqual(head_mock.call_count, 1)
+        self.assertEqual(len(listed), 5)
+
+        listed = s3_storage.list(query="third", limit=10)
+        self.assertEqual(
+            sorted(trial.name for trial in listed),
+            ["s3_trial_0", "s3_trial_3", "s3_trial_6", "s3_trial_9"],
+        )
+        self.assertEqual(len(s3_storage.list(query="s3_trial_1", limit=10)), 3)
+        self.assertEqual(len(s3_storage.list(query="legacy", limit=10)), 2)
+        self.assertEqual(len(s3_storage.list(query="third", offset=3)), 1)
+        # legacy trials are listed from their layout keys once migrated
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(len(s3_storage.migrate_legacy_keys()), 2)
+        self.assertEqual(
+            sorted(trial.uuid for trial in s3_storage.list(query="legacy")),
+            sorted(trial.uuid for trial in legacy_trials),
+        )
+
+        # saves after the manifest was built are merged into it
+        s3_storage.save(dummy_trial(name="manifest_trial"))
+        self.assertEqual(len(s3_storage.list(query="manifest_trial")), 1)
+
+        # long names and many tags are saved and searched through the manifest
+        long_trial = dummy_trial(name="é" * 3000)
+        for idx in range(200):
+            long_trial.add_tag(f"tag_{idx}")
+        s3_storage.save(long_trial)
+        self.assertEqual(
+            s3_storage.client_s3.head_object(
+                Bucket=s3_storage.bucket_name, Key=f"v1/{long_trial.uuid}/trial.json"
+            )["Metadata"],
+            {},
+        )
+        self.assertEqual(len(s3_storage.list(query="tag_199")), 1)
+
+    @mock_aws
+    def test_s3_storage_components(self):
+        """Test S3 trial components are separate objects fetched on access."""
+        s3_storage = S3Storage(
+            "bucket", access_key="", secret_access_key="", codec="gzip"
+        )
+        s3_storage.client_s3.create_bucket(Bucket=s3_storage.bucket_name)
+        trial = dummy_trial(name="s3_components")
+        trial.add_circuit("bell", QuantumCircuit(2, name="bell"))
+        trial.add_operator("dense", Operator(random_unitary(4, seed=42)))
+        trial.add_artifact("settings", {"shots": 1024})
+        s3_storage.save(trial)
+        # saved trial is not changed
+        self.assertIsInstance(trial.circuits[0][1], QuantumCircuit)
+
+        keys = {
+            s3_object["Key"]
+            for s3_object in s3_storage.client_s3.list_objects_v2(
+                Bucket=s3_storage.bucket_name
+            )["Contents"]
+        }
+        self.assertEqual(
+            keys,
+            {
+                f"v1/{trial.uuid}/{file_name}"
+                for file_name in [
+                    "trial.json",
+                    "circuit_test_circuit.json",
+                    "circuit_bell.json",
+                    "text_test_text.json",
+                    "array_test_array.npy",
+                    "operator_dense.npy",
+                    "artifact_settings.json",
+                ]
+            },
+        )
+
+        with patch.object(
+            s3_storage.client_s3,
+            "download_fileobj",
+            wraps=s3_storage.client_s3.download_fileobj,
+        ) as download_mock:
+            recovered = s3_storage.get(trial.uuid)
+            self.assertIsInstance(vars(recovered)["circuits"], Deferred)
+            self.assertEqual(download_mock.call_count, 0)
+            self.assertEqual(recovered.circuits, trial.circuits)
+            self.assertEqual(download_mock.call_count, 2)
+        self.assertEqual(recovered.operators, trial.operators)
+        self.assertEqual(recovered.texts, [["test_text", "text"]])
+        self.assertEqual(recovered.arrays[0][1].tolist(), [42])
+        self.assertEqual(recovered.artifacts, [["settings", {"shots": 1024}]])
+        self.assertEqual(len(s3_storage.list(query="s3_components")), 1)
+
+        # only new and changed objects are uploaded again
+        with patch.object(
+            s3_storage.client_s3,
+            "upload_fileobj",
+            wraps=s3_storage.client_s3.upload_fileobj,
+        ) as upload_mock:
+            trial.add_text("notes", "new text")
+            trial.arrays[0][1][:] = 7
+            s3_storage.save(trial)
+            self.assertEqual(
+                sorted(call.args[2] for call in upload_mock.call_args_list),
+                [
+                    f"v1/{trial.uuid}/array_test_array.npy",
+                    f"v1/{trial.uuid}/text_notes.json",
+                ],
+            )
+        recovered = s3_storage.get(trial.uuid)
+        self.assertEqual(recovered.texts[1], ["notes", "new text"])
+        self.assertEqual(recovered.arrays[0][1].tolist(), [7])
+
+    @mock_aws
+    def test_s3_storage_layout(self):
+        """Test S3 key layouts and migration of root-level keys."""
+        client_s3 = S3Storage("bucket", access_key="", secret_access_key="").client_s3
+        client_s3.create_bucket(Bucket="bucket")
+        client_s3.put_object(Bucket="bucket", Key="unrelated/data.csv", Body=b"")
+
+        for sharding in ["none", "hash", "date"]:
+            with self.subTest(sharding=sharding):
+                s3_storage = S3Storage(
+                    "bucket",
+                    access_key="",
+                    secret_access_key="",
+                    directory=f"experiments/{sharding}",
+                    sharding=sharding,
+                )
+                trial = dummy_trial(name=f"{sharding}_trial")
+                s3_storage.save(trial)
+                s3_storage.save(trial)
+                header_keys = [
+                    s3_object["Key"]
+                    for s3_object in client_s3.list_objects_v2(
+                        Bucket="bucket", Prefix=f"experiments/{sharding}/v1/"
+                    )["Contents"]
+                    if s3_object["Key"].endswith("trial.json")
+                ]
+                self.assertEqual(len(header_keys), 1)
+                self.assertEqual(
+                    len(header_keys[0].split("/")), 5 if sharding == "none" else 6
+                )
+                self.assertEqual(s3_storage.get(trial.uuid).circuits, trial.circuits)
+                listed = s3_storage.list()
+                self.assertEqual([trial.name for trial in listed], [trial.name])
+
+        s3_storage.save(dummy_trial(name="date_trial_2"))
+        self.assertEqual(len(s3_storage.list(since="2000-01-01")), 2)
+        self.assertEqual(len(s3_storage.list(since="9999-01-01")), 0)
+
+        # trials of older versions at bucket root
+        single = dummy_trial(name="single_object_trial")
+        client_s3.put_object(
+            Bucket="bucket",
+            Key=single.uuid,
+            Body=json.dumps(single.__dict__, cls=TrialEncoder),
+        )
+        split = dummy_trial(name="split_trial")
+        # previous layout had no directory and schema version
+        previous = S3Storage("bucket", access_key="", secret_access_key="")
+        previous.layout.root = ""
+        previous.save(split)
+        self.assertEqual(s3_storage.get(split.uuid).name, "split_trial")
+        self.assertEqual(len(s3_storage.list()), 2)
+        # not listed by storages of other prefixes
+        self.assertEqual(s3_storage.rebuild_manifest(), 2)
+        with self.assertRaises(PurpleCaffeineException):
+            s3_storage.migrate_legacy_keys()
+        # listed once manifest is rebuilt with their prefix, until they are migrated
+        s3_storage = S3Storage(
+            "bucket",
+            access_key="",
+            secret_access_key="",
+            directory="experiments/date",
+            sharding="date",
+            legacy_prefix="",
+        )
+        self.assertEqual(s3_storage.rebuild_manifest(), 4)
+        self.assertEqual(len(s3_storage.list(since="2000-01-01")), 4)
+
+        migrated = s3_storage.migrate_legacy_keys()
+        self.assertEqual(sorted(migrated), sorted([single.uuid, split.uuid]))
+        self.assertEqual(len(s3_storage.list()), 4)
+        self.assertEqual(s3_storage.get(split.uuid).circuits, split.circuits)
+        root_keys = [
+            s3_object["Key"].split("/")[0]
+            for s3_object in client_s3.list_objects_v2(Bucket="bucket")["Contents"]
+        ]
+        self.assertEqual(set(root_keys), {"experiments", "unrelated"})
+
     def test_save_get_api_storage(self):
         """Test save trial in API."""
         with DockerCompose(
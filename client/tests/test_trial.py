@@ -1,9 +1,11 @@
 """Tests for Trial."""
 import os
+import pickle
 import shutil
 from pathlib import Path
 from typing import Optional
 from unittest import TestCase
+from unittest.mock import patch
 
 import numpy as np
 from qiskit import QuantumCircuit, __version__
@@ -11,6 +13,8 @@ from qiskit.circuit.library import XGate
 from qiskit.quantum_info import Operator
 
 from purplecaffeine import Trial, LocalStorage, BaseStorage as TrialStorage
+from purplecaffeine.exception import PurpleCaffeineException
+from purplecaffeine.helpers import Configuration
 
 
 def dummy_trial(
@@ -72,6 +76,27 @@ class TestTrial(TestCase):
         self.assertEqual(trial.tags, ["qiskit", "test"])
         self.assertEqual(trial.versions, [["numpy", "1.2.3-4"]])
 
+    def test_artifact_size_policy(self):
+        """Test handling of too big artifacts."""
+        artifact = np.zeros(int(Configuration.MAX_SIZE))
+        trial = Trial(name="test_trial", storage=self.local_storage)
+        with self.assertLogs(level="WARNING"):
+            trial.add_artifact("warn", artifact)
+
+        with patch.object(Configuration, "ARTIFACT_SIZE_POLICY", "reject"):
+            with self.assertRaises(PurpleCaffeineException):
+                trial.add_artifact("reject", artifact)
+
+        with patch.object(Configuration, "ARTIFACT_SIZE_POLICY", "spill"), patch.object(
+            Configuration, "ARTIFACT_SPILL_PATH", self.save_path
+        ):
+            trial.add_artifact("spill", artifact)
+        spilled = trial.artifacts[-1][1]
+        self.assertTrue(spilled.startswith(self.save_path))
+        with open(spilled, "rb") as spilled_file:
+            np.testing.assert_array_equal(pickle.load(spilled_file), artifact)
+        self.assertEqual([name for name, _ in trial.artifacts], ["warn", "spill"])
+
     def test_save_read_local_trial(self):
         """Test save and read Trial locally."""
         trial = dummy_trial(storage=self.local_storage)
@@ -95,16 +120,32 @@ class TestTrial(TestCase):
 
     def test_export_import(self):
         """Test export and import Trial from shared file."""
-        trial = dummy_trial()
+        trial = dummy_trial(storage=self.local_storage)
+        trial.add_artifact("settings", {"shots": 1024})
         # Export
-        trial.export_to_shared_file(path=self.save_path)
-        self.assertTrue(
-            os.path.isdir(os.path.join(self.save_path, f"trial_{trial.uuid}"))
-        )
+        file_path = trial.export_to_shared_file(path=self.save_path)
+        self.assertEqual(os.listdir(self.save_path), [f"trial_{trial.uuid}.pack"])
+        self.assertEqual(self.local_storage.path, self.save_path)
+        self.assertIsInstance(trial.circuits[0][1], QuantumCircuit)
         # Import
         new_trial = Trial("test_import").import_from_shared_file(
             self.save_path, trial.uuid
         )
+        # arrays are read-only views of the memory-mapped file
+        self.assertFalse(new_trial.arrays[0][1].flags.writeable)
+        self.assertEqual(new_trial.artifacts, [["settings", {"shots": 1024}]])
+        self.assertEqual(
+            Trial.import_from_shared_file(file_path, use_mmap=False).circuits,
+            trial.circuits,
+        )
+        with self.assertRaises(PurpleCaffeineException):
+            Trial.import_from_shared_file(file_path, "other_uuid")
+
+        # folders exported by older versions
+        trial.save()
+        self.assertEqual(
+            Trial.import_from_shared_file(self.save_path, trial.uuid).uuid, trial.uuid
+        )
         self.assertEqual(new_trial.description, "Short desc")
         self.assertEqual(new_trial.metrics, [["test_metric", 42]])
         self.assertEqual(new_trial.parameters, [["test_parameter", "parameter"]])
@@ -0,0 +1,57 @@
+"""Tests for caches."""
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from purplecaffeine.utils import DiskCache, LRUCache
+
+
+class TestCache(TestCase):
+    """TestCache."""
+
+    def test_lru_cache(self):
+        """Test least recently used values are evicted by size."""
+        evicted = []
+        cache = LRUCache(
+            max_bytes=3000, on_evict=lambda key, value: evicted.append(key)
+        )
+        for key in ["a", "b", "c"]:
+            cache.put(key, np.zeros(100))
+        self.assertEqual(len(cache), 3)
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("d", np.zeros(100))
+        self.assertNotIn("b", cache)
+        self.assertEqual(evicted, ["b"])
+        self.assertIn("a", cache)
+        # too big to be cached
+        cache.put("e", np.zeros(1000))
+        self.assertNotIn("e", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(
+            (cache.hits, cache.misses, cache.evictions, cache.size), (1, 1, 1, 2400)
+        )
+
+    def test_disk_cache(self):
+        """Test values are pickled and evicted by size of files."""
+        path = tempfile.mkdtemp()
+        try:
+            cache = DiskCache(path, max_bytes=3000)
+            cache.put("a", np.zeros(100))
+            cache.put("b", np.zeros(100))
+            # mtime of files is coarse
+            time.sleep(0.05)
+            np.testing.assert_array_equal(cache.get("a"), np.zeros(100))
+            # lambdas can not be pickled
+            cache.put("c", lambda: None)
+            self.assertIsNone(cache.get("c"))
+            cache.put("d", np.zeros(200))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("a"))
+            self.assertEqual(cache.evictions, 1)
+            # size of files is restored
+            self.assertEqual(DiskCache(path, max_bytes=3000).size, cache.size)
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,65 @@
+"""Tests for change tracking."""
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+from purplecaffeine.utils import TrialChanges, fingerprint
+
+
+class TestChanges(TestCase):
+    """TestChanges."""
+
+    def test_fingerprint(self):
+        """Test fingerprints change with content, also changed in place."""
+        array = np.zeros(5)
+        token = fingerprint(array)
+        self.assertEqual(fingerprint(array.copy()), token)
+        array[:] = 7
+        self.assertNotEqual(fingerprint(array), token)
+        self.assertNotEqual(fingerprint(array.astype(np.float32)), fingerprint(array))
+
+        # other values are compared by identity unless all values are hashed
+        circuit = QuantumCircuit(2)
+        token = fingerprint(circuit)
+        circuit.h(0)
+        self.assertEqual(fingerprint(circuit), token)
+        self.assertEqual(fingerprint(circuit, deep=False), token)
+        self.assertNotEqual(fingerprint(circuit.copy()), token)
+        token = fingerprint(circuit, hashing="all")
+        circuit.h(1)
+        self.assertNotEqual(fingerprint(circuit, hashing="all"), token)
+        # hashing is skipped on read
+        self.assertIsNone(fingerprint(circuit, deep=False, hashing="all"))
+        self.assertNotEqual(fingerprint(1), fingerprint(True))
+        self.assertEqual(fingerprint("text", deep=False), fingerprint("text"))
+        with self.assertRaises(ValueError):
+            fingerprint(circuit, hashing="none")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "array.npy")
+            np.save(path, np.arange(10))
+            mapped = np.load(path, mmap_mode="r")
+            self.assertEqual(fingerprint(mapped, deep=False), fingerprint(mapped))
+            self.assertNotEqual(fingerprint(mapped), fingerprint(np.arange(10)))
+            del mapped
+
+    def test_changes(self):
+        """Test components are written until their fingerprint changes."""
+        changes = TrialChanges()
+        array = np.zeros(3)
+        changes.written("trial", [("arrays", "results", fingerprint(array))])
+        self.assertTrue(
+            changes.is_written("trial", "arrays", "results", fingerprint(array))
+        )
+        self.assertFalse(
+            changes.is_written("other", "arrays", "results", fingerprint(array))
+        )
+        changes.changed("arrays")
+        self.assertFalse(
+            changes.is_written("trial", "arrays", "results", fingerprint(array))
+        )
+        changes.loaded("trial", "texts", [["notes", "text"]])
+        self.assertTrue(changes.is_written("trial", "texts", "notes", ("str", "text")))
@@ -0,0 +1,35 @@
+"""Tests for codecs."""
+import io
+from unittest import TestCase
+from unittest.mock import patch
+
+from purplecaffeine.utils import dump_json, dumps_json, load_json, resolve_codec
+from purplecaffeine.utils.codec import detect_codec
+
+
+class TestCodec(TestCase):
+    """TestCodec."""
+
+    def test_round_trip(self):
+        """Test payloads are decoded with detected codec."""
+        payload = {"metrics": [["energy", idx * 0.125] for idx in range(1000)]}
+        plain = dumps_json(payload, "none")
+        for codec in ["none", "gzip", resolve_codec("zstd")]:
+            with self.subTest(codec=codec):
+                encoded = dumps_json(payload, codec)
+                self.assertEqual(detect_codec(encoded), codec)
+                self.assertEqual(load_json(io.BytesIO(encoded)), payload)
+                if codec != "none":
+                    self.assertLess(len(encoded), len(plain) / 5)
+
+        with self.assertRaises(ValueError):
+            resolve_codec("lz4")
+
+    def test_streaming(self):
+        """Test payload is written chunk by chunk."""
+        stream = io.BytesIO()
+        with patch.object(stream, "write", wraps=stream.write) as write_mock:
+            dump_json(list(range(10000)), stream, "none")
+        self.assertGreater(write_mock.call_count, 1)
+        stream.seek(0)
+        self.assertEqual(load_json(stream), list(range(10000)))
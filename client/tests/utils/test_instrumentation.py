@@ -0,0 +1,77 @@
+"""Tests for instrumentation."""
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import TestCase
+
+from purplecaffeine.utils import (
+    IO,
+    Instrumentation,
+    JsonLinesExporter,
+    bind_context,
+    count_bytes,
+    print_breakdown,
+    span,
+)
+
+
+class TestInstrumentation(TestCase):
+    """TestInstrumentation."""
+
+    def test_spans(self):
+        """Test nested spans and spans of other threads are added to operation."""
+        instrumentation = Instrumentation()
+        # no operation, no span
+        with span(IO) as no_span:
+            self.assertIsNone(no_span)
+
+        def write():
+            with span(IO):
+                time.sleep(0.01)
+            count_bytes(sent=10)
+
+        with instrumentation.operation("Storage", "save"):
+            with span("encode"):
+                time.sleep(0.01)
+                with span(IO):
+                    time.sleep(0.02)
+            with ThreadPoolExecutor(2) as executor:
+                list(executor.map(bind_context(lambda _: write()), range(2)))
+        with self.assertRaises(ValueError):
+            with instrumentation.operation("Storage", "get"):
+                raise ValueError("missing")
+
+        totals = instrumentation.totals()
+        save = totals["Storage.save"]
+        self.assertEqual((save["calls"], save["errors"], save["bytes_out"]), (1, 0, 20))
+        # nested io is not counted in encode
+        self.assertLess(save["phases"]["encode"], 0.02)
+        self.assertGreaterEqual(save["phases"][IO], 0.04)
+        self.assertEqual(totals["Storage.get"]["errors"], 1)
+
+    def test_export(self):
+        """Test records are exported to json lines and broken down by phase."""
+        path = tempfile.mkdtemp()
+        try:
+            exporter = JsonLinesExporter(os.path.join(path, "spans.jsonl"))
+            instrumentation = Instrumentation([exporter])
+            for _ in range(3):
+                with instrumentation.operation("Storage", "list"):
+                    with span(IO):
+                        count_bytes(received=2048)
+            records = exporter.read()
+            self.assertEqual(len(records), 3)
+            self.assertEqual(records[0]["bytes_in"], 2048)
+            self.assertIn(IO, records[0]["phases"])
+
+            output = StringIO()
+            print_breakdown(exporter.path, file=output)
+            lines = output.getvalue().splitlines()
+            self.assertEqual(lines[0].split()[:3], ["operation", "calls", "mean"])
+            self.assertEqual(lines[1].split()[:2], ["Storage.list", "3"])
+            self.assertEqual(lines[1].split()[-1], "6.0")
+        finally:
+            shutil.rmtree(path)
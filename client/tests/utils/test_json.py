@@ -1,12 +1,22 @@
 """Tests for Json."""
 import json
 import copy
+import math
 from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from qiskit.quantum_info import (
+    Operator,
+    SparsePauliOp,
+    random_pauli_list,
+    random_unitary,
+)
 
 from qiskit_ibm_runtime.utils import RuntimeEncoder
 
 from purplecaffeine.core import Trial
-from purplecaffeine.utils import TrialEncoder, TrialDecoder
+from purplecaffeine.utils import TrialEncoder, TrialDecoder, encode_json, decode_json
 
 from ..test_trial import dummy_trial
 
@@ -40,3 +50,109 @@ class TestJson(TestCase):
         self.assertEqual(trial_decode.texts, my_trial.texts)
         self.assertEqual(trial_decode.arrays, my_trial.arrays)
         self.assertEqual(trial_decode.tags, my_trial.tags)
+
+    def test_operator_encoding(self):
+        """Test Pauli encoding of operators."""
+        hamiltonian = SparsePauliOp.from_sparse_list(
+            [("ZZ", [idx, idx + 1], 1.0) for idx in range(9)]
+            + [("X", [idx], 0.5) for idx in range(10)],
+            num_qubits=10,
+        )
+        operator = Operator(hamiltonian)
+        encoded = json.dumps(operator, cls=TrialEncoder)
+        self.assertLess(len(encoded), operator.data.nbytes / 1000)
+        decoded = json.loads(encoded, cls=TrialDecoder)
+        self.assertIsInstance(decoded, Operator)
+        np.testing.assert_array_equal(decoded.data, operator.data)
+
+        decoded = json.loads(
+            json.dumps(hamiltonian, cls=TrialEncoder), cls=TrialDecoder
+        )
+        self.assertIsInstance(decoded, SparsePauliOp)
+        self.assertEqual(decoded, hamiltonian)
+
+        # dense operators keep runtime encoding
+        dense = random_unitary(8, seed=42).to_operator()
+        decoded = json.loads(json.dumps(dense, cls=TrialEncoder), cls=TrialDecoder)
+        self.assertTrue(np.allclose(decoded.data, dense.data))
+
+        # coefficients are not dropped however small they are
+        operator = Operator(np.diag([1, 1, 1, 1 + 1e-10]))
+        decoded = json.loads(json.dumps(operator, cls=TrialEncoder), cls=TrialDecoder)
+        np.testing.assert_array_equal(decoded.data, operator.data)
+        operator = Operator(hamiltonian + SparsePauliOp("Y" * 10, 1e-12))
+        encoded = json.dumps(operator, cls=TrialEncoder)
+        self.assertIn("Y" * 10, encoded)
+        decoded = json.loads(encoded, cls=TrialDecoder)
+        np.testing.assert_allclose(decoded.data, operator.data, rtol=0, atol=1e-15)
+
+        # terms with phases and complex coefficients
+        rng = np.random.default_rng(42)
+        operator = Operator(
+            SparsePauliOp(
+                random_pauli_list(5, 8, seed=42, phase=True),
+                rng.normal(size=8) + 1j * rng.normal(size=8),
+            )
+        )
+        encoded = json.dumps(operator, cls=TrialEncoder)
+        self.assertIn("PauliOperator", encoded)
+        decoded = json.loads(encoded, cls=TrialDecoder)
+        np.testing.assert_allclose(decoded.data, operator.data, rtol=0, atol=1e-14)
+
+    def test_operator_encoding_cache(self):
+        """Test unchanged operators are decomposed once."""
+        operator = Operator(SparsePauliOp(["XZ", "YY"], [0.5, 0.25]))
+        with patch.object(
+            SparsePauliOp, "from_operator", wraps=SparsePauliOp.from_operator
+        ) as decomposition_mock:
+            first = json.dumps(operator, cls=TrialEncoder)
+            self.assertEqual(json.dumps(operator, cls=TrialEncoder), first)
+            self.assertEqual(decomposition_mock.call_count, 1)
+            # changed in place
+            operator.data[:] = 0
+            self.assertNotEqual(json.dumps(operator, cls=TrialEncoder), first)
+            self.assertEqual(decomposition_mock.call_count, 2)
+
+    def test_non_finite_floats(self):
+        """Test NaN and infinite floats are kept."""
+        my_trial = dummy_trial(name="nan_trial")
+        my_trial.add_metric("loss", float("nan"))
+        my_trial.add_parameter("bound", [float("inf"), -float("inf"), None])
+        decoded = decode_json(encode_json(my_trial.__dict__))
+        self.assertTrue(math.isnan(decoded["metrics"][-1][1]))
+        self.assertEqual(
+            decoded["parameters"][-1], ["bound", [math.inf, -math.inf, None]]
+        )
+        self.assertEqual(
+            decode_json(encode_json({"value": np.float64("nan")}))["value"].__class__,
+            float,
+        )
+
+    def test_single_pass(self):
+        """Test trials are encoded and decoded in a single pass."""
+        my_trial = dummy_trial(name="big_trial")
+        my_trial.parameters += [
+            [f"parameter_{idx}", {"value": idx * 0.5, "on": True}]
+            for idx in range(20000)
+        ]
+        raw = json.dumps(my_trial.__dict__, cls=TrialEncoder).encode("utf-8")
+
+        # json module encoder is not run over the whole payload
+        with patch.object(
+            TrialEncoder, "encode", side_effect=AssertionError("second pass")
+        ):
+            encoded = encode_json(my_trial.__dict__)
+        # object hooks run only for typed objects
+        with patch.object(
+            TrialDecoder, "object_hook", wraps=TrialDecoder().object_hook
+        ) as hook_mock:
+            decoded = decode_json(encoded)
+            self.assertEqual(hook_mock.call_count, encoded.count(b'"__type__"'))
+            self.assertEqual(decode_json(b'{"value": [1, 2]}'), {"value": [1, 2]})
+            self.assertEqual(hook_mock.call_count, encoded.count(b'"__type__"'))
+
+        expected = json.loads(raw, cls=TrialDecoder)
+        self.assertEqual(decoded["parameters"], expected["parameters"])
+        self.assertEqual(decoded["metrics"], expected["metrics"])
+        self.assertEqual(decoded["arrays"], expected["arrays"])
+        self.assertIsNone(decoded["storage"])
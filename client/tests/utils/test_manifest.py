@@ -0,0 +1,121 @@
+"""Tests for S3 manifest."""
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from purplecaffeine.helpers import Configuration
+from purplecaffeine.utils import S3Manifest
+
+
+def summary(uuid: str):
+    """Returns manifest entry of a trial."""
+    return {"uuid": uuid, "name": uuid, "description": "", "tags": [], "mtime": 0}
+
+
+@mock_aws
+class TestS3Manifest(TestCase):
+    """TestS3Manifest."""
+
+    def setUp(self) -> None:
+        """SetUp bucket and cache folder."""
+        self.client_s3 = boto3.client("s3", region_name="us-east-1")
+        self.client_s3.create_bucket(Bucket="bucket")
+        self.cache_path = tempfile.mkdtemp()
+
+    def manifest(self) -> S3Manifest:
+        """Returns manifest of the bucket."""
+        return S3Manifest(
+            self.client_s3, "bucket", "v1/manifest.json", cache_path=self.cache_path
+        )
+
+    def test_conditional_merge(self):
+        """Test concurrent writers do not lose entries."""
+        first, second = self.manifest(), self.manifest()
+        self.assertIsNone(first.entries())
+        # manifest is built by storages, not by saves
+        self.assertFalse(first.add(summary("a")))
+
+        first.rewrite([summary("a")])
+        self.assertTrue(second.add(summary("b")))
+        # first has stale version, its write conflicts and is merged
+        self.assertTrue(first.add(summary("c")))
+        self.assertTrue(first.add(summary("a")))
+        self.assertEqual([entry["uuid"] for entry in second.entries()], ["b", "c", "a"])
+
+    def test_cache(self):
+        """Test unchanged manifest is read with a single HEAD request."""
+        self.manifest().rewrite([summary(str(idx)) for idx in range(100)])
+
+        manifest = self.manifest()
+        with patch.object(
+            self.client_s3, "get_object", wraps=self.client_s3.get_object
+        ) as get_mock, patch.object(
+            self.client_s3, "head_object", wraps=self.client_s3.head_object
+        ) as head_mock:
+            for _ in range(3):
+                self.assertEqual(len(manifest.entries()), 100)
+        # local cache written by the other instance is valid
+        self.assertEqual(get_mock.call_count, 0)
+        self.assertEqual(head_mock.call_count, 3)
+
+        self.manifest().add(summary("new"))
+        self.assertEqual(manifest.entries()[-1]["uuid"], "new")
+
+    def segments(self):
+        """Returns keys of manifest segments."""
+        return [
+            s3_object["Key"]
+            for s3_object in self.client_s3.list_objects_v2(
+                Bucket="bucket", Prefix="v1/manifest.d/"
+            ).get("Contents", [])
+        ]
+
+    @patch.object(Configuration, "S3_MANIFEST_SEGMENTS", 3)
+    def test_segments(self):
+        """Test saves write segments, which reads compact into the base."""
+        manifest = self.manifest()
+        manifest.rewrite([summary("a")])
+        manifest.entries()
+        with patch.object(
+            self.client_s3, "get_object", wraps=self.client_s3.get_object
+        ) as get_mock, patch.object(
+            self.client_s3, "head_object", wraps=self.client_s3.head_object
+        ) as head_mock:
+            for uuid in ["b", "c"]:
+                self.assertTrue(manifest.add(summary(uuid)))
+        # saves do not read the manifest
+        self.assertEqual((get_mock.call_count, head_mock.call_count), (0, 0))
+        self.assertEqual(len(self.segments()), 2)
+        self.assertEqual(
+            [entry["uuid"] for entry in self.manifest().entries()], ["a", "b", "c"]
+        )
+
+        self.manifest().add({**summary("a"), "name": "renamed"})
+        entries = manifest.entries()
+        self.assertEqual([entry["uuid"] for entry in entries], ["b", "c", "a"])
+        self.assertEqual(entries[-1]["name"], "renamed")
+        self.assertEqual(self.segments(), [])
+        self.manifest().add(summary("d"))
+        for reader in [manifest, self.manifest()]:
+            self.assertEqual(
+                [entry["uuid"] for entry in reader.entries()], ["b", "c", "a", "d"]
+            )
+
+    def test_failed_add(self):
+        """Test failed writes of segments are logged, not raised."""
+        manifest = self.manifest()
+        manifest.rewrite([summary("a")])
+        error = ClientError({"Error": {"Code": "SlowDown"}}, "PutObject")
+        with patch.object(self.client_s3, "put_object", side_effect=error):
+            with self.assertLogs(level="WARNING"):
+                self.assertFalse(manifest.add(summary("b")))
+        self.assertEqual([entry["uuid"] for entry in manifest.entries()], ["a"])
+
+    def tearDown(self) -> None:
+        """TearDown cache folder."""
+        shutil.rmtree(self.cache_path)
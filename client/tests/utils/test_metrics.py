@@ -0,0 +1,115 @@
+"""Tests for MetricLog."""
+import json
+from unittest import TestCase
+
+import numpy as np
+
+from purplecaffeine.utils import MetricLog, TrialEncoder, TrialDecoder
+
+
+class TestMetricLog(TestCase):
+    """TestMetricLog."""
+
+    def test_legacy_view(self):
+        """Test legacy list of metrics."""
+        metrics = MetricLog([["nb_qubits", 2], ["energy", -1.5]])
+        metrics.append(["energy", -1.75])
+        metrics.add("label", "ground state")
+
+        self.assertEqual(len(metrics), 4)
+        self.assertEqual(
+            metrics,
+            [
+                ["nb_qubits", 2],
+                ["energy", -1.5],
+                ["energy", -1.75],
+                ["label", "ground state"],
+            ],
+        )
+        self.assertEqual(metrics[1], ["energy", -1.5])
+        self.assertIsInstance(metrics.to_list()[0][1], int)
+
+    def test_accessors(self):
+        """Test vectorized accessors."""
+        metrics = MetricLog()
+        for step in range(1000):
+            metrics.add("energy", float(step), step=10 * step)
+        metrics.add("nb_qubits", 4)
+
+        self.assertEqual(metrics.names(), ["energy", "nb_qubits"])
+        self.assertEqual(metrics.last("energy"), 999.0)
+        self.assertEqual(metrics.min("energy"), 0.0)
+        self.assertEqual(metrics.max("energy"), 999.0)
+        self.assertEqual(metrics.mean("energy"), 499.5)
+        np.testing.assert_array_equal(
+            metrics.values("energy", start=100, stop=150),
+            [10.0, 11.0, 12.0, 13.0, 14.0],
+        )
+        np.testing.assert_array_equal(metrics.steps("nb_qubits"), [0])
+        self.assertEqual(len(metrics.timestamps("energy")), 1000)
+        with self.assertRaises(KeyError):
+            metrics.last("unknown")
+
+    def test_mixed_numbers(self):
+        """Test integers keep their precision next to floats."""
+        metrics = MetricLog()
+        metrics.add("shots", 2**53 + 1)
+        metrics.add("shots", 0.5)
+        metrics.add("shots", 2**53 + 3)
+        self.assertEqual(
+            metrics.to_list(),
+            [["shots", 2**53 + 1], ["shots", 0.5], ["shots", 2**53 + 3]],
+        )
+        self.assertIsInstance(metrics.last("shots"), int)
+
+        metrics.add("energy", 1)
+        metrics.add("energy", -1.5)
+        metrics.add("energy", 2**53 + 1)
+        self.assertEqual(metrics.values("energy").dtype, object)
+        self.assertEqual(metrics.values("energy").tolist(), [1.0, -1.5, 2**53 + 1])
+        self.assertEqual(metrics.last("energy"), 2**53 + 1)
+
+        decoded = MetricLog.from_arrays(
+            metrics.to_arrays(lambda values: json.dumps(values).encode("utf-8")),
+            json.loads,
+        )
+        self.assertEqual(decoded, metrics)
+        self.assertEqual(decoded.last("shots"), 2**53 + 3)
+
+    def test_encoder_decoder(self):
+        """Test json encodes legacy entries and decodes columnar form."""
+        metrics = MetricLog()
+        metrics.add("energy", -1.5, step=3, timestamp=12.5)
+        metrics.add("nb_qubits", 2)
+        metrics.add("energy", -1.75, step=7, timestamp=13.5)
+
+        self.assertEqual(
+            json.loads(json.dumps(metrics, cls=TrialEncoder)),
+            [["energy", -1.5], ["nb_qubits", 2], ["energy", -1.75]],
+        )
+
+        columnar = json.dumps(
+            {"__type__": "MetricLog", "__value__": metrics.to_dict()}, cls=TrialEncoder
+        )
+        decoded = json.loads(columnar, cls=TrialDecoder)
+        self.assertIsInstance(decoded, MetricLog)
+        self.assertEqual(decoded, metrics)
+        np.testing.assert_array_equal(decoded.steps("energy"), [3, 7])
+        np.testing.assert_array_equal(decoded.timestamps("energy"), [12.5, 13.5])
+        decoded.add("energy", -2.0)
+        self.assertEqual(decoded.last("energy"), -2.0)
+
+    def test_arrays(self):
+        """Test round-trip through numeric arrays."""
+        metrics = MetricLog()
+        metrics.add("energy", -1.5, step=3, timestamp=12.5)
+        metrics.add("label", "ground state", timestamp=13.0)
+        metrics.add("energy", -1.75, step=7, timestamp=13.5)
+
+        arrays = metrics.to_arrays(lambda values: json.dumps(values).encode("utf-8"))
+        for array in arrays.values():
+            self.assertNotEqual(array.dtype, object)
+        decoded = MetricLog.from_arrays(arrays, json.loads)
+        self.assertEqual(decoded, metrics)
+        np.testing.assert_array_equal(decoded.steps("energy"), [3, 7])
+        np.testing.assert_array_equal(decoded.timestamps("label"), [13.0])
@@ -0,0 +1,75 @@
+"""Tests for pack file."""
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from purplecaffeine.utils import PackWriter, PackReader
+
+
+class TestPack(TestCase):
+    """TestPack."""
+
+    def test_write_read(self):
+        """Test members are read back by name."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "members.pack")
+            with PackWriter(path) as writer:
+                writer.add("first", b"1" * 10)
+                with writer.member("second") as stream:
+                    stream.write(b"2" * 5)
+                    stream.write(b"3" * 5)
+                writer.add("empty", b"")
+
+            with PackReader(path) as reader:
+                self.assertEqual(reader.names(), ["first", "second", "empty"])
+                self.assertEqual(reader.read("second"), b"2" * 5 + b"3" * 5)
+                self.assertEqual(reader.read("first"), b"1" * 10)
+                self.assertEqual(reader.read("empty"), b"")
+
+            with self.assertRaises(RuntimeError):
+                with PackWriter(path) as writer:
+                    writer.add("first", b"4")
+                    raise RuntimeError("interrupted")
+            self.assertEqual(os.listdir(directory), ["members.pack"])
+
+            # writers of the same path do not share temporary files
+            first, second = PackWriter(path), PackWriter(path)
+            first.add("writer", b"first")
+            second.add("writer", b"second")
+            second.close()
+            first.close()
+            with PackReader(path) as reader:
+                self.assertEqual(reader.read("writer"), b"first")
+            self.assertEqual(os.listdir(directory), ["members.pack"])
+
+            with open(path, "wb") as file:
+                file.write(b"not a pack file" * 10)
+            with self.assertRaises(ValueError):
+                PackReader(path)
+
+    def test_mmap(self):
+        """Test members of memory-mapped pack are read without copies."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "members.pack")
+            array = np.arange(12.0).reshape(3, 4)
+            with PackWriter(path) as writer:
+                writer.add("text", b"text")
+                with writer.member("array") as stream:
+                    np.save(stream, array)
+                with writer.member("fortran") as stream:
+                    np.save(stream, np.asfortranarray(array))
+
+            with PackReader(path, use_mmap=True) as reader:
+                self.assertEqual(bytes(reader.view("text")), b"text")
+                mapped = reader.array("array")
+                np.testing.assert_array_equal(mapped, array)
+                np.testing.assert_array_equal(reader.array("fortran"), array)
+                self.assertFalse(mapped.flags.writeable)
+            # view outlives reader
+            np.testing.assert_array_equal(mapped, array)
+
+            with PackReader(path) as reader:
+                np.testing.assert_array_equal(reader.array("array"), array)
+                self.assertEqual(reader.view("text"), b"text")
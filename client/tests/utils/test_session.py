@@ -0,0 +1,169 @@
+"""Tests for api session."""
+import asyncio
+import json
+import threading
+import time
+from base64 import urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+import httpx
+
+from purplecaffeine.utils import ApiSession, AsyncApiSession, Instrumentation
+
+
+def make_token(lifetime: float) -> str:
+    """Returns unsigned JWT token expiring after lifetime seconds."""
+    payload = json.dumps({"exp": time.time() + lifetime, "nonce": time.time_ns()})
+    encoded = urlsafe_b64encode(payload.encode("utf-8")).rstrip(b"=")
+    return f"header.{encoded.decode('utf-8')}.signature"
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Api server issuing short living tokens."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def reply(self, status: int, body: dict):
+        """Sends json reply."""
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Token endpoints."""
+        length = int(self.headers["Content-Length"])
+        body = json.loads(self.rfile.read(length))
+        server = self.server
+        with server.lock:
+            server.calls.append(self.path)
+            server.ports.add(self.client_address[1])
+            if self.path == "/api/token/" and body["password"] == "admin":
+                server.access = make_token(server.lifetime)
+                self.reply(200, {"access": server.access, "refresh": "refresh"})
+            elif self.path == "/api/token/refresh/" and body["refresh"] == "refresh":
+                server.access = make_token(server.lifetime)
+                self.reply(200, {"access": server.access})
+            else:
+                self.reply(401, {"detail": "invalid"})
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Trials endpoint."""
+        server = self.server
+        with server.lock:
+            server.calls.append(self.path)
+            server.ports.add(self.client_address[1])
+            authorized = self.headers["Authorization"] == f"Bearer {server.access}"
+        if authorized:
+            self.reply(200, {"results": []})
+        else:
+            self.reply(401, {"detail": "token not valid"})
+
+
+class TestApiSession(TestCase):
+    """TestApiSession."""
+
+    def setUp(self) -> None:
+        """Starts fake api server."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApiHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.ports = set()
+        self.server.access = None
+        self.server.lifetime = 3600
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.host = f"http://127.0.0.1:{self.server.server_port}"
+
+    def test_keep_alive(self):
+        """Test requests of threads share pooled connections."""
+        session = ApiSession(self.host, "admin", "admin", pool_size=4)
+        with ThreadPoolExecutor(4) as executor:
+            responses = list(
+                executor.map(
+                    lambda _: session.request("GET", "api/trials/"), range(100)
+                )
+            )
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(self.server.calls.count("/api/token/"), 1)
+        self.assertLessEqual(len(self.server.ports), 5)
+        session.close()
+
+    def test_token_refresh(self):
+        """Test expiring and rejected tokens are refreshed."""
+        # tokens expire within refresh margin
+        self.server.lifetime = 5
+        session = ApiSession(self.host, "admin", "admin")
+        for _ in range(3):
+            self.assertEqual(session.request("GET", "api/trials/").status_code, 200)
+        self.assertEqual(self.server.calls.count("/api/token/"), 1)
+        self.assertEqual(self.server.calls.count("/api/token/refresh/"), 2)
+
+        # token revoked by server
+        self.server.lifetime = 3600
+        self.assertEqual(session.request("GET", "api/trials/").status_code, 200)
+        self.server.access = "revoked"
+        self.assertEqual(session.request("GET", "api/trials/").status_code, 200)
+        self.assertEqual(self.server.calls.count("/api/token/refresh/"), 4)
+        session.close()
+
+    def test_session_instrumentation(self):
+        """Test requests are timed and counted in instrumented operations."""
+        instrumentation = Instrumentation()
+        session = ApiSession(self.host, "admin", "admin")
+        with instrumentation.operation("ApiStorage", "list"):
+            session.request("GET", "api/trials/")
+        totals = instrumentation.totals()["ApiStorage.list"]
+        self.assertEqual(sorted(totals["phases"]), ["http", "token"])
+        self.assertEqual(totals["bytes_in"], len(b'{"results": []}'))
+        session.close()
+
+    def test_async_session(self):
+        """Test many requests in flight on pooled connections."""
+        session = AsyncApiSession(self.host, "admin", "admin", pool_size=10)
+
+        async def run():
+            responses = await asyncio.gather(
+                *(session.request("GET", "api/trials/") for _ in range(200))
+            )
+            self.server.access = "revoked"
+            responses.append(await session.request("GET", "api/trials/"))
+            await session.aclose()
+            return responses
+
+        responses = asyncio.run(run())
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(self.server.calls.count("/api/token/"), 1)
+        self.assertLessEqual(len(self.server.ports), 10)
+
+    def test_async_session_loops(self):
+        """Test client of a previous event loop is closed."""
+        session = AsyncApiSession(self.host, "admin", "admin")
+
+        async def run():
+            return (await session.request("GET", "api/trials/")).status_code
+
+        with patch.object(
+            httpx.AsyncClient,
+            "aclose",
+            autospec=True,
+            side_effect=httpx.AsyncClient.aclose,
+        ) as aclose_mock:
+            for _ in range(3):
+                self.assertEqual(asyncio.run(run()), 200)
+            self.assertEqual(aclose_mock.call_count, 2)
+            asyncio.run(session.aclose())
+            self.assertEqual(aclose_mock.call_count, 3)
+
+    def tearDown(self) -> None:
+        """Stops fake api server."""
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,50 @@
+"""Tests for size estimation."""
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase, skipUnless
+
+import numpy as np
+
+from purplecaffeine.utils import estimate_size, deep_size
+
+
+class TestSize(TestCase):
+    """TestSize."""
+
+    def test_fast_paths(self):
+        """Test sizes measured without walking objects."""
+        array = np.zeros((100, 100))
+        self.assertEqual(estimate_size(array), array.nbytes)
+        self.assertEqual(estimate_size(b"x" * 1000), sys.getsizeof(b"x" * 1000))
+        self.assertEqual(estimate_size(io.BytesIO(b"x" * 1000)), 1000)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "artifact.bin"
+            path.write_bytes(b"x" * 2048)
+            self.assertEqual(estimate_size(path), 2048)
+            with open(path, "rb") as file:
+                self.assertEqual(estimate_size(file), os.path.getsize(path))
+
+    @skipUnless(
+        importlib.util.find_spec("pympler"),
+        "deep size is the estimate itself without pympler",
+    )
+    def test_accuracy(self):
+        """Test estimate stays within 25% of deep size."""
+        objects = {
+            "arrays": [np.random.random(1000) for _ in range(500)],
+            "strings": ["x" * (idx % 100) for idx in range(20000)],
+            "dict": {str(idx): float(idx) for idx in range(20000)},
+            "set": set(range(20000)),
+            "mixed": [
+                {"counts": np.arange(100), "label": f"run {idx}"} for idx in range(1000)
+            ],
+        }
+        for name, obj in objects.items():
+            with self.subTest(name=name):
+                ratio = estimate_size(obj) / deep_size(obj)
+                self.assertGreater(ratio, 0.75)
+                self.assertLess(ratio, 1.25)